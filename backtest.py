@@ -0,0 +1,276 @@
+import os
+import zlib
+import types
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from recorder import read_ticks, read_tick_dir
+from strategy import LADDER, RANGE_STEPS, calculate_ranges, build_combo_orders
+from volatility import WEEK_NS, WEEK_ANCHOR_NS
+
+
+def load_ticks(path):
+    """
+    Recorded MXF ticks as (ts, close): ts is int64 nanoseconds of exchange
+    local time, like shioaji's tick.datetime. Reads a TickRecorder directory
+    or day file (.bin), .npz/.npy (fields ts and close) or .csv (columns ts
+    and close).
+    """
+    if os.path.isdir(path):
+        ticks = read_tick_dir(path)
+        return ticks['ts'], ticks['close']
+    ext = os.path.splitext(path)[1]
+    if ext == '.bin':
+        ticks = read_ticks(path)
+        return ticks['ts'], ticks['close']
+    if ext == '.csv':
+        df = pd.read_csv(path, usecols=['ts', 'close'], dtype={'ts': np.int64, 'close': np.float64})
+        return df['ts'].to_numpy(), df['close'].to_numpy()
+    data = np.load(path)
+    ts, close = data['ts'], data['close']
+    return np.asarray(ts, dtype=np.int64), np.asarray(close, dtype=np.float64)
+
+
+def split_weeks(ts):
+    """
+    Slices of ts (sorted) per weekly contract, Wednesday 15:00 to the next
+    Wednesday's settlement.
+    """
+    week = (ts - WEEK_ANCHOR_NS) // WEEK_NS
+    bounds = np.flatnonzero(np.diff(week)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(ts)]])
+    return [slice(s, e) for s, e in zip(starts, ends)]
+
+
+def make_chain(open_price, contract_name='TXO', contract_month='000000', step=50, width=3000):
+    """
+    Synthetic option chain around open_price, shaped like get_options output
+    and the api.Contracts.Options tree that combo_order reads legs from.
+    """
+    center = int(round(open_price / step)) * step
+    strikes = list(range(center - width, center + width + step, step))
+    contract = types.SimpleNamespace()
+    options = {'C': {}, 'P': {}}
+    for side in ('C', 'P'):
+        for strike in strikes:
+            symbol = f"{contract_name}{contract_month}{strike}{side}"
+            setattr(contract, symbol, types.SimpleNamespace(symbol=symbol, name=symbol))
+            options[side][strike] = symbol
+    return contract, strikes, strikes, options
+
+
+class IOCFillModel:
+    """
+    Outcome of one IOC attempt: fully filled with fill_prob, partly filled
+    with partial_prob, cancelled otherwise. Each price step the retry loop
+    walked makes a fill walk_gain more likely.
+
+    With a seed, stream(key) restarts the draws on a generator seeded from
+    seed and key, so two runs draw the same numbers for the same key
+    whatever each drew before it.
+    """
+
+    def __init__(self, fill_prob=0.3, partial_prob=0.2, walk_gain=0.05, seed=None):
+        self.fill_prob = fill_prob
+        self.partial_prob = partial_prob
+        self.walk_gain = walk_gain
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def stream(self, *key):
+        """
+        Draw from the stream of key (ints and strings) from here on.
+        """
+        if self.seed is None:
+            return
+        words = [k if isinstance(k, int) else zlib.crc32(str(k).encode()) for k in key]
+        self.rng = np.random.default_rng([self.seed, *words])
+
+    def attempt(self, qty, steps=0):
+        fill_prob = min(self.fill_prob + self.walk_gain * steps, 1.0)
+        r = self.rng.random()
+        if r < fill_prob:
+            return qty
+        if r < fill_prob + self.partial_prob and qty > 1:
+            return int(self.rng.integers(1, qty))
+        return 0
+
+
+def simulate_order(model, price, qty, step, order_trial_limit=200, walk_every=50):
+    """
+    The enter/cover retry loop of run.py against the fill model: the limit
+    moves by step every walk_every attempts. Return (filled, avg_price, attempts).
+    """
+    filled, notional, steps = 0, 0.0, 0
+    attempt = 1
+    while attempt < order_trial_limit and filled < qty:
+        got = model.attempt(qty - filled, steps)
+        filled += got
+        notional += got * price
+        if attempt % walk_every == 0:
+            price += step
+            steps += 1
+        attempt += 1
+    avg_price = notional / filled if filled else np.nan
+    return filled, avg_price, attempt
+
+
+def spread_value(order, settle):
+    """
+    Settlement value of a short spread entered through combo_order, in points.
+    """
+    if order.side == 0:
+        return min(max(settle - order.l1p, 0), order.l2p - order.l1p)
+    return min(max(order.l1p - settle, 0), order.l1p - order.l2p)
+
+
+class Backtest:
+    """
+    Replay weeks of ticks through the wing ladder.
+
+    Each week opens at its first tick; calculate_ranges and build_combo_orders
+    lay out the ladder on a synthetic chain exactly like run.py. Closes are
+    truncated to int as market.update does, and the first tick crossing each
+    level is found for all levels at once with searchsorted over the running
+    max / min. A triggered level runs its entry and its cover of the previous
+    level through simulate_order once (no re-arm), what is left open settles
+    at the week's last tick. The fills of each (week, level, entry / cover)
+    come from their own stream of the fill model, so backtests of different
+    ladders with one seed see the same luck on the levels they share.
+    """
+
+    def __init__(
+        self,
+        std_val: float,
+        fill_model: Optional[IOCFillModel] = None,
+        order_trial_limit: int = 200,
+        multiplier: float = 50,
+        strike_step: int = 50,
+        ladder=LADDER,
+        steps=RANGE_STEPS,
+        pricing: Optional[Dict] = None,
+        walk_every: int = 50,
+    ):
+        self.std_val = std_val
+        self.fill_model = fill_model or IOCFillModel()
+        self.order_trial_limit = order_trial_limit
+        self.multiplier = multiplier
+        self.strike_step = strike_step
+        self.ladder = ladder
+        self.steps = steps
+        self.pricing = pricing or {}
+        self.walk_every = walk_every
+
+    def run_week(self, close, week=0) -> List[Dict]:
+        close = close.astype(np.int64)
+        open_price = close[0]
+        settle = close[-1]
+        # wide enough for the outermost level and its long leg
+        width = max(3000, int(sum(self.steps) * self.std_val) + 10 * self.strike_step)
+        contract, calls, puts, options = make_chain(open_price, step=self.strike_step, width=width)
+        std_prices = calculate_ranges(open_price, self.std_val, self.steps)
+        combo_orders = build_combo_orders(contract, std_prices, calls, puts, options, self.ladder, **self.pricing)
+        # tick index where each level first crosses, len(close) if never
+        hits = dict(zip(combo_orders, combo_orders.first_crossings(close).tolist()))
+
+        entered = {}
+        rows = {}
+        for name, order in combo_orders.items():
+            row = {
+                'level': name,
+                'trigger_price': order['trigger_price'],
+                'triggered': hits[name] < len(close),
+                'tick': hits[name],
+                'entry_qty': 0,
+                'entry_price': np.nan,
+                'entry_slippage': np.nan,
+                'covered_qty': 0,
+                'cover_price': np.nan,
+                'cover_slippage': np.nan,
+                'pnl': 0.0,
+            }
+            if row['triggered']:
+                self.fill_model.stream(week, name, 'open')
+                qty, price, _ = simulate_order(
+                    self.fill_model, order['open_price'], order['open_q'], -1, self.order_trial_limit, self.walk_every)
+                row['entry_qty'] = qty
+                row['entry_price'] = price
+                row['entry_slippage'] = order['open_price'] - price if qty else np.nan
+                entered[name] = qty
+            rows[name] = row
+
+        # a triggered level buys back the previous level's spread
+        stop_of = {name: stop for name, _, _, stop, _, _ in self.ladder}
+        for name, order in combo_orders.items():
+            stop = stop_of[name]
+            if stop is None or not rows[name]['triggered'] or not entered.get(stop):
+                continue
+            qty = min(order['close_q'], entered[stop])
+            self.fill_model.stream(week, name, 'close')
+            covered, price, _ = simulate_order(
+                self.fill_model, order['close_price'], qty, 1, self.order_trial_limit, self.walk_every)
+            stop_row = rows[stop]
+            stop_row['covered_qty'] += covered
+            if covered:
+                stop_row['cover_price'] = price
+                stop_row['cover_slippage'] = price - order['close_price']
+                stop_row['pnl'] -= covered * price
+
+        for name, order in combo_orders.items():
+            row = rows[name]
+            if not row['entry_qty']:
+                continue
+            open_qty = row['entry_qty'] - row['covered_qty']
+            row['pnl'] += row['entry_qty'] * row['entry_price']
+            row['pnl'] -= open_qty * spread_value(order['enter_order'], settle)
+            row['pnl'] *= self.multiplier
+        return list(rows.values())
+
+    def run(self, ts, close, weeks=None) -> pd.DataFrame:
+        """
+        weeks are split_weeks(ts), pass them in to reuse the split.
+        """
+        results = []
+        for week, sl in enumerate(weeks or split_weeks(ts)):
+            if sl.stop - sl.start < 2:
+                continue
+            for row in self.run_week(close[sl], week):
+                row['week'] = week
+                row['week_start'] = ts[sl.start]
+                results.append(row)
+        return pd.DataFrame(results)
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fills, slippage and P&L per std level.
+    """
+    return results.groupby('level', sort=False).agg(
+        weeks=('week', 'nunique'),
+        triggered=('triggered', 'sum'),
+        entry_qty=('entry_qty', 'sum'),
+        entry_slippage=('entry_slippage', 'mean'),
+        covered_qty=('covered_qty', 'sum'),
+        cover_slippage=('cover_slippage', 'mean'),
+        pnl=('pnl', 'sum'),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("ticks", help="recorded MXF ticks, .npz/.npy/.csv with ts and close")
+    parser.add_argument("--std", type=float, required=True, help="WING_STD")
+    parser.add_argument("--fill-prob", type=float, default=0.3)
+    parser.add_argument("--partial-prob", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ts, close = load_ticks(args.ticks)
+    bt = Backtest(args.std, IOCFillModel(args.fill_prob, args.partial_prob, seed=args.seed))
+    results = bt.run(ts, close)
+    print(summarize(results))
+    print(f"Total P&L : {results['pnl'].sum():.0f}")
@@ -0,0 +1,125 @@
+"""
+Compare the vectorized generate_std pipeline with the per-row / per-expiry
+loop it replaced, on a synthetic multi-year TAIFEX daily dump.
+
+    python benchmarks/bench_generate_std.py --weeks 520
+"""
+import os
+import sys
+import time
+import datetime
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from generate_std import preprocess, collect_weekly_amp
+
+
+def make_taifex_frame(n_weeks=520, seed=0):
+    """
+    Daily futures rows in the TAIFEX download layout: MTX weekly and monthly
+    expiries, calendar spreads and a second contract, regular and after-market
+    sessions, '-' for missing prices.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range('2015-01-05', periods=n_weeks * 5)
+    price = 9000.0
+
+    rows = []
+    for day in days:
+        price += rng.normal(0, 60)
+        # weekly expiring this week and next week, Wednesday settlement
+        wed = day + pd.Timedelta(days=(2 - day.weekday()) % 7)
+        weeklies = [wed, wed + pd.Timedelta(days=7)]
+        month = day.strftime('%Y%m')
+        expires = [f"{w.strftime('%Y%m')}W{(w.day - 1) // 7 + 1}" for w in weeklies]
+        expires += [month, f"{month}/{(day + pd.Timedelta(days=31)).strftime('%Y%m')}"]
+
+        for contract in ('MTX', 'TX'):
+            for i, expire in enumerate(expires):
+                for session in ('一般', '盤後'):
+                    o = price + rng.normal(0, 20)
+                    c = o + rng.normal(0, 80)
+                    settling = i == 0 and day == weeklies[0] and session == '一般'
+                    rows.append((
+                        day.strftime('%Y/%m/%d'), contract, expire,
+                        '-' if rng.random() < 0.01 else round(o),
+                        round(max(o, c) + 10), round(min(o, c) - 10), round(c),
+                        int(rng.integers(0, 50000)),
+                        0 if settling else round(c),
+                        int(rng.integers(0, 90000)), '', session,
+                    ))
+
+    return pd.DataFrame(rows, columns=[
+        '交易日期', '契約', '到期月份(週別)', '開盤價', '最高價', '最低價', '收盤價',
+        '成交量', '結算價', '未沖銷契約數', '是否因訊息面暫停交易', '交易時段',
+    ])
+
+
+def reference_preprocess(df):
+    df = df[['交易日期', '契約', '到期月份(週別)', '開盤價', '最高價', '最低價', '收盤價','成交量', '結算價', '未沖銷契約數', '是否因訊息面暫停交易', '交易時段']]
+    df = df.rename(columns={
+        '交易日期' :'date', '契約' : 'contract', '到期月份(週別)' : 'expire',
+        '開盤價' : 'open', '最高價' : 'high', '最低價' : 'low', '收盤價' : 'close',
+        '成交量' : 'volume', '結算價' : 'final_close', '未沖銷契約數' : 'oi',
+        '是否因訊息面暫停交易' : 'terminate', '交易時段' : 'trade_time'
+    })
+    df = df[df['contract'] == 'MTX']
+    df = df[~df['expire'].str.contains('/', na=False)]
+    df = df[df['expire'].str.contains('W', na=False)]
+    df['date'] = df['date'].apply(lambda x : datetime.datetime.strptime(x, "%Y/%m/%d"))
+    df['weekday'] = df['date'].apply(lambda x : x.strftime("%A"))
+    for col in ['open', 'high', 'low', 'close', 'volume', 'final_close', 'oi']:
+        df[col] = df[col].replace("-", np.nan)
+        df[col] = df[col].astype(float)
+    return df
+
+
+def reference_collect_weekly_amp(df):
+    df = df[df['weekday']=='Wednesday']
+    diffs = []
+    df['after_market_open'] = np.nan
+    df.loc[df['trade_time'] == '盤後', 'after_market_open'] = df.loc[df['trade_time'] == '盤後', 'open']
+    for unique_expire in df['expire'].unique():
+        tmp = df[df['expire'] == unique_expire]
+        tmp['after_market_open'] = tmp['after_market_open'].ffill()
+        val = tmp.loc[tmp['final_close']==0, 'close'] - tmp.loc[tmp['final_close']==0, 'after_market_open']
+        if len(val) > 0:
+            diff = val.values[0]
+            if not np.isnan(diff):
+                diffs.append(diff)
+    return diffs
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t)
+    return out, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--weeks', type=int, default=520)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pd.options.mode.chained_assignment = None
+    raw = make_taifex_frame(args.weeks)
+    print(f"{len(raw)} rows, {args.weeks} weeks")
+
+    ref_df, t_ref_pre = timed(reference_preprocess, raw, repeat=args.repeat)
+    new_df, t_new_pre = timed(preprocess, raw, repeat=args.repeat)
+    ref_diffs, t_ref_amp = timed(reference_collect_weekly_amp, ref_df, repeat=args.repeat)
+    new_diffs, t_new_amp = timed(collect_weekly_amp, new_df, repeat=args.repeat)
+
+    assert len(ref_diffs) == len(new_diffs), (len(ref_diffs), len(new_diffs))
+    assert np.array_equal(np.asarray(ref_diffs), np.asarray(new_diffs))
+
+    print(f"preprocess         : {t_ref_pre:8.4f}s -> {t_new_pre:8.4f}s  x{t_ref_pre / t_new_pre:.1f}")
+    print(f"collect_weekly_amp : {t_ref_amp:8.4f}s -> {t_new_amp:8.4f}s  x{t_ref_amp / t_new_amp:.1f}")
+    print(f"diffs              : {len(new_diffs)}, std {np.std(new_diffs):.4f}")
@@ -0,0 +1,404 @@
+"""
+Timings of the strategy hot paths on synthetic data, stored per machine so
+runs can be compared over time.
+
+    python benchmarks/bench_hot_paths.py                 # run all, append to results
+    python benchmarks/bench_hot_paths.py -k strike       # only names containing 'strike'
+    python benchmarks/bench_hot_paths.py --compare       # against the previous stored run
+    python benchmarks/bench_hot_paths.py --compare abc123  # against the last run at that git rev
+
+Every benchmark is a setup function registered with @benchmark; it builds its
+inputs (not timed) and returns (fn, ops): fn runs the measured work, ops is
+how many operations one fn() call performs, so results are per operation.
+A setup that leaves files behind returns (fn, ops, cleanup) instead, and
+cleanup runs once fn is measured.
+fn is timed in rounds long enough to beat the clock resolution, and the
+best and median round are kept. Results are appended as one JSON line per
+run to benchmarks/results/<host>.jsonl with the git revision.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import socket
+import platform
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+from strategy import LADDER, StrikeChain, calculate_ranges, get_options, build_combo_orders
+from orders import ComboOrderHandler
+from trigger import TriggerEngine
+from generate_std import read_filtered, collect_weekly_amp
+from bench_generate_std import make_taifex_frame
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# --- synthetic data -------------------------------------------------------
+
+def make_txo_contracts(n_months=5, n_strikes=200, center=21000, step=50, contract_name='TXO'):
+    """
+    Option contract tree shaped like api.Contracts.Options.TXO: keys() are
+    symbols like TXO202505 21000C, attributes the contracts. The default is
+    5 months x 200 strikes x 2 sides = 2000 contracts.
+    """
+    contract = types.SimpleNamespace()
+    symbols = {}
+    months = [f"2025{m:02d}" for m in range(5, 5 + n_months)]
+    low = center - step * (n_strikes // 2)
+    for month in months:
+        for strike in range(low, low + step * n_strikes, step):
+            for side in ('C', 'P'):
+                symbol = f"{contract_name}{month}{strike}{side}"
+                leg = types.SimpleNamespace(symbol=symbol, name=symbol)
+                setattr(contract, symbol, leg)
+                symbols[symbol] = leg
+    contract.keys = symbols.keys
+    return contract, months
+
+
+def make_prices(n, center=21000, scale=1500, seed=0):
+    return np.random.default_rng(seed).normal(center, scale, n).astype(int).tolist()
+
+
+def make_ticks(n, open_price=21000, vol=8.0, seed=0):
+    """
+    Random-walk closes as the int prices market.update hands the engine.
+    """
+    steps = np.random.default_rng(seed).normal(0, vol, n)
+    return (open_price + np.cumsum(steps)).astype(int).tolist()
+
+
+def make_order_messages(n_orders, quantity=4, seed=0):
+    """
+    Callback traffic of n_orders IOC combo orders in shioaji's shapes: per
+    order one New per leg, trades for part of it and a Cancel for the rest,
+    interleaved across orders the way late reports arrive.
+    """
+    rng = random.Random(seed)
+    per_order = []
+    for k in range(n_orders):
+        order_id = f"{k:08x}"
+        msgs = [
+            {'operation': {'op_type': 'New'}, 'order': {'id': order_id, 'quantity': quantity}, 'status': {}}
+            for _ in range(2)
+        ]
+        filled = rng.randint(0, 2 * quantity)
+        left = 2 * quantity - filled
+        while filled:
+            q = rng.randint(1, filled)
+            msgs.append({'trade_id': order_id, 'quantity': q})
+            filled -= q
+        if left:
+            msgs.append({'operation': {'op_type': 'Cancel'}, 'order': {'id': order_id}, 'status': {'cancel_quantity': left}})
+        per_order.append(msgs)
+
+    # keep each order's own sequence, interleave neighbouring orders
+    stream = []
+    window = []
+    for msgs in per_order:
+        window.append(list(reversed(msgs)))
+        if len(window) == 8:
+            while window:
+                i = rng.randrange(len(window))
+                stream.append(window[i].pop())
+                if not window[i]:
+                    window.pop(i)
+    for msgs in window:
+        stream.extend(reversed(msgs))
+    return stream, [f"{k:08x}" for k in range(n_orders)]
+
+
+def write_taifex_csvs(directory, n_years=8, weeks_per_year=52):
+    """
+    One synthetic TAIFEX daily dump per year under directory.
+    """
+    paths = []
+    for year in range(n_years):
+        df = make_taifex_frame(weeks_per_year, seed=year)
+        path = os.path.join(directory, f"{year:02d}.csv")
+        df.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+# --- benchmarks -----------------------------------------------------------
+
+@benchmark('calculate_ranges')
+def bench_calculate_ranges():
+    opens = make_prices(1000)
+
+    def fn():
+        for p in opens:
+            calculate_ranges(p, 250.0)
+    return fn, len(opens)
+
+
+@benchmark('strike_lookup.scalar')
+def bench_strike_lookup_scalar():
+    contract, months = make_txo_contracts()
+    chain = StrikeChain(get_options(contract, 'TXO', months[0]))
+    prices = make_prices(10000)
+
+    def fn():
+        bear_call, bull_put = chain.bear_call, chain.bull_put
+        for p in prices:
+            bear_call(p)
+            bull_put(p)
+    return fn, 2 * len(prices)
+
+
+@benchmark('strike_lookup.spreads')
+def bench_strike_lookup_spreads():
+    contract, months = make_txo_contracts()
+    chain = StrikeChain(get_options(contract, 'TXO', months[0]))
+    prices = np.asarray(make_prices(10000))
+
+    def fn():
+        chain.spreads(prices, 0)
+        chain.spreads(prices, 1)
+    return fn, 2 * len(prices)
+
+
+@benchmark('strike_lookup.recenter')
+def bench_strike_lookup_recenter():
+    contract, months = make_txo_contracts()
+    chain = StrikeChain(get_options(contract, 'TXO', months[0]))
+    ladders = [calculate_ranges(p, 250.0) for p in make_prices(100)]
+
+    def fn():
+        for std_prices in ladders:
+            chain.recenter(std_prices, LADDER)
+    return fn, len(ladders)
+
+
+@benchmark('get_options.2000')
+def bench_get_options():
+    contract, months = make_txo_contracts()
+
+    def fn():
+        get_options(contract, 'TXO', months[2])
+    return fn, 1
+
+
+@benchmark('build_combo_orders')
+def bench_build_combo_orders():
+    contract, months = make_txo_contracts()
+    options = get_options(contract, 'TXO', months[0])
+    chain = StrikeChain(options)
+    std_prices = calculate_ranges(21000, 250.0)
+
+    def fn():
+        build_combo_orders(contract, std_prices, chain.calls, chain.puts, options)
+    return fn, 1
+
+
+@benchmark('ladder.first_crossings')
+def bench_ladder_first_crossings():
+    # a week of ticks against the ladder in one batch
+    contract, months = make_txo_contracts()
+    options = get_options(contract, 'TXO', months[0])
+    chain = StrikeChain(options)
+    ladder = build_combo_orders(contract, calculate_ranges(21000, 250.0), chain.calls, chain.puts, options)
+    ticks = np.array(make_ticks(200000), dtype=np.int64)
+
+    def fn():
+        ladder.first_crossings(ticks)
+    return fn, len(ticks)
+
+
+@benchmark('order_handler.handle_message')
+def bench_handle_message():
+    stream, _ = make_order_messages(20000)
+
+    def fn():
+        handler = ComboOrderHandler(max_orders=1000)
+        for msg in stream:
+            handler.handle_message(msg)
+    return fn, len(stream)
+
+
+@benchmark('order_handler.evaluate')
+def bench_evaluate():
+    stream, order_ids = make_order_messages(1000)
+    handler = ComboOrderHandler(max_orders=len(order_ids))
+    for msg in stream:
+        handler.handle_message(msg)
+
+    def fn():
+        for order_id in order_ids:
+            handler.evaluate(order_id)
+    return fn, len(order_ids)
+
+
+@benchmark('trigger.on_price')
+def bench_trigger_on_price():
+    # a wide ladder that the walk never reaches: the per-tick cost of the check
+    std_prices = calculate_ranges(21000, 2000.0)
+    ticks = make_ticks(50000)
+    engine = TriggerEngine(lambda name, price: True)
+    for name, side, idx, _, _, _ in LADDER:
+        engine.arm(name, std_prices[idx], side)
+
+    def fn():
+        on_price = engine.on_price
+        for price in ticks:
+            on_price(price)
+    return fn, len(ticks)
+
+
+@benchmark('trigger.fire_and_rearm')
+def bench_trigger_fire():
+    # every tick alternately crosses and leaves all levels, which re-arm
+    std_prices = calculate_ranges(21000, 250.0)
+    ticks = [25000, 21000, 17000, 21000] * 250
+    engine = TriggerEngine(lambda name, price: False)
+
+    def fn():
+        for name, side, idx, _, _, _ in LADDER:
+            engine.arm(name, std_prices[idx], side)
+        on_price = engine.on_price
+        for price in ticks:
+            on_price(price)
+            while not engine._queue.empty():
+                name, _, _ = engine._queue.get_nowait()
+                engine._settle_result(name, False)
+        for name, _, _, _, _, _ in LADDER:
+            engine.disarm(name)
+    return fn, len(ticks)
+
+
+@benchmark('generate_std.read_collect')
+def bench_generate_std():
+    directory = tempfile.TemporaryDirectory(prefix="bench_taifex_")
+    paths = write_taifex_csvs(directory.name)
+
+    def fn():
+        df = pd.concat([read_filtered(p) for p in paths], ignore_index=True)
+        collect_weekly_amp(df)
+    return fn, len(paths), directory.cleanup
+
+
+# --- runner ---------------------------------------------------------------
+
+def measure(fn, ops, rounds=7, min_time=0.2):
+    """
+    Per-operation seconds of fn: calls per round are grown until a round
+    takes min_time, then the best and median of rounds rounds are kept.
+    """
+    fn()  # warm up
+    calls = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - t
+        if elapsed >= min_time or calls >= 1 << 20:
+            break
+        calls *= 2 if elapsed * 10 > min_time else 10
+
+    samples = []
+    for _ in range(rounds):
+        t = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - t) / (calls * ops))
+    return {'best': min(samples), 'median': statistics.median(samples), 'ops': calls * ops}
+
+
+def git_rev():
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True)
+        return rev.stdout.strip() + ("+" if dirty.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def results_path(host=None):
+    return os.path.join(RESULTS_DIR, f"{host or socket.gethostname()}.jsonl")
+
+
+def load_runs(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.3f} {unit}"
+    return f"{seconds / 1e-9:8.1f} ns"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", dest="select", default="", help="only benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--compare", nargs="?", const="", default=None,
+                        help="compare with the last stored run, or the last one at this git rev")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    path = results_path()
+    previous = load_runs(path)
+
+    run = {
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'rev': git_rev(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': {},
+    }
+    for name, setup in BENCHMARKS.items():
+        if args.select not in name:
+            continue
+        fn, ops, *cleanup = setup()
+        try:
+            result = measure(fn, ops, args.rounds, args.min_time)
+        finally:
+            for close in cleanup:
+                close()
+        run['results'][name] = result
+        print(f"{name:32s} {format_time(result['best'])}/op  (median {format_time(result['median'])})")
+
+    if args.compare is not None:
+        baseline = [r for r in previous if not args.compare or r['rev'].rstrip('+') == args.compare]
+        if not baseline:
+            print(f"no stored run to compare with in {path}")
+        else:
+            base = baseline[-1]
+            print(f"\nvs {base['rev']} ({base['time']}), best time ratio, < 1 is faster:")
+            for name, result in run['results'].items():
+                if name in base['results']:
+                    ratio = result['best'] / base['results'][name]['best']
+                    print(f"{name:32s} x{ratio:6.2f}")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nsaved to {path}")
@@ -0,0 +1,121 @@
+"""
+Load test of the live loop of run.py against the broker simulator: ticks
+come in through the real quote callback, trigger levels, and the entry /
+cover workflows place IOC combos through the gateway and wait for the
+simulated order replies.
+
+    python benchmarks/load_sim.py                                # 1k, 2k, 5k ticks/s, 10 s each
+    python benchmarks/load_sim.py --rates 10000 --duration 30 --tick-vol 5
+
+Every rate runs one fresh ladder for duration seconds. The achieved rate
+is what the simulator could push through the callback in that time, it
+falls behind the target rate once the loop saturates. Latencies are the
+stages of latency.metrics, see run.py.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+os.environ["BROKER"] = "sim"
+import run
+import simulator
+from strategy import LADDER
+from orders import ComboOrderHandler
+from scheduler import ExecutionScheduler
+from journal import StateJournal
+from gateway import OrderGateway
+from quotes import QuoteCache
+from latency import metrics
+
+STAGES = ('quote_callback', 'trigger_check', 'trigger_queue', 'gateway_wait', 'place_order',
+          'order_reply', 'tick_to_open', 'tick_to_close')
+
+
+def load_step(rate, args):
+    metrics.stages.clear()
+    run._templates.clear()
+    workdir = tempfile.mkdtemp(prefix="load_sim")
+    strategy = run.WingStrategy(f"TXO{args.month}", "TXO", args.month, args.std, args.open)
+    api = simulator.Shioaji(
+        open_price=args.open, tick_rate=rate, tick_vol=args.tick_vol, series=[("TXO", args.month)],
+        ack_latency=args.ack_latency, reply_latency=args.reply_latency,
+        fill_prob=args.fill_prob, seed=args.seed,
+    )
+    run.coh = ComboOrderHandler()
+    run.scheduler = ExecutionScheduler(max_workers=2 * len(LADDER), max_inflight=4)
+    run.gateway = OrderGateway(rate=args.order_rate, burst=args.order_rate)
+    run.quotes = QuoteCache()
+    run.notifier = simulator.Notifier(quiet=True)
+    run.journal = StateJournal(os.path.join(workdir, "journal.sqlite"))
+    run.runner = runner = run.StrategyRunner(api, [strategy], os.path.join(workdir, "ticks"))
+
+    runner.subscribe()
+    run.order_subscribe(api)
+    while not runner.ready():
+        time.sleep(0.01)
+    strategy.arm(api, args.order_trial_limit, args.order_timeout)
+    runner.subscribe_legs()
+
+    ticks = api.stats['ticks']
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - start
+    ticks = api.stats['ticks'] - ticks
+
+    runner.unsubscribe()
+    run.scheduler.shutdown()
+    run.gateway.close()
+    api.logout()
+    runner.stop()
+    run.journal.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    triggered = bin(strategy.combo_orders.triggered).count('1')
+    return {
+        'rate': rate,
+        'achieved': ticks / elapsed,
+        'triggered': triggered,
+        'levels': len(strategy.combo_orders),
+        'orders': api.stats['orders'],
+        'stages': metrics.summary(),
+    }
+
+
+def report(result):
+    print(f"{result['rate']:>8.0f} ticks/s target  {result['achieved']:>8.0f} achieved  "
+          f"{result['triggered']}/{result['levels']} levels  {result['orders']} orders")
+    for stage in STAGES:
+        summary = result['stages'].get(stage)
+        if summary and summary['count']:
+            print(f"    {stage:<16} n={summary['count']:>8}  p50 {summary['p50_us']:>9.1f} us  "
+                  f"p99 {summary['p99_us']:>9.1f} us  max {summary['max_us']:>9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=float, nargs="+", default=[1000, 2000, 5000], help="ticks per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--month", default="202505")
+    parser.add_argument("--open", type=float, default=21000.0)
+    parser.add_argument("--std", type=float, default=60.0, help="WING_STD of the ladder")
+    parser.add_argument("--tick-vol", type=float, default=3.0, help="std of one tick's move")
+    parser.add_argument("--ack-latency", type=float, default=0.002)
+    parser.add_argument("--reply-latency", type=float, default=0.005)
+    parser.add_argument("--fill-prob", type=float, default=0.6)
+    parser.add_argument("--order-rate", type=float, default=20.0)
+    parser.add_argument("--order-trial-limit", type=int, default=20)
+    parser.add_argument("--order-timeout", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for rate in args.rates:
+        report(load_step(rate, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional
+
+from latency import metrics, now_ns
+
+
+COVER = 0
+ENTRY = 1
+
+
+class TokenBucket:
+    """
+    rate tokens per second, up to burst saved up.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until a token is available, 0 if one is.
+        """
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'account', 'fn', 'args', 'future', 'queued_ns')
+
+    def __init__(self, priority, seq, account, fn, args):
+        self.priority = priority
+        self.seq = seq
+        self.account = account
+        self.fn = fn
+        self.args = args
+        self.future: Future = Future()
+        self.queued_ns = now_ns()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class OrderGateway:
+    """
+    Token-bucket gate in front of api.place_comboorder.
+
+    submit() queues a placement and returns a Future of its result (the
+    trade). A dispatcher thread sends queued placements in priority order,
+    covers (COVER) before entries (ENTRY) and first come first within one,
+    as soon as the global bucket and the bucket of the order's account both
+    have a token; a request whose account is out of budget lets the next
+    one of another account go first. The broker calls themselves run on a
+    few sender threads.
+
+    stats counts submitted / sent / failed requests, the current
+    and peak queue depth; the time spent queued is recorded in the
+    'gateway_wait' latency histogram.
+    """
+
+    def __init__(self, rate: float = 20.0, burst: float = 20.0,
+                 account_rate: Optional[float] = None, account_burst: Optional[float] = None,
+                 senders: int = 4):
+        self.bucket = TokenBucket(rate, burst)
+        self.account_rate = account_rate
+        self.account_burst = account_burst if account_burst is not None else burst
+        self._accounts: Dict[Hashable, TokenBucket] = {}
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._closed = False
+        self.stats = {'submitted': 0, 'sent': 0, 'failed': 0, 'depth': 0, 'max_depth': 0}
+
+        self._senders = ThreadPoolExecutor(max_workers=senders, thread_name_prefix="order-sender")
+        self._thread = threading.Thread(target=self._run, name="order-gateway", daemon=True)
+        self._thread.start()
+
+    def _account_bucket(self, account) -> Optional[TokenBucket]:
+        if account is None or self.account_rate is None:
+            return None
+        bucket = self._accounts.get(account)
+        if bucket is None:
+            bucket = self._accounts[account] = TokenBucket(self.account_rate, self.account_burst)
+        return bucket
+
+    def submit(self, fn: Callable, *args, priority: int = ENTRY,
+               account: Optional[Hashable] = None) -> Future:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OrderGateway is closed")
+            self.stats['submitted'] += 1
+            request = _Request(priority, next(self._seq), account, fn, args)
+            heapq.heappush(self._heap, request)
+            self.stats['depth'] = len(self._heap)
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._heap))
+            self._cond.notify()
+            return request.future
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Send what is queued and stop.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._senders.shutdown(wait=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        if self._closed:
+                            return
+                        self._cond.wait()
+                        continue
+                    now = time.monotonic()
+                    wait = self.bucket.wait_time(now)
+                    if wait <= 0:
+                        request, account, wait = self._next_ready(now)
+                        if request is not None:
+                            break
+                    # a cover arriving meanwhile is looked at first
+                    self._cond.wait(wait)
+
+                if request is self._heap[0]:
+                    heapq.heappop(self._heap)
+                else:
+                    self._heap.remove(request)
+                    heapq.heapify(self._heap)
+                self.bucket.take(now)
+                if account is not None:
+                    account.take(now)
+                self.stats['depth'] = len(self._heap)
+                fn, args = request.fn, request.args
+
+            metrics.since('gateway_wait', request.queued_ns)
+            self._senders.submit(self._send, request, fn, args)
+
+    def _next_ready(self, now: float):
+        """
+        First request in priority order whose account has a token, so one
+        account out of budget does not hold up the others. Otherwise None
+        and the time until the earliest account refills.
+        """
+        wait = float('inf')
+        for request in sorted(self._heap):
+            account = self._account_bucket(request.account)
+            account_wait = account.wait_time(now) if account is not None else 0.0
+            if account_wait <= 0:
+                return request, account, 0.0
+            wait = min(wait, account_wait)
+        return None, None, wait
+
+    def _send(self, request: _Request, fn: Callable, args) -> None:
+        try:
+            result = fn(*args)
+        except Exception as exc:
+            with self._cond:
+                self.stats['failed'] += 1
+            request.future.set_exception(exc)
+            return
+        with self._cond:
+            self.stats['sent'] += 1
+        request.future.set_result(result)
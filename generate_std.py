@@ -1,10 +1,27 @@
 import os
 import math
 import pickle
+import argparse
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from tqdm import tqdm
+
+from volatility import RunningMoments
+
+
+WEDNESDAY = 2  # settlement day of the weekly contracts, in dt.weekday numbering
+
+# only the columns preprocess uses, with fixed dtypes so pandas skips inference
+PRICE_COLUMNS = ['開盤價', '最高價', '最低價', '收盤價', '成交量', '結算價', '未沖銷契約數']
+RAW_DTYPES = {
+    '交易日期': str,
+    '契約': str,
+    '到期月份(週別)': str,
+    '是否因訊息面暫停交易': str,
+    '交易時段': str,
+    **{col: np.float64 for col in PRICE_COLUMNS},
+}
 
 
 def preprocess(df):
@@ -23,52 +40,254 @@ def preprocess(df):
         '是否因訊息面暫停交易' : 'terminate', 
         '交易時段' : 'trade_time'
     })
-    df = df[df['contract'] == 'MTX']
-    df = df[~df['expire'].str.contains('/', na=False)]
-    df = df[df['expire'].str.contains('W', na=False)]
-    df['date'] = df['date'].apply(lambda x : datetime.datetime.strptime(x, "%Y/%m/%d"))
-    df['weekday'] = df['date'].apply(lambda x : x.strftime("%A"))
+    expire = df['expire']
+    weekly = (
+        (df['contract'] == 'MTX')
+        & ~expire.str.contains('/', na=False, regex=False)
+        & expire.str.contains('W', na=False, regex=False)
+    )
+    df = df[weekly].copy()
+    df['date'] = pd.to_datetime(df['date'], format="%Y/%m/%d")
+    df['weekday'] = df['date'].dt.weekday
     float_cols = [
         'open', 'high', 'low', 'close', 'volume', 'final_close', 'oi',
     ]
 
-    for col in float_cols:
-        df[col] = df[col].replace("-", np.nan)
-        df[col] = df[col].astype(float)
+    df[float_cols] = df[float_cols].replace("-", np.nan).astype(float)
 
     return df
 
 
-def collect_weekly_amp(df):
-    df = df[df['weekday']=='Wednesday']
+def read_filtered(fullpath, chunksize=200000):
+    """
+    Read one TAIFEX daily dump in chunks, keeping only the preprocessed MTX
+    weekly rows of each chunk, so the full file never sits in memory.
+    """
+    chunks = pd.read_csv(
+        fullpath,
+        usecols=list(RAW_DTYPES),
+        dtype=RAW_DTYPES,
+        na_values={col: ['-'] for col in PRICE_COLUMNS},
+        chunksize=chunksize,
+    )
+    return pd.concat([preprocess(chunk) for chunk in chunks], ignore_index=True)
+
+
+def load_files(fullpaths, workers=None, fn=read_filtered):
+    """
+    Apply fn (read_filtered by default) to every file on a process pool,
+    results in the order of fullpaths.
+    """
+    if workers == 1 or len(fullpaths) <= 1:
+        return [fn(p) for p in fullpaths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, fullpaths))
+
+
+def weekly_amp_summary(df):
+    """
+    Per weekly expiry, in order of first appearance: the first settlement-day
+    close, the after-market open carried forward to that row, and the last
+    after-market open seen. Summaries of consecutive chunks of the history
+    merge with merge_summary into the same diffs as the whole history.
+    """
+    df = df[df['weekday'] == WEDNESDAY]
+    expire = df['expire'].to_numpy()
+
+    # after-market open, carried forward within each expiry
+    after_market_open = df['open'].where(df['trade_time'] == '盤後')
+    carried = after_market_open.groupby(expire, sort=False).ffill()
+
+    # first settlement row of each expiry
+    settled = (df['final_close'] == 0).to_numpy()
+    first = pd.DataFrame(
+        {
+            'settle_close': df['close'].to_numpy()[settled],
+            'settle_amo': carried.to_numpy()[settled],
+        },
+        index=expire[settled],
+    )
+    first = first[~first.index.duplicated(keep='first')]
+
+    summary = first.reindex(pd.unique(expire))
+    summary['has_settle'] = summary.index.isin(first.index)
+    summary['last_amo'] = after_market_open.groupby(expire, sort=False).last()
+    return summary
+
+
+def merge_summary(state, summary):
+    """
+    Fold one chunk's summary into state {expire: [carry, settled]}, in
+    chronological order. Return the newly settled diffs.
+    """
     diffs = []
-    df['after_market_open'] = np.nan
-    df.loc[df['trade_time'] == '盤後', 'after_market_open'] = df.loc[df['trade_time'] == '盤後', 'open']
-    for unique_expire in tqdm(df['expire'].unique()):
-        tmp = df[df['expire'] == unique_expire]
-        tmp['after_market_open'] = tmp['after_market_open'].ffill()
-        val = tmp.loc[tmp['final_close']==0, 'close'] - tmp.loc[tmp['final_close']==0, 'after_market_open'] 
-        if len(val) > 0:
-            diff = val.values[0]
-            if not np.isnan(diff):
+    rows = zip(
+        summary.index.tolist(), summary['has_settle'].tolist(), summary['settle_close'].tolist(),
+        summary['settle_amo'].tolist(), summary['last_amo'].tolist(),
+    )
+    for expire, has_settle, close, amo, last_amo in rows:
+        entry = state.setdefault(expire, [math.nan, False])
+        if has_settle and not entry[1]:
+            entry[1] = True
+            if math.isnan(amo):
+                amo = entry[0]
+            diff = close - amo
+            if not math.isnan(diff):
                 diffs.append(diff)
+        if not math.isnan(last_amo):
+            entry[0] = last_amo
     return diffs
 
+
+def weekly_amp(df):
+    """
+    Settlement-day close minus the after-market open of the same weekly expiry,
+    as a Series indexed by expiry in order of first appearance.
+    """
+    summary = weekly_amp_summary(df)
+    summary = summary[summary['has_settle']]
+    return (summary['settle_close'] - summary['settle_amo']).dropna()
+
+
+def collect_weekly_amp(df):
+    return weekly_amp(df).tolist()
+
+
+def file_summary(fullpath):
+    return weekly_amp_summary(read_filtered(fullpath))
+
+
+def file_signature(fullpath):
+    st = os.stat(fullpath)
+    return st.st_size, st.st_mtime_ns
+
+
+class StdCache:
+    """
+    Per-file memo of the weekly diff summaries plus running moments.
+
+    Each source file's weekly_amp_summary is stored once as <name>.npz under
+    cache_dir and keyed by the file's size and mtime, so a refresh only parses
+    files that are new or changed. Files are merged in name order (the daily
+    dumps are date named); files sorting after everything merged so far are
+    folded into the running count / sum / sum of squares directly, anything
+    else (a changed, removed or back-filled file) replays the cached
+    summaries without reading any CSV again. The moments are
+    volatility.RunningMoments, shared with the live OnlineVol.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.pkl")
+        self.files = {}      # name -> (size, mtime_ns) of the cached summary
+        self.merged = []     # names folded into the moments, in order
+        self.expires = {}    # merge_summary state
+        self.moments = RunningMoments()
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                state = pickle.load(f)
+            self.__dict__.update(state)
+
+    def _npz_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.npz")
+
+    def _save_summary(self, name, summary):
+        np.savez(
+            self._npz_path(name),
+            expire=summary.index.to_numpy().astype(str),
+            has_settle=summary['has_settle'].to_numpy(dtype=bool),
+            settle_close=summary['settle_close'].to_numpy(dtype=float),
+            settle_amo=summary['settle_amo'].to_numpy(dtype=float),
+            last_amo=summary['last_amo'].to_numpy(dtype=float),
+        )
+
+    def _load_summary(self, name):
+        with np.load(self._npz_path(name)) as npz:
+            return pd.DataFrame(
+                {col: npz[col] for col in ('has_settle', 'settle_close', 'settle_amo', 'last_amo')},
+                index=npz['expire'],
+            )
+
+    def _merge(self, name, summary):
+        for diff in merge_summary(self.expires, summary):
+            self.moments.add(diff)
+        self.merged.append(name)
+
+    def update(self, path, files, workers=None):
+        """
+        Bring the cache in line with the files under path, merged in sorted
+        order. New or changed files are parsed on a pool of workers processes.
+        Return the names that had to be parsed.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = sorted(files)
+        for name in [n for n in self.files if n not in files]:
+            del self.files[name]
+            os.remove(self._npz_path(name))
+
+        signatures = {name: file_signature(os.path.join(path, name)) for name in files}
+        stale = [name for name in files if self.files.get(name) != signatures[name]]
+        summaries = load_files([os.path.join(path, name) for name in stale], workers, file_summary)
+
+        parsed = {}
+        for name, summary in zip(stale, summaries):
+            self._save_summary(name, summary)
+            self.files[name] = signatures[name]
+            parsed[name] = summary
+
+        n = len(self.merged)
+        if files[:n] != self.merged or any(name in parsed for name in self.merged):
+            # history itself changed, replay every cached summary
+            self.merged, self.expires = [], {}
+            self.moments = RunningMoments()
+            n = 0
+        for name in files[n:]:
+            summary = parsed[name] if name in parsed else self._load_summary(name)
+            self._merge(name, summary)
+        return list(parsed)
+
+    def save(self):
+        state = {
+            'files': self.files,
+            'merged': self.merged,
+            'expires': self.expires,
+            'moments': self.moments,
+        }
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp, self.index_path)
+
+    def std(self):
+        # population std, same as np.std over the diffs
+        return self.moments.std()
+
+
 if __name__ == "__main__":
-    data = []
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", action="store_true",
+                        help="keep per-file summaries under ./data/.std_cache and only parse new or changed files")
+    parser.add_argument("--workers", type=int, default=None, help="reader processes, defaults to all cores")
+    args = parser.parse_args()
+
     path = "./data"
     files = os.listdir(path)
-    files = [f for f in files if f != '.DS_Store']
-    for file in files:
-        fullpath = os.path.join(path, file)
-        df = pd.read_csv(fullpath)
-        df = preprocess(df)
-        data.append(df)
+    # the TAIFEX daily dumps, whatever else sits in ./data is not read
+    files = sorted(f for f in files if f.endswith('.csv') and os.path.isfile(os.path.join(path, f)))
 
-    fulldf = pd.concat(data)
-    diffs = collect_weekly_amp(fulldf)
+    if args.cache:
+        cache = StdCache(os.path.join(path, ".std_cache"))
+        parsed = cache.update(path, files, args.workers)
+        cache.save()
+        print(f"parsed {len(parsed)} new or changed files, {cache.moments.count} weekly diffs")
+        std_val = cache.std()
+    else:
+        data = load_files([os.path.join(path, f) for f in files], args.workers)
+        fulldf = pd.concat(data, ignore_index=True)
+        diffs = collect_weekly_amp(fulldf)
 
-    std_val = np.std(diffs)
+        std_val = RunningMoments.from_values(diffs).std()
 
     info = {
         "recorded_files" : files,
@@ -77,4 +296,4 @@ if __name__ == "__main__":
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     with open(f"./info_{timestamp}.pkl", "wb") as file:
-        pickle.dump(info, file)
\ No newline at end of file
+        pickle.dump(info, file)
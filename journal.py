@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import queue
+import sqlite3
+import threading
+import traceback
+from typing import Dict, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    level TEXT NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL
+)
+"""
+
+
+class StateJournal:
+    """
+    Append-only journal of level events in SQLite (WAL mode).
+
+    record() only queues the event. A writer thread inserts everything queued
+    in one transaction and commits it; events arriving during that fsync go
+    into the next one (group commit), so the order loop never waits on the
+    disk.
+
+    replay() folds the events of one strategy back into the per-level state
+    the order loops keep in combo_orders:
+
+        armed         ladder laid out           -> open_price
+        triggered     level crossed, entering   -> (kept for the record)
+        opened        entry all filled          -> triggered = True
+        open_partial  entry partly filled       -> open_q
+        covered       cover all filled          -> covered = True
+        close_partial cover partly filled       -> close_q
+
+    An 'armed' event at another open_price starts a new ladder, the level
+    state of the one before it is dropped.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256):
+        self.path = path
+        self.batch_size = batch_size
+        self.stats = {'written': 0, 'commits': 0, 'failed': 0}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.close()
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="state-journal", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # every commit is durable; group commit keeps their number low
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute(SCHEMA)
+        conn.commit()
+        return conn
+
+    def record(self, level: str, event: str, **data) -> None:
+        self._queue.put((time.time(), level, event, json.dumps(data)))
+
+    def replay(self, prefix: str = '') -> Dict[str, Dict]:
+        """
+        Level state rebuilt from the events of levels starting with prefix.
+        Reads the file directly, so it sees everything committed so far.
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT level, event, data FROM events WHERE substr(level, 1, ?) = ? ORDER BY id",
+                (len(prefix), prefix),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        state: Dict[str, Dict] = {}
+        for level, event, data in rows:
+            entry = state.setdefault(level, {})
+            data = json.loads(data)
+            if event == 'armed':
+                if entry.get('open_price', data['open_price']) != data['open_price']:
+                    for name in [name for name in state if name != level and name.startswith(level)]:
+                        del state[name]
+                entry['open_price'] = data['open_price']
+            elif event == 'opened':
+                entry['triggered'] = True
+            elif event == 'open_partial':
+                entry['open_q'] = data['open_q']
+            elif event == 'covered':
+                entry['covered'] = True
+            elif event == 'close_partial':
+                entry['close_q'] = data['close_q']
+        return state
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Commit what is still queued and stop the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        conn = self._connect()
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            try:
+                with conn:
+                    conn.executemany("INSERT INTO events (ts, level, event, data) VALUES (?, ?, ?, ?)", batch)
+                self.stats['written'] += len(batch)
+                self.stats['commits'] += 1
+            except sqlite3.Error:
+                self.stats['failed'] += len(batch)
+                traceback.print_exc()
+        conn.close()
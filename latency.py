@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+now_ns = time.perf_counter_ns
+
+SUB_BUCKETS = 16  # per power of two, values land within 1/16 (~6%) of their bucket
+N_BUCKETS = 64 * SUB_BUCKETS
+
+
+def bucket_index(value: int) -> int:
+    if value < 2 * SUB_BUCKETS:
+        return max(value, 0)
+    shift = value.bit_length() - 5
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+def bucket_value(index: int) -> int:
+    """
+    Middle of the value range of a bucket.
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low + (1 << shift) // 2
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of nanosecond latencies: O(1) record,
+    fixed 1024 counters, percentiles within ~6% from 1 ns to 2**63 ns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        i = bucket_index(value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, q: float) -> int:
+        with self._lock:
+            counts, count, peak = list(self.counts), self.count, self.max
+        if count == 0:
+            return 0
+        target = max(int(q * count + 0.5), 1)
+        if target >= count:
+            return peak
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= target:
+                return min(bucket_value(i), peak)
+        return peak
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count / 1e3 if self.count else 0.0,
+            'p50_us': self.percentile(0.50) / 1e3,
+            'p99_us': self.percentile(0.99) / 1e3,
+            'max_us': self.max / 1e3,
+        }
+
+
+class LatencyMetrics:
+    """
+    Histograms per stage of the tick-to-order path. Stages are created on
+    first use; record takes a duration in perf_counter_ns units, since()
+    the start timestamp of one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, LatencyHistogram] = {}
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        hist = self.stages.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.stages.setdefault(stage, LatencyHistogram())
+        return hist
+
+    def record(self, stage: str, value: int) -> None:
+        self.histogram(stage).record(value)
+
+    def since(self, stage: str, start: int) -> int:
+        end = now_ns()
+        self.histogram(stage).record(end - start)
+        return end
+
+    def summary(self) -> Dict[str, Dict]:
+        return {stage: hist.summary() for stage, hist in list(self.stages.items())}
+
+
+# process-wide metrics the order path reports to
+metrics = LatencyMetrics()
+
+
+class StartupClock:
+    """
+    Phases of the start up, each lap() timing the one since the previous
+    lap; done() records the total since start_ns as the 'startup' stage.
+    """
+
+    def __init__(self, start_ns: Optional[int] = None):
+        self.start = self.last = now_ns() if start_ns is None else start_ns
+        self.phases: Dict[str, float] = {}
+
+    def lap(self, phase: str) -> None:
+        now = now_ns()
+        self.phases[phase] = (now - self.last) / 1e6
+        self.last = now
+
+    def done(self, metrics: LatencyMetrics = metrics) -> float:
+        """
+        Total milliseconds from start to the last lap.
+        """
+        metrics.record('startup', self.last - self.start)
+        return (self.last - self.start) / 1e6
+
+    def __str__(self) -> str:
+        return ", ".join(f"{phase} {ms:.0f} ms" for phase, ms in self.phases.items())
+
+
+class LatencyReporter:
+    """
+    Export metrics.summary() every interval seconds as one JSON line appended
+    to path, and/or serve the latest summary on http://127.0.0.1:<port>/.
+    """
+
+    def __init__(self, metrics: LatencyMetrics = metrics, path: Optional[str] = None,
+                 port: Optional[int] = None, interval: float = 60.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._server = None
+        if port is not None:
+            reporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = json.dumps(reporter.metrics.summary()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="latency-http", daemon=True).start()
+
+        self._thread = threading.Thread(target=self._run, name="latency-reporter", daemon=True)
+        self._thread.start()
+
+    def write(self) -> None:
+        if self.path is None:
+            return
+        line = json.dumps({'time': time.time(), 'stages': self.metrics.summary()})
+        with open(self.path, "a") as f:
+            f.write(line + "\n")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.write()
+        if self._server is not None:
+            self._server.shutdown()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except Exception:
+                traceback.print_exc()
@@ -0,0 +1,148 @@
+import os
+import csv
+import time
+import bisect
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+# Taiwan has no daylight saving, exchange time is always UTC+8
+TAIPEI = datetime.timezone(datetime.timedelta(hours=8))
+
+# sessions of one trading day, seconds from its midnight; the night session
+# opens in the afternoon and runs into the next calendar day
+DAY_SESSION = (8 * 3600 + 45 * 60, 13 * 3600 + 45 * 60)
+NIGHT_SESSION = (15 * 3600, 27 * 3600 + 45 * 60)
+
+
+def _seconds(hhmm: str) -> int:
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def load_calendar_table(path: str) -> Dict[datetime.date, Tuple[str, Optional[int]]]:
+    """
+    date -> (kind, seconds) from a CSV of date,kind,time rows, '#' lines are
+    comments:
+
+        holiday      no session that day, nor the night session opening on it
+        early_close  the day session closes at time (HH:MM)
+        no_night     no night session opens that day
+    """
+    table = {}
+    with open(path, newline='') as f:
+        rows = csv.reader(line for line in f if line.strip() and not line.lstrip().startswith('#'))
+        for row in rows:
+            date, kind = row[0].strip(), row[1].strip()
+            if kind not in ('holiday', 'early_close', 'no_night'):
+                raise ValueError(f"Unknown calendar entry {kind} on {date}")
+            hhmm = row[2].strip() if len(row) > 2 else ''
+            table[datetime.date.fromisoformat(date)] = (kind, _seconds(hhmm) if hhmm else None)
+    return table
+
+
+class MarketCalendar:
+    """
+    TAIFEX session calendar.
+
+    The holiday table is applied once to lay out every session of the days
+    around the current date as a flat sorted list of epoch seconds,
+    [open, close, open, close, ...], so the time t is in a session when
+    bisect_right(boundaries, t) is odd. The range is rebuilt for the next
+    year when the clock runs past it.
+
+    Weekdays are trading days unless the table says otherwise; each has a
+    day session (DAY_SESSION) and a night session (NIGHT_SESSION) opening
+    at 15:00 and closing the next morning.
+    """
+
+    def __init__(self, table: Optional[Dict] = None, days: int = 366,
+                 day_session=DAY_SESSION, night_session=NIGHT_SESSION):
+        self.table = table or {}
+        self.days = days
+        self.day_session = day_session
+        self.night_session = night_session
+        self.boundaries: List[int] = []
+        self._start = self._end = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[str], **kwargs) -> "MarketCalendar":
+        """
+        Calendar of the table at path; weekends only when there is none.
+        """
+        table = load_calendar_table(path) if path and os.path.exists(path) else {}
+        return cls(table, **kwargs)
+
+    def sessions_of(self, date: datetime.date) -> List[Tuple[int, int]]:
+        if date.weekday() >= 5:
+            return []
+        kind, seconds = self.table.get(date, (None, None))
+        if kind == 'holiday':
+            return []
+
+        midnight = int(datetime.datetime.combine(date, datetime.time(), TAIPEI).timestamp())
+        day_open, day_close = self.day_session
+        if kind == 'early_close':
+            day_close = seconds
+        sessions = [(midnight + day_open, midnight + day_close)]
+        if kind != 'no_night':
+            night_open, night_close = self.night_session
+            sessions.append((midnight + night_open, midnight + night_close))
+        return sessions
+
+    def build(self, start: datetime.date) -> None:
+        """
+        Lay out the sessions of the days from the day before start.
+        """
+        first = start - datetime.timedelta(days=1)
+        boundaries = []
+        for i in range(self.days + 1):
+            for open_ts, close_ts in self.sessions_of(first + datetime.timedelta(days=i)):
+                if boundaries and open_ts <= boundaries[-1]:
+                    # touching or overlapping sessions merge
+                    boundaries[-1] = max(boundaries[-1], close_ts)
+                else:
+                    boundaries += [open_ts, close_ts]
+        self.boundaries = boundaries
+        self._start = int(datetime.datetime.combine(start, datetime.time(), TAIPEI).timestamp())
+        # every time before the last open still has a boundary after it
+        self._end = boundaries[-2] if boundaries else self._start
+
+    def _index(self, ts: float) -> int:
+        if not self._start <= ts < self._end:
+            self.build(datetime.datetime.fromtimestamp(ts, TAIPEI).date())
+        return bisect.bisect_right(self.boundaries, ts)
+
+    def is_open(self, ts: Optional[float] = None) -> bool:
+        return self._index(time.time() if ts is None else ts) % 2 == 1
+
+    def seconds_until_open(self, ts: Optional[float] = None) -> float:
+        """
+        0 while a session is open.
+        """
+        ts = time.time() if ts is None else ts
+        i = self._index(ts)
+        if i % 2 == 1:
+            return 0.0
+        return self.boundaries[i] - ts
+
+    def seconds_until_change(self, ts: Optional[float] = None) -> float:
+        """
+        Seconds to the next session open or close, whichever comes first.
+        """
+        ts = time.time() if ts is None else ts
+        return self.boundaries[self._index(ts)] - ts
+
+    def trading_day(self, ts: Optional[float] = None) -> datetime.date:
+        """
+        Trading day of the session in progress or the next one. A night
+        session belongs to the trading day of the next day session.
+        """
+        ts = time.time() if ts is None else ts
+        date = datetime.datetime.fromtimestamp(ts, TAIPEI).date()
+        for _ in range(self.days):
+            sessions = self.sessions_of(date)
+            if sessions and sessions[0][1] > ts:
+                return date
+            date += datetime.timedelta(days=1)
+        return date
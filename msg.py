@@ -1,12 +1,207 @@
+import time
+import queue
+import threading
+import itertools
+import traceback
+from typing import Dict, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+
+TELEGRAM_API = "https://api.telegram.org"
+# Telegram rejects texts longer than 4096 characters
+MAX_MESSAGE_LEN = 4000
+
+
+def escape_markdown(message):
+    return message.replace("*", "\\*").replace("_", "\\_")
 
 def send_to_telegram(bot_token, chat_id, message):
-    message = message.replace("*", "\\*").replace("_", "\\_")
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    message = escape_markdown(message)
+    url = f"{TELEGRAM_API}/bot{bot_token}/sendMessage"
     payload = {
         'chat_id': chat_id,
         'text': message,
         'parse_mode': 'Markdown'  # Optional: for formatting text
     }
     response = requests.post(url, data=payload)
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+
+class TelegramNotifier:
+    """
+    Non-blocking Telegram sender.
+
+    notify() only puts the message on a bounded queue and returns. A background
+    thread drains the queue, merges the pending messages into one sendMessage
+    call and posts it through a pooled keep-alive session, retrying with
+    exponential backoff on connection errors, 429 and 5xx replies.
+
+    Messages notified with the same key replace each other while still pending,
+    so a burst of "partial filled, N lefted" updates for one level ends up as
+    the latest one only. base_url can point at a local HTTP server for testing.
+
+    stats holds the counters: queued, sent, dropped, coalesced, failed,
+    retries, and the enqueue-to-delivery latency (latency_sum / latency_max,
+    seconds, per delivered message).
+    """
+
+    def __init__(
+        self,
+        bot_token: str,
+        chat_id: str,
+        base_url: str = TELEGRAM_API,
+        maxsize: int = 1000,
+        batch_size: int = 20,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 5.0,
+    ):
+        self.url = f"{base_url}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'failed': 0,
+            'retries': 0,
+            'latency_sum': 0.0,
+            'latency_max': 0.0,
+        }
+        self._lock = threading.Lock()
+        self._latest: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._queue: "queue.Queue" = queue.Queue(maxsize)
+        self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+        self._thread.start()
+
+    def notify(self, message: str, key: Optional[str] = None) -> bool:
+        """
+        Queue a message, return False when it was dropped because the queue is full.
+        """
+        seq = next(self._seq)
+        prev = None
+        if key is not None:
+            # mark before queueing, the sender may pick the message up right away
+            with self._lock:
+                prev = self._latest.get(key)
+                self._latest[key] = seq
+
+        try:
+            self._queue.put_nowait((key, seq, message, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+                if key is not None and self._latest.get(key) == seq:
+                    if prev is None:
+                        del self._latest[key]
+                    else:
+                        self._latest[key] = prev
+            return False
+
+        with self._lock:
+            self.stats['queued'] += 1
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Deliver what is still queued and stop the sender thread.
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self.session.close()
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            try:
+                self._send_batch(batch)
+            except Exception:
+                traceback.print_exc()
+
+    def _send_batch(self, batch) -> None:
+        texts, enqueued = [], []
+        with self._lock:
+            for key, seq, message, t in batch:
+                if key is not None:
+                    if self._latest.get(key) != seq:
+                        self.stats['coalesced'] += 1
+                        continue
+                    del self._latest[key]
+                texts.append(escape_markdown(message))
+                enqueued.append(t)
+
+        chunk, chunk_t, size = [], [], 0
+        for text, t in zip(texts, enqueued):
+            if chunk and size + len(text) + 1 > MAX_MESSAGE_LEN:
+                self._post("\n".join(chunk), chunk_t)
+                chunk, chunk_t, size = [], [], 0
+            chunk.append(text)
+            chunk_t.append(t)
+            size += len(text) + 1
+        if chunk:
+            self._post("\n".join(chunk), chunk_t)
+
+    def _post(self, text, enqueued) -> None:
+        payload = {
+            'chat_id': self.chat_id,
+            'text': text,
+            'parse_mode': 'Markdown'
+        }
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            try:
+                response = self.session.post(self.url, data=payload, timeout=self.timeout)
+                if response.status_code == 429:
+                    retry_after = response.json().get('parameters', {}).get('retry_after')
+                    if retry_after is not None:
+                        delay = float(retry_after)
+                elif response.status_code < 500:
+                    self._record_delivery(enqueued, response.ok)
+                    return
+            except (requests.RequestException, ValueError):
+                pass
+
+            if attempt < self.max_retries:
+                with self._lock:
+                    self.stats['retries'] += 1
+                time.sleep(delay)
+
+        self._record_delivery(enqueued, False)
+
+    def _record_delivery(self, enqueued, ok) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if not ok:
+                self.stats['failed'] += len(enqueued)
+                return
+            self.stats['sent'] += len(enqueued)
+            for t in enqueued:
+                latency = now - t
+                self.stats['latency_sum'] += latency
+                self.stats['latency_max'] = max(self.stats['latency_max'], latency)
@@ -0,0 +1,188 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class _OrderState:
+    __slots__ = ('original_qty', 'filled_qty', 'cancel_qty', 'n_msgs', 'n_new', 'done')
+
+    def __init__(self):
+        self.original_qty = 0
+        self.filled_qty = 0
+        self.cancel_qty = 0
+        self.n_msgs = 0
+        self.n_new = 0
+        self.done = threading.Event()
+
+
+class ComboOrderHandler:
+    """
+    組合期權 IOC 訂單狀態追蹤器，依訂單編號分開統計。
+
+    使用流程：
+      1. api.set_order_callback(order_callback)，在回呼中呼叫 handler.handle_message(msg)
+      2. 發單後以 handler.wait(order_id, timeout) 等待該筆訂單的最終回報
+      3. 呼叫 handler.evaluate(order_id) 取得結果，用完以 handler.discard(order_id) 釋放
+
+    每筆回報只更新其訂單的累計數量（O(1)），不同訂單或前一筆 IOC 的延遲回報
+    不會互相影響。回呼執行緒與下單執行緒可同時使用（thread-safe）。
+
+    方法
+    -------
+    handle_message(msg: Dict) -> None
+        依 order_id（trade 訊息為 trade_id）累加數量
+
+    wait(order_id: str, timeout: float) -> bool
+        等待每一腳的 New 訊息都已收到，且成交量加取消量達到原始委託量，
+        逾時回傳 False；成交或取消回報可能比 New 先到
+
+    evaluate(order_id: str) -> Dict
+        回傳該筆訂單目前的統計結果，包含三種可能狀態：
+        'filled'   - 全部成交
+        'cancelled'- 全部取消
+        'partial'  - 部分成交
+
+    evaluate 返回欄位
+    ----------------
+    order_id     : str    訂單編號
+    status       : str    訂單狀態 ('filled'/'cancelled'/'partial')
+    original_qty : int    原始委託總量（New 訊息之總和）
+    filled_qty   : int    成交量（trade 訊息之總和）
+    cancel_qty   : int    取消量（Cancel 訊息之 cancel_quantity 總和）
+    left_q       : int    未成交組合口數（兩腳合計量折半）；尚缺某腳 New 時，
+                          原始委託量以已收到各腳的平均推估
+    """
+
+    def __init__(self, max_orders: int = 1000, legs: int = 2):
+        self._lock = threading.Lock()
+        # 保留最近 max_orders 筆訂單，延遲回報不會無限累積
+        self._orders: "OrderedDict[str, _OrderState]" = OrderedDict()
+        self.max_orders = max_orders
+        # 每筆組合單各腳各有一則 New 訊息
+        self.legs = legs
+
+    @staticmethod
+    def order_id(msg: Dict) -> str:
+        if 'operation' in msg:
+            return msg['order']['id']
+        return msg.get('trade_id', '')
+
+    def _state(self, order_id: str) -> _OrderState:
+        state = self._orders.get(order_id)
+        if state is None:
+            state = self._orders[order_id] = _OrderState()
+            while len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+        return state
+
+    def handle_message(self, msg: Dict) -> None:
+        """
+        處理單筆交易所回覆訊息，更新其訂單的累計數量。
+        """
+        order_id = self.order_id(msg)
+        with self._lock:
+            state = self._state(order_id)
+            state.n_msgs += 1
+            if 'operation' in msg:
+                op = msg['operation'].get('op_type')
+                if op == 'New':
+                    # 僅從 New 訊息累加原始數量
+                    state.original_qty += msg['order'].get('quantity', 0)
+                    state.n_new += 1
+                elif op == 'Cancel':
+                    # 從 Cancel 訊息累加取消數量
+                    state.cancel_qty += msg.get('status', {}).get('cancel_quantity', 0)
+            else:
+                # trade 訊息
+                state.filled_qty += msg.get('quantity', 0)
+
+            # 各腳 New 都到齊後原始數量才完整
+            if state.n_new >= self.legs and state.filled_qty + state.cancel_qty >= state.original_qty:
+                state.done.set()
+
+    def wait(self, order_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        等待訂單全部成交或取消，回報先到也能立即返回。
+        """
+        with self._lock:
+            state = self._state(order_id)
+        return state.done.wait(timeout)
+
+    def evaluate(self, order_id: str) -> Dict:
+        """
+        回傳該筆訂單目前的狀態。
+        """
+        with self._lock:
+            state = self._orders.get(order_id)
+            if state is None or state.n_msgs == 0:
+                raise ValueError(f"No messages to evaluate for order {order_id}.")
+            if state.n_new == 0:
+                raise ValueError(f"No New message to evaluate for order {order_id}.")
+            original_qty = state.original_qty
+            filled_qty = state.filled_qty
+            cancel_qty = state.cancel_qty
+            complete = state.n_new >= self.legs
+            expected_qty = original_qty if complete else original_qty * self.legs // state.n_new
+
+        # 判斷狀態
+        if complete and filled_qty == original_qty:
+            status = 'filled'
+        elif complete and cancel_qty == original_qty:
+            status = 'cancelled'
+        else:
+            status = 'partial'
+
+        return {
+            'order_id': order_id,
+            'status': status,
+            'original_qty': original_qty,
+            'filled_qty': filled_qty,
+            'cancel_qty': cancel_qty,
+            'left_q': max(expected_qty - filled_qty, 0)//self.legs,
+        }
+
+    def discard(self, order_id: str) -> None:
+        with self._lock:
+            self._orders.pop(order_id, None)
+
+
+class AsyncComboOrderHandler(ComboOrderHandler):
+    """
+    ComboOrderHandler for the asyncio runtime: handle_message is bridged onto
+    the event loop, and wait_for(order_id, timeout) awaits the final reply
+    instead of blocking a thread on it.
+    """
+
+    def __init__(self, max_orders: int = 1000):
+        super().__init__(max_orders)
+        self._waiters: Dict[str, "asyncio.Future"] = {}
+
+    def handle_message(self, msg: Dict) -> None:
+        super().handle_message(msg)
+        order_id = self.order_id(msg)
+        waiter = self._waiters.get(order_id)
+        if waiter is not None and not waiter.done():
+            state = self._orders.get(order_id)
+            if state is not None and state.done.is_set():
+                waiter.set_result(True)
+
+    async def wait_for(self, order_id: str, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            state = self._state(order_id)
+        if state.done.is_set():
+            return True
+        waiter = self._waiters.get(order_id)
+        if waiter is None:
+            waiter = self._waiters[order_id] = asyncio.get_running_loop().create_future()
+        try:
+            # shielded, a timed out wait is picked up by the next one
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    def discard(self, order_id: str) -> None:
+        super().discard(order_id)
+        waiter = self._waiters.pop(order_id, None)
+        if waiter is not None:
+            waiter.cancel()
@@ -0,0 +1,122 @@
+import math
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+class QuoteCache:
+    """
+    Best bid / ask of the option legs of the armed ladders.
+
+    Every leg gets a slot when it is registered; quotes live in one float64
+    array of rows (bid, ask, update time), so an update is a single row
+    assignment and reading a combo quote is two row reads, no allocation.
+    Slots are looked up by contract code, or by (side, strike) within a
+    series.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self._lock = threading.Lock()
+        self._quotes = np.zeros((capacity, 3), dtype=np.float64)
+        self._slots: Dict[str, int] = {}
+        self._strikes: Dict[Tuple[str, str, int], int] = {}
+
+    def register(self, contract) -> int:
+        """
+        Slot of an option contract (code, symbol like TXO202505 21000C).
+        """
+        slot = self._slots.get(contract.code)
+        if slot is not None:
+            return slot
+        with self._lock:
+            slot = self._slots.get(contract.code)
+            if slot is None:
+                slot = len(self._slots)
+                if slot == len(self._quotes):
+                    grown = np.zeros((2 * len(self._quotes), 3), dtype=np.float64)
+                    grown[:slot] = self._quotes
+                    self._quotes = grown
+                self._slots[contract.code] = slot
+                symbol = contract.symbol
+                self._strikes[(symbol[:9], symbol[-1], int(symbol[9:-1]))] = slot
+        return slot
+
+    def slot(self, series: str, side: str, strike: int) -> Optional[int]:
+        """
+        Slot of side ('C'/'P') at strike in series (e.g. TXO202505).
+        """
+        return self._strikes.get((series, side, strike))
+
+    def update(self, code: str, bid: float, ask: float, ts: Optional[float] = None) -> None:
+        slot = self._slots.get(code)
+        if slot is not None:
+            self._quotes[slot] = (bid, ask, time.time() if ts is None else ts)
+
+    def on_bidask(self, exchange, bidask) -> None:
+        """
+        shioaji BidAskFOPv1 callback, keeps the best level.
+        """
+        slot = self._slots.get(bidask.code)
+        if slot is not None:
+            self._quotes[slot] = (float(bidask.bid_price[0]), float(bidask.ask_price[0]), time.time())
+
+    def quote(self, slot: int) -> Tuple[float, float, float]:
+        bid, ask, ts = self._quotes[slot].tolist()
+        return bid, ask, ts
+
+    def spread(self, short_slot: int, long_slot: int, max_age: Optional[float] = None) -> Optional[Tuple[float, float]]:
+        """
+        (mid, width) of the spread short_slot minus long_slot, width being
+        both legs' bid / ask spreads together, or None without a two-sided
+        quote on both legs (or one older than max_age seconds).
+        """
+        quotes = self._quotes
+        bid1, ask1, ts1 = quotes[short_slot].tolist()
+        bid2, ask2, ts2 = quotes[long_slot].tolist()
+        if bid1 <= 0 or ask1 <= 0 or ask2 <= 0 or ask1 < bid1 or ask2 < bid2:
+            return None
+        if max_age is not None and time.time() - min(ts1, ts2) > max_age:
+            return None
+        # a far OTM long leg may have no bid, it counts as 0
+        bid2 = max(bid2, 0.0)
+        mid = (bid1 + ask1) / 2 - (bid2 + ask2) / 2
+        width = (ask1 - bid1) + (ask2 - bid2)
+        return mid, width
+
+
+def tick_size(price: float) -> float:
+    """
+    TXO tick size at price.
+    """
+    if price < 10:
+        return 0.1
+    if price < 50:
+        return 0.5
+    if price < 500:
+        return 1
+    if price < 1000:
+        return 5
+    return 10
+
+
+def spread_limit(mid: float, width: float, attempt: int, order_type: str = 'open', steps: int = 2,
+                 floor: Optional[float] = None) -> float:
+    """
+    IOC limit of the attempt-th order (from 1) on a spread quoted at mid /
+    width: the first at mid, then steps attempts to cross to the far side,
+    where it stays. Entries sell the spread (credit, walks down), covers buy
+    it back (debit, walks up); prices round to the tick toward the far side.
+    An entry does not go below floor, to the tick.
+    """
+    reach = min((attempt - 1) / steps, 1.0) * width / 2
+    if order_type == 'open':
+        price = mid - reach
+        if floor is not None:
+            price = max(price, floor)
+        tick = tick_size(max(price, 0))
+        return max(round(math.floor(price / tick + 1e-9) * tick, 1), 0.1)
+    price = mid + reach
+    tick = tick_size(price)
+    return round(math.ceil(price / tick - 1e-9) * tick, 1)
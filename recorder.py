@@ -0,0 +1,122 @@
+import os
+import glob
+import threading
+import traceback
+from typing import Optional
+
+import numpy as np
+
+
+TICK_DTYPE = np.dtype([('ts', '<i8'), ('close', '<f8'), ('volume', '<i8')])
+DAY_NS = 86400 * 10**9
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+
+def local_ns(dt):
+    """
+    Naive exchange-local datetime (tick.datetime) as int nanoseconds.
+    """
+    seconds = (dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+    return seconds * 10**9 + dt.microsecond * 1000
+
+
+class TickRecorder:
+    """
+    Record one contract's ticks from the quote callback.
+
+    record() writes ts / close / volume into preallocated ring buffers and
+    returns; it never takes a lock or touches the disk. A flusher thread
+    wakes every flush_interval seconds and appends what was recorded to
+    <directory>/<YYYYMMDD>.bin, one file per calendar day of the tick
+    timestamps, as packed TICK_DTYPE records that read_ticks maps back with
+    np.memmap without copying.
+
+    The ring holds capacity ticks; if the flusher falls that far behind,
+    new ticks are counted in stats['dropped'] instead of blocking.
+    """
+
+    def __init__(self, directory: str, capacity: int = 1 << 18, flush_interval: float = 1.0):
+        self.directory = directory
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._ts = np.zeros(capacity, dtype=np.int64)
+        self._close = np.zeros(capacity, dtype=np.float64)
+        self._volume = np.zeros(capacity, dtype=np.int64)
+        # written only by record (head) and by the flusher (tail)
+        self._head = 0
+        self._tail = 0
+        self.stats = {'recorded': 0, 'dropped': 0, 'flushed': 0}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"tick-recorder-{os.path.basename(directory)}", daemon=True)
+        self._thread.start()
+
+    def record(self, tick) -> None:
+        head = self._head
+        if head - self._tail >= self.capacity:
+            self.stats['dropped'] += 1
+            return
+        i = head % self.capacity
+        self._ts[i] = local_ns(tick.datetime)
+        self._close[i] = tick.close
+        self._volume[i] = tick.volume
+        # publish only after the slot is complete
+        self._head = head + 1
+        self.stats['recorded'] += 1
+
+    def flush(self) -> None:
+        head, tail = self._head, self._tail
+        if head == tail:
+            return
+        idx = np.arange(tail, head) % self.capacity
+        records = np.empty(len(idx), dtype=TICK_DTYPE)
+        records['ts'] = self._ts[idx]
+        records['close'] = self._close[idx]
+        records['volume'] = self._volume[idx]
+        self._tail = head
+
+        days = records['ts'] // DAY_NS
+        bounds = np.flatnonzero(np.diff(days)) + 1
+        for chunk in np.split(records, bounds):
+            day = np.datetime64(int(chunk['ts'][0]), 'ns').astype('datetime64[D]')
+            path = os.path.join(self.directory, f"{str(day).replace('-', '')}.bin")
+            with open(path, "ab") as f:
+                chunk.tofile(f)
+        self.stats['flushed'] += len(records)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the flusher and write out what is left.
+        """
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+
+def read_ticks(path: str) -> np.memmap:
+    """
+    Zero-copy view of one recorded day, fields ts / close / volume. A record
+    cut short by a crash at the end of the file is left out.
+    """
+    n = os.path.getsize(path) // TICK_DTYPE.itemsize
+    return np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(n,))
+
+
+def read_tick_dir(directory: str) -> np.ndarray:
+    """
+    Every recorded day under directory, in date order, as one array.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, "*.bin")))
+    days = [read_ticks(p) for p in paths if os.path.getsize(p) >= TICK_DTYPE.itemsize]
+    if not days:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.concatenate(days)
@@ -1,338 +1,422 @@
-import os
 import time
+# process start for the startup timing, taken before the imports
+STARTED_NS = time.perf_counter_ns()
+import os
+import copy
+import math
+import asyncio
+import json
 import datetime
-import operator
-import numpy as np
-from functools import reduce
+import importlib
+import threading
 from dotenv import load_dotenv
-from collections import defaultdict
 from typing import Dict, List, Callable, Optional
-
-import shioaji as sj
-from shioaji import TickFOPv1, Exchange
-from shioaji.constant import Action, StockPriceType, OrderType
-
-from msg import send_to_telegram
+from concurrent.futures import Future
 
 load_dotenv()
 
+# BROKER=sim runs against the in-process simulator instead of shioaji
+SIMULATED = os.environ.get("BROKER") == "sim"
+if SIMULATED:
+    import simulator as sj
+else:
+    # shioaji, imported by __main__ right before it logs in, so tools and
+    # tests importing run never load it
+    sj = None
+
+# msg (requests) and runtime are imported where they are used, only when
+# they are used
+from orders import ComboOrderHandler, AsyncComboOrderHandler
+from strategy import (
+    LADDER, market, strike_chain, calculate_ranges, build_combo_orders, combo_order, order_prices,
+)
+from trigger import TriggerEngine
+from scheduler import ExecutionScheduler
+from market_calendar import MarketCalendar
+from journal import StateJournal
+from recorder import TickRecorder, local_ns
+from volatility import OnlineVol, RunningMoments, load_weekly_moments
+from latency import LatencyReporter, StartupClock, metrics, now_ns
+from quotes import QuoteCache, spread_limit
+from gateway import OrderGateway, COVER, ENTRY
+
 
 def timestamp_2_time(ts):
     return datetime.datetime.fromtimestamp(ts / 1e9).strftime('%Y-%m-%d %H:%M:%S.%f')
 
 
-BOT_TOKEN = os.environ["BOT_TOKEN"]
-CHAT_ID = os.environ["CHAT_ID"]
+BOT_TOKEN = os.environ.get("BOT_TOKEN") if SIMULATED else os.environ["BOT_TOKEN"]
+CHAT_ID = os.environ.get("CHAT_ID") if SIMULATED else os.environ["CHAT_ID"]
+
+# AsyncRuntime when RUNTIME=asyncio, the callbacks then hop onto its loop
+runtime = None
+# QuoteCache of the ladder legs, None when QUOTE_PRICING=0
+quotes = None
+# leg quotes older than this many seconds are not priced off (QUOTE_MAX_AGE)
+quote_max_age = 2.0
+# an entry priced off quotes asks at least this part of its formula price (QUOTE_MIN_CREDIT)
+min_credit = 0.8
+# directory of the strike chain snapshots, None to walk the contract tree on every start
+chain_dir = None
+
+def quote_callback(exchange, tick):
+    if runtime is not None:
+        runtime.post(runner.on_tick, exchange, tick)
+        return
+    runner.on_tick(exchange, tick)
+def bidask_callback(exchange, bidask):
+    if runtime is not None:
+        runtime.post(quotes.on_bidask, exchange, bidask)
+        return
+    quotes.on_bidask(exchange, bidask)
+def order_callback(stat, msg):
+    if runtime is not None:
+        runtime.post(handle_order_message, msg)
+        return
+    handle_order_message(msg)
 
-ops = {
-        ">": operator.gt,
-        "<": operator.lt,
-        "==": operator.eq,
-        ">=": operator.ge,
-        "<=": operator.le,
-        "!=": operator.ne
-}
+def handle_order_message(msg):
+    start = now_ns()
+    coh.handle_message(msg)
+    metrics.since('order_callback', start)
 
-class market:
+class ComboTemplate:
+    """
+    Combo contract and IOC order of one spread in one direction, built once
+    when the ladder is armed. place() only sets price and quantity, on a
+    shallow copy of the order so the trade of every attempt keeps its own.
+    """
 
-    def __init__(self):
+    def __init__(self, api, combo, order_type='open'):
+        self.api = api
+        self.order_type = order_type
+        self.legs = (combo.c1, combo.c2)
+        # budget key of the order gateway
+        self.account = getattr(getattr(api, 'futopt_account', None), 'account_id', None)
+        # QuoteCache slots of the two legs, set while live quotes are kept
+        self.slots = None
+
+        leg1_act = 'Sell' if order_type == 'open' else 'Buy'
+        leg2_act = 'Buy' if order_type == 'open' else 'Sell'
+        otype = sj.constant.FuturesOCType.New if order_type == 'open' else sj.constant.FuturesOCType.Cover
+
+        self.contract = sj.contracts.ComboContract(
+            legs=[
+                sj.contracts.ComboBase(action=leg1_act, **combo.c1.dict()),
+                sj.contracts.ComboBase(action=leg2_act, **combo.c2.dict()),
+            ]
+        )
+        self.order = api.ComboOrder(
+            price_type="LMT",
+            price=0,
+            quantity=1,
+            order_type="IOC",
+            octype=otype,
+        )
+        # pydantic v2 name first, v1 otherwise; neither re-validates
+        self._copy = getattr(self.order, 'model_copy', None) or self.order.copy
+
+    def place(self, p, q):
+        order = self._copy(update={'price': p, 'quantity': q})
+        return self.api.place_comboorder(self.contract, order)
+
+
+_templates: Dict[tuple, ComboTemplate] = {}
+
+
+def combo_template(api, combo, order_type='open'):
+    """
+    The ComboTemplate of a combo_order, shared by every level (and strategy)
+    trading the same two legs in the same direction.
+    """
+    key = (combo.c1.symbol, combo.c2.symbol, order_type)
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = ComboTemplate(api, combo, order_type)
+    return template
 
-        self.exchange=None
-        self.close=None
-    
-    def update(self, exchange, tick):
-        self.exchange = exchange
-        self.close = int(tick.close)
 
-def quote_callback(exchange:Exchange, tick:TickFOPv1):
-    mkt.update(exchange, tick)    
-def order_callback(stat, msg):
-    coh.handle_message(msg)
+def level_templates(api, order_info):
+    """
+    Templates of a level's entry and cover, with the quote slots of their
+    legs while live quotes are kept.
+    """
+    order_info['enter_template'] = combo_template(api, order_info['enter_order'], 'open')
+    if order_info['stop_order'] is not None:
+        order_info['stop_template'] = combo_template(api, order_info['stop_order'], 'close')
+    if quotes is not None:
+        for key in ('enter_template', 'stop_template'):
+            if key in order_info:
+                template = order_info[key]
+                template.slots = tuple(quotes.register(leg) for leg in template.legs)
 
-def get_bear_call_spread(price, calls):
-    p1,p2=None, None
-    for i in range(len(calls)):
-        call = calls[i]
-        if i>0:
-            prev_call = calls[i-1]
-        else:
-            prev_call = None
-        
-        if prev_call is not None and price < call and price > prev_call:
-            p1 = call
-            if i+1 < len(calls):
-                p2 = calls[i+1]
-            else:
-                p2 = None
-            break
-    return p1, p2
-
-def get_bull_put_spread(price, puts):
-    p1, p2 = None, None
-    for i in range(len(puts)):
-        put = puts[i]
-        if i>0:
-            prev_put = puts[i-1]
-        else:
-            prev_put = None
-        if prev_put is not None and price < put and price >prev_put:
-            p1 = prev_put
-            if i-2 >= 0:
-                p2 = puts[i-2]
-            else:
-                p2 = None
-            break
-    return p1, p2
 
+def limit_price(template, attempt, fallback):
+    """
+    Limit of the attempt-th IOC (from 1) of template: priced off the live
+    spread quote of its legs while both have one no older than
+    quote_max_age, else fallback, the formula price the retry loop walks.
+    An entry never sells below min_credit of fallback.
+    """
+    if template.slots is None:
+        return fallback
+    quote = quotes.spread(*template.slots, max_age=quote_max_age)
+    if quote is None:
+        return fallback
+    mid, width = quote
+    floor = min_credit * fallback if template.order_type == 'open' else None
+    return spread_limit(mid, width, attempt, template.order_type, floor=floor)
 
-def calculate_ranges(open_price, std_val):
 
-    p5 = std_val*0.5
+def send_order(template, p, q, fired_ns=None):
+    """
+    template.place through the order gateway, with its latency recorded.
+    Covers go ahead of entries. fired_ns, the trigger time of the level, is
+    passed for its first order to record tick_to_open / tick_to_close.
+    """
+    start = now_ns()
+    future = gateway.submit(
+        template.place, p, q,
+        priority=COVER if template.order_type == 'close' else ENTRY,
+        account=template.account,
+    )
+    order_id = future.result().order.id
+    sent = metrics.since('place_order', start)
+    if fired_ns is not None:
+        metrics.record(f'tick_to_{template.order_type}', sent - fired_ns)
+    return order_id, sent
 
-    first_bounds = [open_price+p5, open_price-p5]
-    second_bounds = [first_bounds[0]+p5, first_bounds[-1]-p5]
-    third_bounds = [second_bounds[0]+std_val, second_bounds[-1]-std_val]
-    forth_bounds = [third_bounds[0]+std_val, third_bounds[-1]-std_val]
 
-    total_bounds = np.concatenate([first_bounds, second_bounds, third_bounds, forth_bounds])
-    return sorted(total_bounds)
+def entry_result(order, contract_name, result):
+    """
+    Apply the evaluated reply of one entry IOC to its level, True when the
+    level is all filled.
+    """
+    if result['status'] == 'filled':
+        order['triggered'] = True
+        order['entered'].set_result(True)
+        journal.record(contract_name, 'opened')
+        notifier.notify(f"{contract_name} orders are all filled!")
+        #send open filled message to telegram
+        return True
+    if result['status'] == 'partial':
+        open_q = order['open_q'] = result['left_q']
+        journal.record(contract_name, 'open_partial', open_q=open_q)
+        notifier.notify(f"{contract_name} orders are partial filled, {open_q} lefted!", key=f"{contract_name}-open")
+        #send partial filled message to telegram
+    return False
+
+
+def cover_result(order, contract_name, result):
+    """
+    Apply the evaluated reply of one cover IOC to its level, True when the
+    previous level is all bought back.
+    """
+    if result['status'] == 'filled':
+        order['covered'] = True
+        journal.record(contract_name, 'covered')
+        notifier.notify(f"{contract_name} previous order are all filled!")
+        #send close filled message to telegram
+        return True
+    if result['status'] == 'partial':
+        close_q = order['close_q'] = result['left_q']
+        journal.record(contract_name, 'close_partial', close_q=close_q)
+        notifier.notify(f"{contract_name} previous order are partial filled, {close_q} lefted!", key=f"{contract_name}-close")
+        #send partial filled message to telegram
+    return False
+
+
+class LevelAttempts:
+    """
+    The IOC retry loop of one triggered level, for its entry (order_type
+    'open') or its cover ('close'), shared by the threaded workflows and the
+    asyncio tasks; those only place the orders and wait for their replies.
 
-def get_options(contract, contract_name='TXO', contract_month='202505'):
-    options = defaultdict(dict)
-    options['C'] = {}
-    options['P'] = {}
+    next_order() is the next IOC to place, None while one is pending: an IOC
+    without final reply is waited on again, never stacked. step() applies
+    one wait. Every 50 attempts the entry asks 1 less, the cover pays 1 more.
+    """
 
+    def __init__(self, combo_orders, contract_name, order_type, order_trial_limit=200):
+        order = self.order = combo_orders[contract_name]
+        self.contract_name = contract_name
+        self.order_type = order_type
+        self.order_trial_limit = order_trial_limit
+        self.order_ids = []
+        self.pending = None
+        self.sent = None
+        self.fired_ns = order.get('fired_ns')
+        self.trial_time = 1
+
+        if order_type == 'open':
+            self.template, self.price, self.q = order['enter_template'], order['open_price'], order['open_q']
+            print(f"{contract_name} is triggered with {order['trigger_price']} and {self.price} / {self.q}")
+        else:
+            self.template, self.price, self.q = order['stop_template'], order['close_price'], order['close_q']
+            self._closing()
 
-    for key in contract.keys():
-        cname = key[:3]
-        dmonth = key[3:9]
-        if cname != contract_name or dmonth != contract_month:
-            continue
+    def left(self):
+        return self.trial_time < self.order_trial_limit
 
-        price = key[9:-1]
-        side = key[-1]
-        options[side][int(price)] = key
-    return options
+    def next_order(self):
+        """
+        send_order arguments of the IOC to place, None while one is pending.
+        """
+        if self.pending is not None:
+            return None
+        price = limit_price(self.template, len(self.order_ids) + 1, self.price)
+        fired_ns, self.fired_ns = self.fired_ns, None
+        return self.template, price, self.q, fired_ns
 
-class combo_order:
+    def placed(self, order_id, sent):
+        self.pending, self.sent = order_id, sent
+        self.order_ids.append(order_id)
 
-    def __init__(self, contract, p, side=0, option_prices=[], option_dict={}):
-        #side
-        #   0 : call
-        #   1 : put
+    def step(self, done):
+        """
+        Apply the final reply of the pending IOC when done, True once the
+        level is all filled.
+        """
+        if done:
+            start = metrics.since('order_reply', self.sent)
+            result = coh.evaluate(self.pending)
+            metrics.since('evaluate', start)
+            self.pending = None
+            if self.order_type == 'open':
+                if entry_result(self.order, self.contract_name, result):
+                    return True
+                self.q = self.order['open_q']
+            else:
+                if cover_result(self.order, self.contract_name, result):
+                    return True
+                self.q = self.order['close_q']
+
+        if self.trial_time % 50 == 0:
+            self.price += -1 if self.order_type == 'open' else 1
+        self.trial_time += 1
+        if self.order_type == 'close' and self.left():
+            self._closing()
+        return False
 
-        side_dict = {
-            0 : 'C',
-            1 : 'P'
-        }
-        self.contract = contract
-        self.p=p
-        self.side=side
-        self.trigger=False
-        self.stop=False
-        
-        if side == 0:
-            self.l1p, self.l2p = get_bear_call_spread(self.p, option_prices)
-            c1_name = option_dict[side_dict[self.side]][self.l1p]
-            c2_name = option_dict[side_dict[self.side]][self.l2p]
-            
-            self.c1 = getattr(self.contract, c1_name)
-            self.c2 = getattr(self.contract, c2_name)
-        elif side == 1:
-            self.l1p, self.l2p = get_bull_put_spread(self.p, option_prices)
-            c1_name = option_dict[side_dict[self.side]][self.l1p]
-            c2_name = option_dict[side_dict[self.side]][self.l2p]
-            
-            self.c1 = getattr(self.contract, c1_name)
-            self.c2 = getattr(self.contract, c2_name)
-
-def calculate_order_prices(combo_orders):
-    open_base_pt = 22
-    close_base_pt = 38
-    base_pd = 50
-    keys = list(combo_orders.keys())
-    for key in keys:
-        order = combo_orders[key]['enter_order']
-        
-        order_pt = abs(int(order.c1.symbol[9:-1]) - int(order.c2.symbol[9:-1]))
-        cur_open_pt = open_base_pt * order_pt / base_pd
-        cur_close_pt = close_base_pt * order_pt / base_pd
-        combo_orders[key]['open_price'] = cur_open_pt
-        combo_orders[key]['close_price'] = cur_close_pt
-    return combo_orders
+    def close(self):
+        for order_id in self.order_ids:
+            coh.discard(order_id)
+        if self.trial_time == self.order_trial_limit:
+            if self.order_type == 'open':
+                notifier.notify(f"{self.contract_name} order cant be all filled!")
+            else:
+                notifier.notify(f"{self.contract_name} prev order cant be all filled!")
 
+    def _closing(self):
+        if (self.trial_time - 1) % 10 == 0:
+            notifier.notify(f"closing {self.contract_name} close order", key=f"{self.contract_name}-closing")
 
-def placing_order(api, order, p, q, order_type='open'):
-    leg1 = order.c1
-    leg2 = order.c2
 
+def run_attempts(attempts, order_timeout=0.5):
+    """
+    Drive LevelAttempts on a scheduler worker, each attempt waits for the
+    IOC's final reply at most order_timeout seconds.
+    """
+    try:
+        while attempts.left():
+            with scheduler.order_slot():
+                request = attempts.next_order()
+                if request is not None:
+                    attempts.placed(*send_order(*request))
+                done = coh.wait(attempts.pending, order_timeout)
+            if attempts.step(done):
+                break
+    finally:
+        attempts.close()
+
+
+async def run_attempts_task(attempts, order_timeout=0.5):
+    """
+    run_attempts on the asyncio runtime: the wait for each IOC's final reply
+    is an await with a timeout, only the broker call itself leaves the
+    event loop.
+    """
+    try:
+        while attempts.left():
+            async with runtime.order_slots:
+                request = attempts.next_order()
+                if request is not None:
+                    attempts.placed(*await runtime.blocking(send_order, *request))
+                done = await coh.wait_for(attempts.pending, order_timeout)
+            if attempts.step(done):
+                break
+    finally:
+        attempts.close()
+
+
+def enter_workflow(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    Entry retry loop of one triggered level, return True when all filled.
+    """
+    run_attempts(LevelAttempts(combo_orders, contract_name, 'open', order_trial_limit), order_timeout)
+    return combo_orders[contract_name]['triggered']
 
-    leg1_act = 'Sell' if order_type == 'open' else 'Buy'
-    leg2_act = 'Buy' if order_type == 'open' else 'Sell'
-    otype = sj.constant.FuturesOCType.New if order_type == 'open' else sj.constant.FuturesOCType.Cover
-    
 
-    combo_contract = sj.contracts.ComboContract(
-        legs=[
-            sj.contracts.ComboBase(action=leg1_act, **leg1.dict()),
-            sj.contracts.ComboBase(action=leg2_act, **leg2.dict()),
-        ]
-    )
-    
-    order = api.ComboOrder(
-        price_type="LMT", 
-        price=p, 
-        quantity=q, 
-        order_type="IOC",
-        octype=otype,
-    )
+def cover_workflow(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    Cover retry loop closing the previous level of a triggered level.
+    """
+    run_attempts(LevelAttempts(combo_orders, contract_name, 'close', order_trial_limit), order_timeout)
 
-    trade = api.place_comboorder(combo_contract, order)
-    
-class ComboOrderHandler:
-    """
-    單筆組合期權 IOC 訂單狀態追蹤器（僅處理同一筆訂單）。
-
-    使用流程：
-      1. api.set_order_callback(order_callback)，在回呼中呼叫 handler.handle_message(msg)
-      2. 發單後等待一段時間（例如 1-2 秒）
-      3. 呼叫 handler.evaluate() 取得最終結果，並重置內部訊息緩衝
-
-    方法
-    -------
-    handle_message(msg: Dict) -> None
-        累積接收到的回覆訊息（自動適用相同 order_id）
-
-    evaluate() -> Dict
-        計算並回傳最終統計結果，包含三種可能狀態：
-        'filled'   - 全部成交
-        'cancelled'- 全部取消
-        'partial'  - 部分成交
-
-    evaluate 返回欄位
-    ----------------
-    order_id     : str    訂單編號
-    status       : str    訂單最終狀態 ('filled'/'cancelled'/'partial')
-    original_qty : int    原始委託總量（New 訊息之總和）
-    filled_qty   : int    成交量（trade 訊息之總和）
-    cancel_qty   : int    取消量（Cancel 訊息之 cancel_quantity 總和）
-    unfilled_qty : int    未成交未取消量
-    msgs         : List[Dict]  計算過程使用的所有訊息
-    """
-
-    def __init__(self):
-        # 緩衝所有回覆訊息
-        self._msgs: List[Dict] = []
-        self.status = None
-        self.left_q = 0
-    def handle_message(self, msg: Dict) -> None:
-        """
-        處理並儲存單筆交易所回覆訊息。
-        """
-        self._msgs.append(msg)
-    def evaluate(self) -> Dict:
-        """
-        計算所有累積訊息後的最終訂單狀態，並清空緩衝。
-        """
-        msgs = self._msgs
-        # 清空緩衝
-        self._msgs = []
 
-        if not msgs:
-            raise ValueError("No messages to evaluate.")
+async def enter_task(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    enter_workflow as a task of the asyncio runtime.
+    """
+    await run_attempts_task(LevelAttempts(combo_orders, contract_name, 'open', order_trial_limit), order_timeout)
+    return combo_orders[contract_name]['triggered']
 
-        # 擷取訂單編號
-        first = msgs[0]
-        if 'operation' in first:
-            order_id = first['order']['id']
-        else:
-            order_id = first.get('trade_id', '')
-
-        original_qty = 0
-        filled_qty = 0
-        cancel_qty = 0
-
-        for m in msgs:
-            if 'operation' in m:
-                op = m['operation'].get('op_type')
-                if op == 'New':
-                    # 僅從 New 訊息累加原始數量
-                    original_qty += m['order'].get('quantity', 0)
-                elif op == 'Cancel':
-                    # 從 Cancel 訊息累加取消數量
-                    cancel_qty += m.get('status', {}).get('cancel_quantity', 0)
-            else:
-                # trade 訊息
-                filled_qty += m.get('quantity', 0)
 
-        # 計算未成交未取消量
-        self.left_q = (original_qty - filled_qty)//2
+async def cover_task(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    cover_workflow as a task of the asyncio runtime.
+    """
+    await run_attempts_task(LevelAttempts(combo_orders, contract_name, 'close', order_trial_limit), order_timeout)
+
 
-        # 判斷狀態
-        if original_qty > 0 and filled_qty == original_qty:
-            self.status = 'filled'
-        elif original_qty > 0 and cancel_qty == original_qty:
-            self.status = 'cancelled'
-        else:
-            self.status = 'partial'
-
-
-def seconds_until_next_open(now=None):
-    """
-    Return how many seconds from `now` until the next time
-    the market exits its closed windows:
-      • 03:45–08:45
-      • 13:45–15:00
-      • weekends all day
-    If already open, returns 0.
-    """
-    now = now or datetime.datetime.now()
-    wd = now.weekday()  # 0=Mon, …, 6=Sun
-    t = now.time()
-
-    # 1) Date of next Monday 08:45 if it is weekend
-    if wd >= 5:
-        # how many days until next Monday?
-        days_ahead = 7 - wd
-        next_open_date = (now + datetime.timedelta(days=days_ahead)).date()
-        next_open_dt = datetime.datetime.combine(next_open_date, datetime.time(8, 45))
-        return (next_open_dt - now).total_seconds()
-
-    # 2) Closed windows today
-    morning_start = datetime.time(3, 45)
-    morning_end   = datetime.time(8, 45)
-    noon_start    = datetime.time(13, 45)
-    noon_end      = datetime.time(15, 0)
-
-    # If we’re in the 03:45–08:45 window, next open is today at 08:45
-    if morning_start <= t < morning_end:
-        next_open_dt = datetime.datetime.combine(now.date(), morning_end)
-        return (next_open_dt - now).total_seconds()
-
-    # If we’re in the 13:45–15:00 window, next open is today at 15:00
-    if noon_start <= t < noon_end:
-        next_open_dt = datetime.datetime.combine(now.date(), noon_end)
-        return (next_open_dt - now).total_seconds()
-
-    # Otherwise, market is open now (or it’s after 15:00 and before midnight,
-    # which you said is open—so we return 0)
-    return 0
-
-def is_market_open(now=None):
-    """Return True if now is Mon–Fri and not in the two blocked intervals."""
-    now = now or datetime.datetime.now()
-    # 0=Mon, 1=Tue, …, 6=Sun
-    if now.weekday() >= 5:  
-        return False
+def execute_level(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    Start the entry and cover workflows of one triggered level on the scheduler,
+    the cover once the stop level it buys back is all filled.
+    Return a Future that is True when the entry order is all filled.
+    """
+    order = combo_orders[contract_name]
+    notifier.notify(f"{contract_name} is triggered")
+
+    cover = after = None
+    if order['stop_order'] is not None and not order['covered']:
+        # buys back the stop level, so only once that one is entered
+        cover = lambda: cover_workflow(api, combo_orders, contract_name, order_trial_limit, order_timeout)
+        after = combo_orders[order['stop_level']]['entered']
+    return scheduler.run_level(
+        lambda: enter_workflow(api, combo_orders, contract_name, order_trial_limit, order_timeout),
+        cover,
+        after,
+    )
 
-    t = now.time()
-    # blocked slots: 03:45–08:45 and 13:45–15:00
-    if datetime.time(3, 45) <= t < datetime.time(8, 45):
-        return False
-    if datetime.time(13, 45) <= t < datetime.time(15, 0):
-        return False
 
-    return True
+def execute_level_task(api, combo_orders, contract_name, order_trial_limit=200, order_timeout=0.5):
+    """
+    execute_level for the asyncio runtime, runs on the event loop and
+    returns the task of the level.
+    """
+    order = combo_orders[contract_name]
+    notifier.notify(f"{contract_name} is triggered")
+
+    cover = after = None
+    if order['stop_order'] is not None and not order['covered']:
+        cover = cover_task(api, combo_orders, contract_name, order_trial_limit, order_timeout)
+        after = combo_orders[order['stop_level']]['entered']
+    return runtime.run_level(
+        enter_task(api, combo_orders, contract_name, order_trial_limit, order_timeout),
+        cover,
+        after,
+    )
 
 
 def market_subscribe(api, contract):
@@ -345,6 +429,22 @@ def market_subscribe(api, contract):
 
     api.quote.set_on_tick_fop_v1_callback(quote_callback)
 
+def bidask_subscribe(api, contract):
+    api.quote.subscribe(
+        contract,
+        quote_type = sj.constant.QuoteType.BidAsk,
+        version = sj.constant.QuoteVersion.v1,
+    )
+
+    api.quote.set_on_bidask_fop_v1_callback(bidask_callback)
+
+def bidask_unsubscribe(api, contract):
+    api.quote.unsubscribe(
+        contract,
+        quote_type = sj.constant.QuoteType.BidAsk,
+        version = sj.constant.QuoteVersion.v1,
+    )
+
 def market_unsubscribe(api, contract):
     print("unsubscribe market..")
     api.quote.unsubscribe(
@@ -358,271 +458,650 @@ def order_subscribe(api):
     api.set_order_callback(order_callback)
 
 
+class WingStrategy:
+    """
+    One wing ladder on one option series, fed by the ticks of its underlying.
+    Level names are prefixed with the strategy name so several strategies
+    can share the notifier, the order handler and the scheduler.
+    """
 
+    def __init__(self, name, contract_name, contract_month, std, open_price=None,
+                 underlying='Futures.MXF.MXFR1'):
+        self.name = name
+        self.contract_name = contract_name
+        self.contract_month = contract_month
+        self.std = std
+        self.open_price = open_price
+        self.underlying = underlying
+        self.mkt = market()
+        # OnlineVol of the underlying when std is None, set by StrategyRunner
+        self.vol = None
+        self.chain = None
+        self.combo_orders = None
+        self.engine = None
+
+    def ready(self):
+        return self.open_price is not None or self.mkt.close is not None
+
+    def arm(self, api, order_trial_limit=200, order_timeout=0.5):
+        # pick up where a previous run of this strategy stopped
+        replayed = journal.replay(f"{self.name}/")
+        armed = replayed.pop(f"{self.name}/", {})
+        if self.open_price is None:
+            self.open_price = armed.get('open_price', self.mkt.close)
+        elif armed.get('open_price', self.open_price) != self.open_price:
+            # the journaled levels belong to a ladder around another open
+            notifier.notify(f"{self.name} was armed at {armed['open_price']}, arming a new ladder at {self.open_price}")
+            replayed = {}
+        journal.record(f"{self.name}/", 'armed', open_price=self.open_price)
+
+        opt_contracts = getattr(api.Contracts.Options, self.contract_name)
+        trading_day = sessions.trading_day().isoformat() if chain_dir is not None else None
+        chain = strike_chain(opt_contracts, self.contract_name, self.contract_month, chain_dir, trading_day)
+        std = self.std if self.std is not None else self.vol.std()
+        if math.isnan(std):
+            raise ValueError(f"{self.name} has no WING_STD and no weekly diffs to estimate it from")
+        print(f"{self.name} std : {std}")
+        std_prices = calculate_ranges(self.open_price, std)
+        try:
+            # only the legs of the ladder are looked up in the contract tree
+            combo_orders = build_combo_orders(opt_contracts, std_prices, chain.calls, chain.puts, chain.symbols)
+        except AttributeError:
+            # a snapshot strike the tree does not list (anymore)
+            chain = strike_chain(opt_contracts, self.contract_name, self.contract_month, chain_dir, trading_day, refresh=True)
+            combo_orders = build_combo_orders(opt_contracts, std_prices, chain.calls, chain.puts, chain.symbols)
+        self.chain = chain
+        self.combo_orders = combo_orders.with_prefix(f"{self.name}/")
+
+        for order_name, state in replayed.items():
+            if order_name in self.combo_orders:
+                self.combo_orders[order_name].update(state)
+        # resolved once the level is all filled, its cover waits on the stop level's
+        for order_info in self.combo_orders.values():
+            order_info['entered'] = Future()
+            if order_info['triggered']:
+                order_info['entered'].set_result(True)
+
+        # everything but price and quantity of the orders is fixed from here on
+        for order_info in self.combo_orders.values():
+            level_templates(api, order_info)
+
+        for order_name, order_info in self.combo_orders.items():
+            print(f"Order : {order_name}, trigger point : {order_info['trigger_price']}\n")
+            print(f"For Entry : Leg1 -> {order_info['enter_order'].c1.name}, Leg2 -> {order_info['enter_order'].c2.name}\n")
+            print(f"Entry start price / quantity : {order_info['open_price']} / {order_info['open_q']}\n")
+            if order_info['stop_order'] is not None:
+                print(f"For Close : Leg1 -> {order_info['stop_order'].c1.name}, Leg2 -> {order_info['stop_order'].c2.name}\n")
+                print(f"CLose start price /quantity : {order_info['close_price']} / {order_info['close_q']}\n")
+            print('-'*20)
+
+        # on the asyncio runtime levels become tasks started from on_price
+        run_level = execute_level if runtime is None else execute_level_task
+
+        def execute(name, price):
+            self.combo_orders[name]['fired_ns'] = self.engine.fired_ns.get(name)
+            journal.record(name, 'triggered', price=price)
+            return run_level(api, self.combo_orders, name, order_trial_limit, order_timeout)
+
+        self.engine = TriggerEngine(execute, inline=runtime is not None)
+        for order_name, order_info in self.combo_orders.items():
+            if not order_info['triggered']:
+                self.engine.arm(order_name, order_info['trigger_price'], order_info['side'])
+            elif order_info['stop_order'] is not None and not order_info['covered']:
+                # entered before the restart, its cover never finished
+                stop_entered = self.combo_orders[order_info['stop_level']]['entered']
+                if runtime is None:
+                    scheduler.after(stop_entered, lambda name=order_name: cover_workflow(
+                        api, self.combo_orders, name, order_trial_limit, order_timeout))
+                else:
+                    runtime.spawn(runtime.after(stop_entered, cover_task(
+                        api, self.combo_orders, order_name, order_trial_limit, order_timeout)))
+        self.mkt.listener = self.engine.on_price
+        self.engine.start()
+
+    def rearm(self, api, std=None):
+        """
+        Move the levels that have not triggered to std, by default the live
+        estimate of vol, around the same open; returns the names moved.
+
+        Only armed levels with nothing entered are taken off the engine.
+        One whose covering level is not among them (triggered, or firing
+        right now) keeps its spread, since that level buys it back, and so
+        does one whose new spread is off the chain. The new strikes of all
+        of them come from one StrikeChain.recenter; only the levels whose
+        strikes changed get new orders and templates, together with the
+        cover of the level next out. Triggered levels and the journal are
+        left alone, a restart arms at the std it finds.
+        """
+        if self.engine is None:
+            return []
+        if std is not None:
+            std_prices = calculate_ranges(self.open_price, std)
+        elif self.vol is not None:
+            std = self.vol.std()
+            std_prices = self.vol.ranges(self.open_price)
+        else:
+            return []
+        if not std > 0:
+            return []
+
+        ladder = self.combo_orders
+        rows = {f"{self.name}/{name}": (side, idx, open_q) for name, side, idx, _, open_q, _ in LADDER}
+        disarmed = {
+            name for name, (_, _, open_q) in rows.items()
+            if not ladder[name]['triggered'] and ladder[name]['open_q'] == open_q and self.engine.disarm(name)
+        }
+        cover_of = {order_info['stop_level']: name for name, order_info in ladder.items()}
+        movable = [
+            (name, rows[name][0], rows[name][1]) for name in ladder
+            if name in disarmed and cover_of.get(name, name) in disarmed
+        ]
+        placed = self.chain.recenter(std_prices, movable)
+
+        opt_contracts = getattr(api.Contracts.Options, self.contract_name)
+        moved = []
+        for name, side, idx in movable:
+            l1p, l2p = placed[name]
+            order_info = ladder[name]
+            if l1p is None or l2p is None or order_info['trigger_price'] == std_prices[idx]:
+                continue
+            order_info['trigger_price'] = std_prices[idx]
+            moved.append(name)
+            enter = order_info['enter_order']
+            if (l1p, l2p) == (enter.l1p, enter.l2p):
+                continue
+            if side == '>=':
+                enter = combo_order(opt_contracts, std_prices[idx], 0, self.chain.calls, self.chain.symbols)
+            else:
+                enter = combo_order(opt_contracts, std_prices[idx], 1, self.chain.puts, self.chain.symbols)
+            order_info['enter_order'] = enter
+            order_info['open_price'], order_info['close_price'] = order_prices(abs(l1p - l2p))
+            level_templates(api, order_info)
+            if name in cover_of:
+                cover = ladder[cover_of[name]]
+                cover['stop_order'] = enter
+                level_templates(api, cover)
+
+        for name in disarmed:
+            self.engine.arm(name, ladder[name]['trigger_price'], rows[name][0])
+        print(f"{self.name} re-armed at std {std}, moved {moved}")
+        notifier.notify(f"{self.name} re-armed at std {std:.1f}, {len(moved)} levels moved")
+        return moved
+
+
+class ContractsFetched:
+    """
+    contracts_cb of api.login(contracts_timeout=0): login returns without
+    waiting for the contract download, whatever needs a part of
+    api.Contracts waits here for that security type only, up to timeout.
+    """
 
-if __name__ == "__main__":
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self._fetched = {security_type: threading.Event() for security_type in ('IND', 'STK', 'FUT', 'OPT')}
 
-    market_subscribed = False
-    order_subscribed = False
+    def __call__(self, security_type):
+        fetched = self._fetched.get(getattr(security_type, 'value', security_type))
+        if fetched is not None:
+            fetched.set()
 
-    contract_name = str(os.environ['CONTRACT_NAME'])
-    contract_month = str(os.environ['CONTRACT_MONTH'])
+    def wait(self, *security_types):
+        for security_type in security_types:
+            if not self._fetched[security_type].wait(self.timeout):
+                raise TimeoutError(f"{security_type} contracts not fetched in {self.timeout} s")
 
-    stdval = float(os.environ["WING_STD"])
 
-    # 測試環境登入
-    print(os.environ['API_KEY'], os.environ['SECRET_KEY'], os.environ['CA_CERT_PATH'], os.environ['CA_PASSWORD'])
-    api = sj.Shioaji(simulation=False)
-    accounts = api.login(
-        api_key=os.environ["API_KEY"],
-        secret_key=os.environ["SECRET_KEY"]
-    )
-    # 顯示所有可用的帳戶
-    print(f"Available accounts: {accounts}")
-    api.activate_ca(
-        ca_path=os.environ["CA_CERT_PATH"],
-        ca_passwd=os.environ["CA_PASSWORD"],
-    )
+def resolve_contract(contracts, path):
+    """
+    'Futures.MXF.MXFR1' -> api.Contracts.Futures.MXF.MXFR1
+    """
+    for part in path.split('.'):
+        contracts = getattr(contracts, part)
+    return contracts
 
-    coh = ComboOrderHandler()
-    mkt = market()
 
-    mxf_contract = api.Contracts.Futures.MXF.MXFR1
-    opt_contracts = getattr(api.Contracts.Options, contract_name)
-    options = get_options(opt_contracts, contract_name, contract_month)
-    total_calls = sorted(list(options['C'].keys()))
-    total_puts = sorted(list(options['P'].keys()))
-    
-    contract_open = float(os.environ['CONTRACT_OPEN'])
-    
-    
+class StrategyRunner:
+    """
+    Host several WingStrategy instances on one shioaji session: every
+    underlying is subscribed once and each tick is fanned out by its code to
+    the strategies on that underlying. With tick_dir, each underlying's ticks
+    are also recorded under tick_dir/<code>.
+    """
 
-    while mkt.close is None:
-        
-        print("mxf data not coming in ...")
-        if is_market_open() == False:
-            sleep_time = seconds_until_next_open()
+    def __init__(self, api, strategies: List[WingStrategy], tick_dir: Optional[str] = None,
+                 vol_moments: Optional[RunningMoments] = None, range_weight: float = 0.0):
+        self.api = api
+        self.strategies = strategies
+        self.contracts = {}
+        self._routes: Dict[str, List[market]] = {}
+        self._recorders: Dict[str, TickRecorder] = {}
+        self._vols: Dict[str, OnlineVol] = {}
+        for strategy in strategies:
+            contract = self.contracts.get(strategy.underlying)
+            if contract is None:
+                contract = self.contracts[strategy.underlying] = resolve_contract(api.Contracts, strategy.underlying)
+            # continuous contracts (R1) tick under either code
+            codes = {contract.code, getattr(contract, 'target_code', None)} - {None, ''}
+            for code in codes:
+                self._routes.setdefault(code, []).append(strategy.mkt)
+            if strategy.std is None:
+                # std estimated live from the underlying, seeded with the offline diffs
+                vol = self._vols.get(contract.code)
+                if vol is None:
+                    moments = copy.deepcopy(vol_moments) if vol_moments is not None else None
+                    vol = OnlineVol(moments, range_weight)
+                    for code in codes:
+                        self._vols[code] = vol
+                strategy.vol = vol
+
+        if tick_dir is not None:
+            for contract in self.contracts.values():
+                recorder = TickRecorder(os.path.join(tick_dir, contract.code))
+                for code in {contract.code, getattr(contract, 'target_code', None)} - {None, ''}:
+                    self._recorders[code] = recorder
+
+    def on_tick(self, exchange, tick):
+        start = now_ns()
+        recorder = self._recorders.get(tick.code)
+        if recorder is not None:
+            recorder.record(tick)
+        vol = self._vols.get(tick.code)
+        if vol is not None:
+            week = vol.week
+            vol.on_tick(local_ns(tick.datetime), float(tick.close))
+            if vol.week != week and week is not None:
+                self.week_rolled(vol)
+        for mkt in self._routes.get(tick.code, ()):
+            mkt.update(exchange, tick)
+        metrics.since('quote_callback', start)
+
+    def week_rolled(self, vol):
+        """
+        The week of vol rolled over and its std took in the week's diff:
+        the strategies it estimates re-arm, off the quote callback.
+        """
+        for strategy in self.strategies:
+            if strategy.vol is vol and strategy.engine is not None:
+                if runtime is None:
+                    scheduler.submit(self.rearm, strategy)
+                else:
+                    runtime.post(self.rearm, strategy)
+
+    def rearm(self, strategy, std=None):
+        """
+        strategy.rearm, the leg quotes of the levels it moved subscribed and
+        those no level trades anymore unsubscribed.
+        """
+        before = self.legs()
+        moved = strategy.rearm(self.api, std)
+        if quotes is not None and moved:
+            after = self.legs()
+            for code in after.keys() - before.keys():
+                bidask_subscribe(self.api, after[code])
+            for code in before.keys() - after.keys():
+                bidask_unsubscribe(self.api, before[code])
+        return moved
+
+    def legs(self):
+        """
+        Option contracts of every armed level, by code.
+        """
+        legs = {}
+        for strategy in self.strategies:
+            for order_info in (strategy.combo_orders or {}).values():
+                for key in ('enter_template', 'stop_template'):
+                    if key in order_info:
+                        for leg in order_info[key].legs:
+                            legs[leg.code] = leg
+        return legs
+
+    def subscribe(self):
+        for contract in self.contracts.values():
+            market_subscribe(self.api, contract)
+        self.subscribe_legs()
+
+    def subscribe_legs(self):
+        if quotes is None:
+            return
+        for contract in self.legs().values():
+            bidask_subscribe(self.api, contract)
+
+    def unsubscribe(self):
+        for contract in self.contracts.values():
+            market_unsubscribe(self.api, contract)
+        if quotes is not None:
+            for contract in self.legs().values():
+                bidask_unsubscribe(self.api, contract)
+
+    def ready(self):
+        return all(strategy.ready() for strategy in self.strategies)
+
+    def wait_ready(self, timeout, poll=0.01):
+        """
+        Wait up to timeout for ready(), True once it is.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.ready():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    async def wait_ready_async(self, timeout, poll=0.01):
+        deadline = time.monotonic() + timeout
+        while not self.ready():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll)
+        return True
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout in all, True when every strategy is finished.
+        """
+        deadline = time.monotonic() + timeout
+        for strategy in self.strategies:
+            if not strategy.engine.finished.wait(max(deadline - time.monotonic(), 0)):
+                return False
+        return True
+
+    async def wait_async(self, timeout):
+        """
+        wait() on the asyncio runtime, where the engines settle their levels
+        on the loop and report through on_finished.
+        """
+        finished = asyncio.Event()
+
+        def check():
+            if all(strategy.engine.finished.is_set() for strategy in self.strategies):
+                finished.set()
+
+        for strategy in self.strategies:
+            strategy.engine.on_finished = check
+        check()
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stop(self):
+        for strategy in self.strategies:
+            strategy.engine.stop()
+        for recorder in set(self._recorders.values()):
+            recorder.close()
+
+
+def load_strategies():
+    """
+    Strategies from the JSON list in STRATEGIES_FILE, each entry holding the
+    WingStrategy arguments; without it, the single strategy of
+    CONTRACT_NAME / CONTRACT_MONTH / WING_STD / CONTRACT_OPEN. A strategy
+    without std (no WING_STD) estimates it live, see OnlineVol.
+    """
+    path = os.environ.get("STRATEGIES_FILE")
+    if path:
+        with open(path) as f:
+            return [WingStrategy(**conf) for conf in json.load(f)]
+
+    contract_name = str(os.environ['CONTRACT_NAME'])
+    contract_month = str(os.environ['CONTRACT_MONTH'])
+    contract_open = os.environ.get('CONTRACT_OPEN')
+    wing_std = os.environ.get('WING_STD')
+    return [WingStrategy(
+        f"{contract_name}{contract_month}",
+        contract_name,
+        contract_month,
+        float(wing_std) if wing_std else None,
+        float(contract_open) if contract_open else None,
+    )]
+
+
+async def run_async(api, strategies, sessions, order_trial_limit=200, order_timeout=0.5,
+                    contracts=None, startup=None):
+    """
+    The session of __main__ on the asyncio runtime: ticks, order replies and
+    every level's workflow are served by this one event loop.
+    """
+    runtime.attach()
+    market_subscribed = False
+    order_subscribed = False
+
+    while not runner.ready():
+        print("underlying data not coming in ...")
+        if not sessions.is_open():
+            sleep_time = sessions.seconds_until_open()
             print(f"Sleep {sleep_time} until market open")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
 
             market_subscribed = False
             order_subscribed = False
         elif market_subscribed == False or order_subscribed == False:
-            market_subscribe(api, mxf_contract)
+            runner.subscribe()
             order_subscribe(api)
-            time.sleep(1)
-
             market_subscribed = True
             order_subscribed = True
-
-    while contract_open is None:
-        contract_open = mkt.close
-
-    std_prices = calculate_ranges(contract_open, stdval)
-    co_p3 = combo_order(opt_contracts, std_prices[7], 0, total_calls, options)
-    co_p2 = combo_order(opt_contracts, std_prices[6], 0, total_calls, options)
-    co_p1 = combo_order(opt_contracts, std_prices[5], 0, total_calls, options)
-    co_pp5 = combo_order(opt_contracts, std_prices[4], 0, total_calls, options)
-    co_np5 = combo_order(opt_contracts, std_prices[3], 1, total_puts, options)
-    co_n1 = combo_order(opt_contracts, std_prices[2], 1, total_puts, options)
-    co_n2 = combo_order(opt_contracts, std_prices[1], 1, total_puts, options)
-    co_n3 = combo_order(opt_contracts, std_prices[0], 1, total_puts, options)
-    
-
-    combo_orders = {
-        'co_p3' : {
-            'trigger_price' : std_prices[7],
-            'side' : '>=',
-            'enter_order' : co_p3,
-            'stop_order' : co_p2,
-            'open_q' : 8,
-            'close_q' : 4,
-            'triggered' : False,
-        },
-        'co_p2' : {
-            'trigger_price' : std_prices[6],
-            'side' : '>=',
-            'enter_order' : co_p2,
-            'stop_order' : co_p1,
-            'open_q' : 4,
-            'close_q' : 2,
-            'triggered' : False,
-        },
-        'co_p1' : {
-            'trigger_price' : std_prices[5],
-            'side' : '>=',
-            'enter_order' : co_p1,
-            'stop_order' : co_pp5,
-            'open_q' : 2,
-            'close_q' : 1,
-            'triggered' : False,
-        },
-        'co_pp5' : {
-            'trigger_price' : std_prices[4],
-            'side' : '>=',
-            'enter_order' : co_pp5,
-            'stop_order' : None,
-            'open_q' : 1,
-            'close_q' : 0,
-            'triggered' : False,
-        },
-        'co_np5' : {
-            'trigger_price' : std_prices[3],
-            'side' : '<=',
-            'enter_order' : co_np5,
-            'stop_order' : None,
-            'open_q' : 1,
-            'close_q' : 0,
-            'triggered' : False,
-        },
-        'co_n1' : {
-            'trigger_price' : std_prices[2],
-            'side' : '<=',
-            'enter_order' : co_n1,
-            'stop_order' : co_np5,
-            'open_q' : 2,
-            'close_q' : 1,
-            'triggered' : False,
-        },
-        'co_n2' : {
-            'trigger_price' : std_prices[1],
-            'side' : '<=',
-            'enter_order' : co_n2,
-            'stop_order' : co_n1,
-            'open_q' : 4,
-            'close_q' : 2,
-            'triggered' : False,
-        },
-        'co_n3' : {
-            'trigger_price' : std_prices[0],
-            'side' : '<=',
-            'enter_order' : co_n3,
-            'stop_order' : co_n2,
-            'open_q' : 8,
-            'close_q' : 4,
-            'triggered' : False,
-        },
-    }
-
-    combo_orders = calculate_order_prices(combo_orders)
-
-    for order_name, order_info in combo_orders.items():
-        print(f"Order : {order_name}, trigger point : {order_info['trigger_price']}\n")
-        print(f"For Entry : Leg1 -> {order_info['enter_order'].c1.name}, Leg2 -> {order_info['enter_order'].c2.name}\n")
-        print(f"Entry start price / quantity : {order_info['open_price']} / {order_info['open_q']}\n")
-        if order_info['stop_order'] is not None:
-            print(f"For Close : Leg1 -> {order_info['stop_order'].c1.name}, Leg2 -> {order_info['stop_order'].c2.name}\n")
-            print(f"CLose start price /quantity : {order_info['close_price']} / {order_info['close_q']}\n")
-        print('-'*20)
-
-
-    all_triggered = False
-    order_trial_limit = 200
-    order_waited_time = 0.5
-    main_loop_sleep = 1  # Sleep 1 second between main loop iterations
-    prev_close = None
-    send_to_telegram(BOT_TOKEN, CHAT_ID, "wing strategy start")
-    while all_triggered == False:
-        time.sleep(main_loop_sleep)  # Add sleep to reduce CPU usage
-
-        if is_market_open() == False:
-            send_to_telegram(BOT_TOKEN, CHAT_ID, "Market is closed, waiting for next open")
-            market_unsubscribe(api, mxf_contract)
+            await runner.wait_ready_async(1)
+        else:
+            await runner.wait_ready_async(1)
+    if startup is not None:
+        startup.lap('first tick')
+
+    if contracts is not None:
+        await runtime.blocking(contracts.wait, 'OPT')
+    for strategy in strategies:
+        strategy.arm(api, order_trial_limit, order_timeout)
+    runner.subscribe_legs()
+    if startup is not None:
+        startup.lap('armed')
+
+    notifier.notify("wing strategy start")
+    while True:
+        if not sessions.is_open():
+            notifier.notify("Market is closed, waiting for next open")
+            runner.unsubscribe()
             order_subscribe(api)
             market_subscribed = False
             order_subscribed = False
 
-            sleep_time = seconds_until_next_open()
+            sleep_time = sessions.seconds_until_open()
             print(f"Sleep {sleep_time} until market open")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
             continue
-        else:
+
+        if market_subscribed == False:
+            notifier.notify("Market is open, subscribing market data")
+            runner.subscribe()
+            market_subscribed = True
+        if order_subscribed == False:
+            notifier.notify("Market is open, subscribing order data")
+            order_subscribe(api)
+            order_subscribed = True
+        if startup is not None:
+            startup.lap('subscribed')
+            print(f"Startup : {startup.done():.0f} ms ({startup})")
+            startup = None
+
+        if await runner.wait_async(sessions.seconds_until_change()):
+            break
+
+    # covers restarted at arm() may still be running
+    await runtime.drain(order_timeout * order_trial_limit)
+
+
+if __name__ == "__main__":
+
+    market_subscribed = False
+    order_subscribed = False
+    # process start to armed and subscribed
+    startup = StartupClock(STARTED_NS)
+    startup.lap('imports')
+
+    strategies = load_strategies()
+    # the contracts download in the background while the rest starts up
+    contracts = ContractsFetched(float(os.environ.get("CONTRACTS_TIMEOUT", 60)))
+    if SIMULATED:
+        sessions = sj.AlwaysOpen()
+        api = sj.Shioaji.from_env(
+            os.environ,
+            sorted({(strategy.contract_name, strategy.contract_month) for strategy in strategies}),
+            strategies[0].open_price,
+        )
+        api.login(contracts_timeout=0, contracts_cb=contracts)
+    else:
+        # the notifier's requests loads while login waits on the network
+        threading.Thread(target=importlib.import_module, args=("msg",), name="import-msg", daemon=True).start()
+        import shioaji as sj
+
+        startup.lap('shioaji')
+        sessions = MarketCalendar.from_file(os.environ.get("MARKET_CALENDAR", "./market_calendar.csv"))
+
+        # 測試環境登入
+        print(os.environ['API_KEY'], os.environ['SECRET_KEY'], os.environ['CA_CERT_PATH'], os.environ['CA_PASSWORD'])
+        api = sj.Shioaji(simulation=False)
+        accounts = api.login(
+            api_key=os.environ["API_KEY"],
+            secret_key=os.environ["SECRET_KEY"],
+            contracts_timeout=0,
+            contracts_cb=contracts,
+        )
+        # 顯示所有可用的帳戶
+        print(f"Available accounts: {accounts}")
+        startup.lap('login')
+        api.activate_ca(
+            ca_path=os.environ["CA_CERT_PATH"],
+            ca_passwd=os.environ["CA_PASSWORD"],
+        )
+        startup.lap('ca')
+    # strike chains are snapshot per trading day, a restart reuses them
+    chain_dir = os.environ.get("CHAIN_DIR", "./data/chains") or None
+
+    n_levels = len(LADDER) * len(strategies)
+    if os.environ.get("RUNTIME") == "asyncio":
+        from runtime import AsyncRuntime
+
+        runtime = AsyncRuntime(max_inflight=4)
+        coh = AsyncComboOrderHandler()
+    else:
+        coh = ComboOrderHandler()
+    scheduler = ExecutionScheduler(max_workers=2*n_levels, max_inflight=4)
+    # shioaji allows 250 futures / options orders per 10 s, stay below it
+    gateway = OrderGateway(
+        rate=float(os.environ.get("ORDER_RATE", 20)),
+        burst=float(os.environ.get("ORDER_BURST", 20)),
+        account_rate=float(os.environ["ACCOUNT_ORDER_RATE"]) if os.environ.get("ACCOUNT_ORDER_RATE") else None,
+    )
+    if os.environ.get("QUOTE_PRICING", "1") != "0":
+        quotes = QuoteCache()
+        quote_max_age = float(os.environ.get("QUOTE_MAX_AGE", quote_max_age))
+        min_credit = float(os.environ.get("QUOTE_MIN_CREDIT", min_credit))
+    if SIMULATED:
+        notifier = sj.Notifier()
+    else:
+        from msg import TelegramNotifier
+
+        notifier = TelegramNotifier(BOT_TOKEN, CHAT_ID)
+    journal = StateJournal(os.environ.get("JOURNAL_PATH", "./state/journal.sqlite"))
+    latency_port = os.environ.get("LATENCY_PORT")
+    reporter = LatencyReporter(
+        path=os.environ.get("LATENCY_LOG", "./state/latency.jsonl"),
+        port=int(latency_port) if latency_port else None,
+    )
+    vol_moments = None
+    if any(strategy.std is None for strategy in strategies):
+        vol_window = os.environ.get("VOL_WINDOW")
+        vol_moments = load_weekly_moments(
+            os.environ.get("STD_CACHE", "./data/.std_cache"),
+            int(vol_window) if vol_window else None,
+        )
+    startup.lap('setup')
+    # the underlyings are resolved now, the option tree only when arming
+    contracts.wait('FUT')
+    startup.lap('contracts')
+    runner = StrategyRunner(
+        api, strategies, os.environ.get("TICK_DIR", "./data/ticks"),
+        vol_moments, float(os.environ.get("VOL_RANGE_WEIGHT", 0.0)),
+    )
+
+    order_trial_limit = 200
+    order_timeout = float(os.environ.get("ORDER_TIMEOUT", 0.5))  # max wait for an IOC's final reply
+
+    if runtime is not None:
+        asyncio.run(run_async(
+            api, strategies, sessions, order_trial_limit, order_timeout,
+            contracts, startup,
+        ))
+    else:
+        while not runner.ready():
+        
+            print("underlying data not coming in ...")
+            if not sessions.is_open():
+                sleep_time = sessions.seconds_until_open()
+                print(f"Sleep {sleep_time} until market open")
+                time.sleep(sleep_time)
+
+                market_subscribed = False
+                order_subscribed = False
+            elif market_subscribed == False or order_subscribed == False:
+                runner.subscribe()
+                order_subscribe(api)
+                market_subscribed = True
+                order_subscribed = True
+                runner.wait_ready(1)
+            else:
+                runner.wait_ready(1)
+        startup.lap('first tick')
+
+        contracts.wait('OPT')
+        for strategy in strategies:
+            strategy.arm(api, order_trial_limit, order_timeout)
+        runner.subscribe_legs()
+        startup.lap('armed')
+
+        notifier.notify("wing strategy start")
+        # ticks drive the triggers, this loop only follows the market sessions:
+        # it sleeps until the next session boundary or until every level is done
+        while True:
+            if not sessions.is_open():
+                notifier.notify("Market is closed, waiting for next open")
+                runner.unsubscribe()
+                order_subscribe(api)
+                market_subscribed = False
+                order_subscribed = False
+
+                sleep_time = sessions.seconds_until_open()
+                print(f"Sleep {sleep_time} until market open")
+                time.sleep(sleep_time)
+                continue
+
             if market_subscribed == False:
-                send_to_telegram(BOT_TOKEN, CHAT_ID, "Market is open, subscribing market data")
-                market_subscribe(api, mxf_contract)
+                notifier.notify("Market is open, subscribing market data")
+                runner.subscribe()
                 market_subscribed = True
             if order_subscribed == False:
-                send_to_telegram(BOT_TOKEN, CHAT_ID, "Market is open, subscribing order data")
+                notifier.notify("Market is open, subscribing order data")
                 order_subscribe(api)
                 order_subscribed = True
-            
-            time.sleep(1)
-        
-            
-        cur_close = mkt.close
-        # Skip processing if price hasn't changed
-        if cur_close == prev_close:
-            continue
-            
-        prev_close = cur_close
-        placing_trial_time = 1
-        covering_trail_time = 1
-        
-        msg_cnt = 0
-        
-        something_triggered = False
-
-        for contract_name, order in combo_orders.items():
-            if ops[order['side']](cur_close, order['trigger_price']) and order['triggered'] == False:
-                send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} is triggered")
-                something_triggered = True
-
-                open_price = order['open_price']
-                close_price = order['close_price']
-                open_q = order['open_q']
-                close_q = order['close_q']
-                print(f"{contract_name} is triggered with {order['trigger_price']} and {open_price} / {open_q}")
-                while placing_trial_time < order_trial_limit:
-                    if msg_cnt%10 == 0:
-                        placing_order(api, order['enter_order'], open_price, open_q, 'open')
-                    time.sleep(order_waited_time)
-                    coh.evaluate()
-                    if coh.status == 'filled':
-                        combo_orders[contract_name]['triggered'] = True
-                        send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} orders are all filled!")
-                        #send open filled message to telegram
-                        break
-                    elif coh.status == 'partial':
-                        open_q = combo_orders[contract_name]['open_q'] = coh.left_q
-                        send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} orders are partial filled, {open_q} lefted!")
-                        #send partial filled message to telegram
-                    
-                    if placing_trial_time % 50 == 0:
-                        open_price -= 1
-                    
-                    placing_trial_time+=1
-                    msg_cnt+=1
-
-
-                msg_cnt = 0
-                while covering_trail_time < order_trial_limit and order['stop_order'] is not None:
-                    if msg_cnt%10 == 0:
-                        send_to_telegram(BOT_TOKEN, CHAT_ID, f"closing {contract_name} close order")
-                    placing_order(api, order['stop_order'], close_price, close_q, 'close')
-                    time.sleep(order_waited_time)
-                    coh.evaluate()
-                    if coh.status == 'filled':
-                        send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} previous order are all filled!")
-                        #send close filled message to telegram
-                        break
-                    elif coh.status == 'partial':
-                        close_q = combo_orders[contract_name]['close_q'] = coh.left_q
-                        send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} previous order are partial filled, {close_q} lefted!")
-                        #send partial filled message to telegram
-                    if covering_trail_time %50 == 0:
-                        close_price+=1
-
-                    covering_trail_time+=1
-                    msg_cnt+=1
-        
-        if something_triggered and (placing_trial_time == order_trial_limit or covering_trail_time == order_trial_limit):
-            if placing_trial_time == order_trial_limit:
-                send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} order cant be all filled!")
-            elif covering_trail_time == order_trial_limit:
-                send_to_telegram(BOT_TOKEN, CHAT_ID, f"{contract_name} prev order cant be all filled!")
-            #send message to telegram for notifying something wrong
-            pass
-
-        all_triggered = reduce(lambda i, j : i & j, [order['triggered'] for name, order in combo_orders.items()])
-
-    send_to_telegram(BOT_TOKEN, CHAT_ID, f"All wing strategy orders got triggered!")
\ No newline at end of file
+            if startup is not None:
+                startup.lap('subscribed')
+                print(f"Startup : {startup.done():.0f} ms ({startup})")
+                startup = None
+
+            if runner.wait(sessions.seconds_until_change()):
+                break
+
+    runner.stop()
+    scheduler.shutdown()
+    gateway.close()
+    print(f"Gateway stats : {gateway.stats}")
+    if runtime is not None:
+        runtime.shutdown()
+    journal.close()
+    reporter.close()
+    print(f"Latency : {metrics.summary()}")
+    notifier.notify(f"All wing strategy orders got triggered!")
+    notifier.close()
+    print(f"Notifier stats : {notifier.stats}")
+    if SIMULATED:
+        api.logout()
+        print(f"Simulator stats : {api.stats}")
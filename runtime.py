@@ -0,0 +1,105 @@
+import asyncio
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Coroutine, Optional
+
+
+class AsyncRuntime:
+    """
+    asyncio counterpart of ExecutionScheduler: ticks, trigger checks and the
+    entry / cover workflows of every level run on one event loop thread.
+
+    Broker callbacks arrive on shioaji's threads and are handed to the loop
+    with loop.call_soon_threadsafe, so everything they touch is only ever
+    mutated on the loop thread. Each triggered level is a task, waiting for
+    IOC replies with awaited timeouts instead of blocking a worker. The
+    broker call that places an order is the one blocking call
+    left; it runs on a small broker pool so the loop keeps serving ticks.
+
+    order_slots caps the orders in flight across all workflows, like
+    ExecutionScheduler.order_slot().
+    """
+
+    def __init__(self, max_inflight: int = 4, broker_workers: int = 4):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.order_slots: Optional[asyncio.Semaphore] = None
+        self.max_inflight = max_inflight
+        self.broker = ThreadPoolExecutor(max_workers=broker_workers, thread_name_prefix="broker")
+        self._tasks = set()
+
+    def attach(self) -> None:
+        """
+        Bind to the running loop, call from the coroutine that drives the session.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.order_slots = asyncio.Semaphore(self.max_inflight)
+
+    def post(self, fn: Callable, *args) -> None:
+        """
+        Hand a broker callback to the loop; dropped once the loop is closed,
+        as callbacks keep coming after the session has ended.
+        """
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass
+
+    def blocking(self, fn: Callable, *args) -> asyncio.Future:
+        return self.loop.run_in_executor(self.broker, fn, *args)
+
+    def spawn(self, coro: Coroutine) -> asyncio.Task:
+        """
+        Run coro as a task that is kept referenced and reports its failure.
+        """
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._reap)
+        return task
+
+    def _reap(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            exc = task.exception()
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+    async def after(self, future: Future, coro: Coroutine):
+        """
+        Await coro once future, a concurrent.futures.Future, is done.
+        """
+        try:
+            await asyncio.wrap_future(future)
+        except BaseException:
+            coro.close()
+            raise
+        return await coro
+
+    def run_level(self, entry: Coroutine, cover: Optional[Coroutine] = None,
+                  after: Optional[Future] = None) -> asyncio.Task:
+        """
+        Run entry and cover concurrently, the returned task holds entry's
+        result once both are done. With after, cover only starts once after
+        is done. A failing cover is reported but does not change the entry
+        result.
+        """
+        async def level():
+            entry_task = self.spawn(entry)
+            if cover is not None:
+                covering = cover if after is None else self.after(after, cover)
+                await asyncio.wait([entry_task, self.spawn(covering)])
+            return await entry_task
+
+        return self.spawn(level())
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait for the tasks still running, cancel what is left after timeout.
+        """
+        tasks = list(self._tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.broker.shutdown(wait=wait)
@@ -0,0 +1,97 @@
+import threading
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+class ExecutionScheduler:
+    """
+    Worker pool for the entry and cover workflows of triggered levels.
+
+    run_level() submits the entry workflow and the cover workflow of a level
+    to the pool and returns a Future of the entry result, so levels crossing
+    on the same tick and the two legs of one level run concurrently. A cover
+    can be held back until a Future resolves (the entry of the level it
+    buys back) with after(); it is chained on that Future, no worker ever
+    blocks waiting on another workflow.
+
+    order_slot() caps how many orders are in flight (placed and not yet
+    evaluated) across all workflows; a workflow holds a slot for one attempt.
+    """
+
+    def __init__(self, max_workers: int = 16, max_inflight: int = 4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order-worker")
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        return self.pool.submit(fn, *args, **kwargs)
+
+    def after(self, future: Future, fn: Callable) -> Future:
+        """
+        Submit fn once future is done, the returned Future holds fn's result.
+        """
+        chained: Future = Future()
+
+        def _start(_):
+            try:
+                submitted = self.submit(fn)
+            except RuntimeError as e:
+                # the pool was shut down before future resolved
+                chained.set_exception(e)
+                return
+            submitted.add_done_callback(lambda f: _copy(f, chained))
+
+        future.add_done_callback(_start)
+        return chained
+
+    def run_level(self, entry: Callable[[], bool], cover: Optional[Callable[[], None]] = None,
+                  after: Optional[Future] = None) -> Future:
+        """
+        Run entry and cover concurrently, the returned Future holds entry's result.
+        With after, cover only starts once after is done.
+        A failing cover is reported but does not change the entry result.
+        """
+        result: Future = Future()
+        entry_future = self.submit(entry)
+        futures = [entry_future]
+        if cover is not None:
+            futures.append(self.submit(cover) if after is None else self.after(after, cover))
+
+        lock = threading.Lock()
+        remaining = [len(futures)]
+
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            for f in futures[1:]:
+                if f.exception() is not None:
+                    traceback.print_exception(type(f.exception()), f.exception(), f.exception().__traceback__)
+            if entry_future.exception() is not None:
+                result.set_exception(entry_future.exception())
+            else:
+                result.set_result(entry_future.result())
+
+        for f in futures:
+            f.add_done_callback(_done)
+        return result
+
+    @contextmanager
+    def order_slot(self):
+        self._inflight.acquire()
+        try:
+            yield
+        finally:
+            self._inflight.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.pool.shutdown(wait=wait)
+
+
+def _copy(source: Future, target: Future) -> None:
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,495 @@
+"""
+In-process stand-in for the part of shioaji run.py uses, to run the bot
+offline and load test it:
+
+    BROKER=sim CONTRACT_NAME=TXO CONTRACT_MONTH=202505 WING_STD=150 \
+    CONTRACT_OPEN=21000 SIM_TICK_RATE=2000 python run.py
+
+and the market is always open (AlwaysOpen), notifications are printed
+(Notifier), the SIM_* variables configure the session (Shioaji.from_env).
+
+The module stands in for the shioaji module itself (run.py imports it as sj
+with BROKER=sim): Shioaji, contracts.ComboContract / ComboBase and the
+constant enums. Shioaji builds Contracts.Futures.MXF.MXFR1 and a TXO
+option tree, streams ticks of a random walk to the tick callback and
+BidAsk of the subscribed options, priced with a normal (Bachelier) model,
+to the BidAsk callback. place_comboorder answers after ack_latency and
+reports New / deal / Cancel messages, in the shapes ComboOrderHandler
+parses, after reply_latency: an IOC crossing the spread's natural price
+fills, one between mid and natural fills with fill_prob (partly with
+partial_prob), anything else is cancelled.
+"""
+import math
+import time
+import heapq
+import datetime
+import threading
+import itertools
+import traceback
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+constant = SimpleNamespace(
+    QuoteType=SimpleNamespace(Tick='Tick', BidAsk='BidAsk'),
+    QuoteVersion=SimpleNamespace(v1='v1'),
+    FuturesOCType=SimpleNamespace(Auto='Auto', New='New', Cover='Cover', DayTrade='DayTrade'),
+    Action=SimpleNamespace(Buy='Buy', Sell='Sell'),
+    StockPriceType=SimpleNamespace(LMT='LMT', MKT='MKT'),
+    OrderType=SimpleNamespace(ROD='ROD', IOC='IOC', FOK='FOK'),
+    OrderState=SimpleNamespace(FuturesOrder='FORDER', FuturesDeal='FDEAL'),
+    Exchange=SimpleNamespace(TAIFEX='TAIFEX'),
+)
+Exchange = constant.Exchange
+Action = constant.Action
+StockPriceType = constant.StockPriceType
+OrderType = constant.OrderType
+
+
+class Contract:
+    """
+    A contract as plain attributes; dict() gives them back like shioaji's.
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def dict(self) -> Dict:
+        return dict(self.__dict__)
+
+
+class ComboBase(Contract):
+    pass
+
+
+class ComboContract:
+
+    def __init__(self, legs: List[ComboBase]):
+        self.legs = legs
+
+
+contracts = SimpleNamespace(Contract=Contract, ComboBase=ComboBase, ComboContract=ComboContract)
+
+
+class TickFOPv1(SimpleNamespace):
+    pass
+
+
+class BidAskFOPv1(SimpleNamespace):
+    pass
+
+
+class ContractGroup:
+    """
+    Contracts by symbol, as attributes and items; keys() like shioaji's.
+    """
+
+    def __init__(self, items: Optional[Dict] = None):
+        self._items = dict(items or {})
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['_items'][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def keys(self):
+        return self._items.keys()
+
+
+class ComboOrder:
+
+    def __init__(self, price_type='LMT', price=0, quantity=1, order_type='IOC', octype='Auto', account=None, **fields):
+        self.price_type = price_type
+        self.price = price
+        self.quantity = quantity
+        self.order_type = order_type
+        self.octype = octype
+        self.account = account
+        self.id = ''
+        self.seqno = ''
+        self.__dict__.update(fields)
+
+    def copy(self, update: Optional[Dict] = None) -> "ComboOrder":
+        order = ComboOrder.__new__(ComboOrder)
+        order.__dict__.update(self.__dict__)
+        order.__dict__.update(update or {})
+        return order
+
+
+def bachelier(forward, strike, sigma, right):
+    """
+    Normal-model option value, sigma in index points to expiry.
+    """
+    d = forward - strike if right == 'C' else strike - forward
+    if sigma <= 0:
+        return max(d, 0.0)
+    z = d / sigma
+    return d * 0.5 * math.erfc(-z / math.sqrt(2)) + sigma * math.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+
+
+def round_tick(price, up=False):
+    tick = 0.1 if price < 10 else 0.5 if price < 50 else 1 if price < 500 else 5 if price < 1000 else 10
+    steps = math.ceil(price / tick - 1e-9) if up else math.floor(price / tick + 1e-9)
+    return round(max(steps * tick, 0.1), 1)
+
+
+class _Quote:
+
+    def __init__(self, broker: "Shioaji"):
+        self.broker = broker
+        self.on_tick = None
+        self.on_bidask = None
+        self.ticks = {}     # code -> contract
+        self.bidasks = {}
+
+    def subscribe(self, contract, quote_type=constant.QuoteType.Tick, version=constant.QuoteVersion.v1):
+        target = self.ticks if quote_type == constant.QuoteType.Tick else self.bidasks
+        target[contract.code] = contract
+
+    def unsubscribe(self, contract, quote_type=constant.QuoteType.Tick, version=constant.QuoteVersion.v1):
+        target = self.ticks if quote_type == constant.QuoteType.Tick else self.bidasks
+        target.pop(contract.code, None)
+
+    def set_on_tick_fop_v1_callback(self, callback):
+        self.on_tick = callback
+
+    def set_on_bidask_fop_v1_callback(self, callback):
+        self.on_bidask = callback
+
+
+class Shioaji:
+    """
+    The simulated broker session. Latencies are seconds, jittered by up to
+    latency_jitter of themselves; tick_vol is the std of one tick's move and
+    option_vol the std, in points, of the underlying to option expiry.
+    """
+
+    def __init__(
+        self,
+        simulation: bool = True,
+        open_price: float = 21000,
+        tick_rate: float = 100.0,
+        tick_vol: float = 2.0,
+        option_vol: float = 300.0,
+        series=(('TXO', '202505'),),
+        strike_step: int = 50,
+        strike_width: int = 3000,
+        bidask_every: int = 10,
+        ack_latency: float = 0.002,
+        reply_latency: float = 0.005,
+        latency_jitter: float = 0.5,
+        fill_prob: float = 0.6,
+        partial_prob: float = 0.2,
+        seed: Optional[int] = None,
+    ):
+        self.simulation = simulation
+        self.price = float(open_price)
+        self.tick_rate = tick_rate
+        self.tick_vol = tick_vol
+        self.option_vol = option_vol
+        self.bidask_every = bidask_every
+        self.ack_latency = ack_latency
+        self.reply_latency = reply_latency
+        self.latency_jitter = latency_jitter
+        self.fill_prob = fill_prob
+        self.partial_prob = partial_prob
+        self.rng = np.random.default_rng(seed)
+        self._rng_lock = threading.Lock()
+
+        self.futopt_account = SimpleNamespace(account_id='SIM0001', broker_id='F000000', account_type='F')
+        self.quote = _Quote(self)
+        self.on_order = None
+        self.stats = {'ticks': 0, 'bidasks': 0, 'orders': 0, 'filled': 0, 'partial': 0, 'cancelled': 0}
+
+        mxfr1 = Contract(code='MXFR1', symbol='MXFR1', name='小型臺指近月', target_code='MXF' + series[0][1],
+                         category='MXF', security_type='FUT')
+        center = int(round(open_price / strike_step)) * strike_step
+        options = {name: {} for name, _ in series}
+        for contract_name, month in series:
+            for strike in range(center - strike_width, center + strike_width + strike_step, strike_step):
+                for right in ('C', 'P'):
+                    symbol = f"{contract_name}{month}{strike}{right}"
+                    options[contract_name][symbol] = Contract(
+                        code=symbol, symbol=symbol, name=symbol, category=contract_name,
+                        delivery_month=month, strike_price=strike, option_right=right,
+                        security_type='OPT', exchange='TAIFEX',
+                    )
+        self.Contracts = SimpleNamespace(
+            Futures=SimpleNamespace(MXF=ContractGroup({'MXFR1': mxfr1})),
+            Options=SimpleNamespace(**{name: ContractGroup(group) for name, group in options.items()}),
+        )
+        self._options = {code: contract for group in options.values() for code, contract in group.items()}
+
+        self._ids = itertools.count(1)
+        self._events = []
+        self._events_cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run_market, name="sim-market", daemon=True),
+            threading.Thread(target=self._run_events, name="sim-broker", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_env(cls, environ, series, open_price=None) -> "Shioaji":
+        """
+        A session configured by the SIM_* variables of environ.
+        """
+        def get(name, default, cast=float):
+            value = environ.get(name)
+            return cast(value) if value else default
+
+        return cls(
+            open_price=get('SIM_OPEN', open_price or 21000),
+            tick_rate=get('SIM_TICK_RATE', 100.0),
+            tick_vol=get('SIM_TICK_VOL', 2.0),
+            option_vol=get('SIM_OPTION_VOL', 300.0),
+            series=series,
+            ack_latency=get('SIM_ACK_LATENCY', 0.002),
+            reply_latency=get('SIM_REPLY_LATENCY', 0.005),
+            latency_jitter=get('SIM_LATENCY_JITTER', 0.5),
+            fill_prob=get('SIM_FILL_PROB', 0.6),
+            partial_prob=get('SIM_PARTIAL_PROB', 0.2),
+            seed=get('SIM_SEED', None, int),
+        )
+
+    # --- session ---------------------------------------------------------
+
+    def login(self, api_key=None, secret_key=None, contracts_cb=None, **kwargs):
+        if contracts_cb is not None:
+            for security_type in ('IND', 'STK', 'FUT', 'OPT'):
+                contracts_cb(security_type)
+        return [self.futopt_account]
+
+    def activate_ca(self, ca_path=None, ca_passwd=None, **kwargs):
+        return True
+
+    def logout(self):
+        self._stop.set()
+        with self._events_cond:
+            self._events_cond.notify()
+        for thread in self._threads:
+            thread.join()
+        return True
+
+    def set_order_callback(self, callback):
+        self.on_order = callback
+
+    # --- market ----------------------------------------------------------
+
+    def _latency(self, base):
+        with self._rng_lock:
+            return base * (1 + self.latency_jitter * (2 * self.rng.random() - 1))
+
+    def option_quote(self, contract):
+        """
+        (bid, ask) of an option at the current underlying price.
+        """
+        theo = bachelier(self.price, contract.strike_price, self.option_vol, contract.option_right)
+        half = max(0.25, 0.02 * theo)
+        return round_tick(max(theo - half, 0.0)), round_tick(theo + half, up=True)
+
+    def _run_market(self):
+        interval = 1.0 / self.tick_rate
+        next_ts = time.perf_counter()
+        n = 0
+        while not self._stop.is_set():
+            now = time.perf_counter()
+            if now < next_ts:
+                time.sleep(min(next_ts - now, 0.05))
+                continue
+            next_ts += interval
+            with self._rng_lock:
+                self.price = round(self.price + self.rng.normal(0, self.tick_vol))
+            n += 1
+            try:
+                self._emit_tick()
+                if n % self.bidask_every == 0:
+                    self._emit_bidasks()
+            except Exception:
+                traceback.print_exc()
+
+    def _emit_tick(self):
+        callback = self.quote.on_tick
+        if callback is None:
+            return
+        stamp = datetime.datetime.now()
+        for contract in list(self.quote.ticks.values()):
+            tick = TickFOPv1(
+                code=getattr(contract, 'target_code', contract.code), datetime=stamp,
+                open=self.price, close=self.price, high=self.price, low=self.price,
+                volume=1, total_volume=self.stats['ticks'] + 1, simtrade=False,
+            )
+            callback(constant.Exchange.TAIFEX, tick)
+            self.stats['ticks'] += 1
+
+    def _emit_bidasks(self):
+        callback = self.quote.on_bidask
+        if callback is None:
+            return
+        stamp = datetime.datetime.now()
+        for contract in list(self.quote.bidasks.values()):
+            bid, ask = self.option_quote(contract)
+            callback(constant.Exchange.TAIFEX, BidAskFOPv1(
+                code=contract.code, datetime=stamp,
+                bid_price=[bid], bid_volume=[10], ask_price=[ask], ask_volume=[10],
+            ))
+            self.stats['bidasks'] += 1
+
+    # --- orders ----------------------------------------------------------
+
+    def ComboOrder(self, **fields) -> ComboOrder:
+        return ComboOrder(**fields)
+
+    def _filled(self, combo: ComboContract, order: ComboOrder) -> int:
+        """
+        Quantity an IOC combo order fills against the current quotes.
+        """
+        (bid1, ask1), (bid2, ask2) = (self.option_quote(self._options[leg.code]) for leg in combo.legs)
+        mid = (bid1 + ask1) / 2 - (bid2 + ask2) / 2
+        if combo.legs[0].action == constant.Action.Sell:
+            # selling the spread for a credit
+            natural, aggressive = bid1 - ask2, order.price <= mid
+            crosses = order.price <= natural
+        else:
+            natural, aggressive = ask1 - bid2, order.price >= mid
+            crosses = order.price >= natural
+        if crosses:
+            return order.quantity
+        if not aggressive:
+            return 0
+        with self._rng_lock:
+            r = self.rng.random()
+            if r < self.fill_prob:
+                return order.quantity
+            if r < self.fill_prob + self.partial_prob and order.quantity > 1:
+                return int(self.rng.integers(1, order.quantity))
+        return 0
+
+    def place_comboorder(self, combo_contract: ComboContract, order: ComboOrder, timeout=5000):
+        time.sleep(self._latency(self.ack_latency))
+        order_id = f"{next(self._ids):08x}"
+        order = order.copy({'id': order_id, 'seqno': order_id[-6:]})
+        filled = self._filled(combo_contract, order)
+        self.stats['orders'] += 1
+        if filled == order.quantity:
+            self.stats['filled'] += 1
+        elif filled:
+            self.stats['partial'] += 1
+        else:
+            self.stats['cancelled'] += 1
+
+        due = time.perf_counter() + self._latency(self.reply_latency)
+        for msg in self._messages(combo_contract, order, filled):
+            self._schedule(due, msg)
+        return SimpleNamespace(
+            contract=combo_contract, order=order,
+            status=SimpleNamespace(id=order_id, status='PendingSubmit', order_quantity=order.quantity),
+        )
+
+    def _messages(self, combo, order, filled):
+        """
+        (state, msg) callbacks of one combo IOC: New per leg, the deals,
+        then Cancel per leg for what did not fill.
+        """
+        ts = time.time()
+        legs = [{'code': leg.code, 'action': leg.action} for leg in combo.legs]
+        base_order = {
+            'id': order.id, 'seqno': order.seqno, 'ordno': order.seqno, 'account': {'account_id': self.futopt_account.account_id},
+            'action': legs[0]['action'], 'price': order.price, 'price_type': order.price_type,
+            'order_type': order.order_type, 'oc_type': order.octype,
+        }
+        for leg in legs:
+            yield constant.OrderState.FuturesOrder, {
+                'operation': {'op_type': 'New', 'op_code': '00', 'op_msg': ''},
+                'order': {**base_order, 'quantity': order.quantity},
+                'status': {'id': order.id, 'exchange_ts': ts, 'order_quantity': order.quantity, 'cancel_quantity': 0},
+                'contract': leg,
+            }
+        if filled:
+            for leg in legs:
+                yield constant.OrderState.FuturesDeal, {
+                    'trade_id': order.id, 'seqno': order.seqno, 'ordno': order.seqno,
+                    'exchange_seq': order.seqno, 'broker_id': self.futopt_account.broker_id,
+                    'account_id': self.futopt_account.account_id, 'action': leg['action'], 'code': leg['code'],
+                    'price': order.price, 'quantity': filled, 'ts': ts,
+                }
+        if filled < order.quantity:
+            for leg in legs:
+                yield constant.OrderState.FuturesOrder, {
+                    'operation': {'op_type': 'Cancel', 'op_code': '00', 'op_msg': ''},
+                    'order': {**base_order, 'quantity': order.quantity},
+                    'status': {'id': order.id, 'exchange_ts': ts, 'order_quantity': order.quantity,
+                               'cancel_quantity': order.quantity - filled},
+                    'contract': leg,
+                }
+
+    def _schedule(self, due, item):
+        with self._events_cond:
+            heapq.heappush(self._events, (due, next(self._ids), item))
+            self._events_cond.notify()
+
+    def _run_events(self):
+        while not self._stop.is_set():
+            with self._events_cond:
+                if not self._events:
+                    self._events_cond.wait(0.1)
+                    continue
+                due = self._events[0][0]
+                now = time.perf_counter()
+                if due > now:
+                    self._events_cond.wait(due - now)
+                    continue
+                _, _, (state, msg) = heapq.heappop(self._events)
+            if self.on_order is not None:
+                try:
+                    self.on_order(state, msg)
+                except Exception:
+                    traceback.print_exc()
+
+
+class Notifier:
+    """
+    TelegramNotifier stand-in that prints instead of sending.
+    """
+
+    def __init__(self, quiet: bool = False):
+        self.quiet = quiet
+        self.stats = {'queued': 0, 'sent': 0}
+
+    def notify(self, message, key=None):
+        self.stats['queued'] += 1
+        self.stats['sent'] += 1
+        if not self.quiet:
+            print(f"[notify] {message}")
+
+    def close(self, timeout=None):
+        pass
+
+
+class AlwaysOpen:
+    """
+    MarketCalendar stand-in for offline runs: always in session.
+    """
+
+    def is_open(self, ts=None):
+        return True
+
+    def seconds_until_open(self, ts=None):
+        return 0.0
+
+    def seconds_until_change(self, ts=None):
+        return 3600.0
+
+    def trading_day(self, ts=None):
+        return datetime.date.today()
@@ -0,0 +1,409 @@
+import os
+import json
+import bisect
+import threading
+import numpy as np
+from collections import defaultdict
+from collections.abc import Mapping
+from typing import Callable, Dict, List, Optional
+
+
+class market:
+
+    def __init__(self, listener: Optional[Callable[[int], None]] = None):
+
+        self.exchange=None
+        self.close=None
+        # called with every new close, e.g. TriggerEngine.on_price
+        self.listener=listener
+    
+    def update(self, exchange, tick):
+        self.exchange = exchange
+        self.close = int(tick.close)
+        if self.listener is not None:
+            self.listener(self.close)
+
+
+def get_bear_call_spread(price, calls):
+    """
+    Short the first call strike above price, long the next one.
+    calls must be sorted.
+    """
+    i = bisect.bisect_right(calls, price)
+    if i == 0 or i == len(calls):
+        return None, None
+    p2 = calls[i+1] if i+1 < len(calls) else None
+    return calls[i], p2
+
+def get_bull_put_spread(price, puts):
+    """
+    Short the first put strike below price, long the next one down.
+    puts must be sorted.
+    """
+    i = bisect.bisect_left(puts, price)
+    if i == 0 or i == len(puts):
+        return None, None
+    p2 = puts[i-2] if i-2 >= 0 else None
+    return puts[i-1], p2
+
+
+class StrikeChain:
+    """
+    Strike index of one contract month, built once from get_options output.
+
+    calls / puts are sorted strike lists for the scalar bisect lookups,
+    call_strikes / put_strikes the same as NumPy arrays for spreads(), which
+    places a whole ladder with one searchsorted per side. symbols maps
+    side ('C'/'P') -> strike -> contract key.
+    """
+
+    def __init__(self, options):
+        self.symbols = options
+        self.calls = sorted(options['C'])
+        self.puts = sorted(options['P'])
+        self.call_strikes = np.array(self.calls, dtype=np.int64)
+        self.put_strikes = np.array(self.puts, dtype=np.int64)
+
+    def bear_call(self, price):
+        return get_bear_call_spread(price, self.calls)
+
+    def bull_put(self, price):
+        return get_bull_put_spread(price, self.puts)
+
+    def spreads(self, prices, side):
+        """
+        Vectorized get_bear_call_spread (side 0) / get_bull_put_spread (side 1)
+        over an array of prices, -1 where a leg does not exist.
+        """
+        prices = np.asarray(prices)
+        if side == 0:
+            strikes = self.call_strikes
+            i = np.searchsorted(strikes, prices, side='right')
+            l1, l2, valid = i, i+1, (i > 0) & (i < len(strikes))
+        else:
+            strikes = self.put_strikes
+            i = np.searchsorted(strikes, prices, side='left')
+            l1, l2, valid = i-1, i-2, (i > 0) & (i < len(strikes))
+
+        padded = np.append(strikes, -1)
+        l1 = np.where(valid, l1, -1)
+        l2 = np.where(valid & (l2 >= 0) & (l2 < len(strikes)), l2, -1)
+        return padded[l1], padded[l2]
+
+    def recenter(self, std_prices, ladder):
+        """
+        (l1p, l2p) of every ladder level for new std_prices.
+        """
+        std_prices = np.asarray(std_prices)
+        placed = {}
+        for side, op in ((0, '>='), (1, '<=')):
+            rows = [row for row in ladder if row[1] == op]
+            l1, l2 = self.spreads(std_prices[[row[2] for row in rows]], side)
+            for row, p1, p2 in zip(rows, l1.tolist(), l2.tolist()):
+                placed[row[0]] = (p1 if p1 >= 0 else None, p2 if p2 >= 0 else None)
+        return placed
+
+    def save(self, path, trading_day):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'trading_day': trading_day, 'symbols': self.symbols}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, trading_day):
+        """
+        The chain saved at path for trading_day, None if there is none or it
+        was saved on another trading day (strikes are listed daily).
+        """
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get('trading_day') != trading_day:
+            return None
+        symbols = snapshot['symbols']
+        return cls({side: {int(strike): key for strike, key in symbols[side].items()} for side in ('C', 'P')})
+
+
+_chains = {}
+
+
+def strike_chain(contract, contract_name='TXO', contract_month='202505',
+                 snapshot_dir=None, trading_day=None, refresh=False):
+    """
+    StrikeChain of one contract month, the contract tree is walked only the
+    first time a month is asked for. With snapshot_dir, the chain walked is
+    saved there for trading_day and a restart on the same trading day loads
+    it instead of walking the tree again. refresh walks the tree regardless.
+    """
+    key = (contract_name, contract_month)
+    chain = None if refresh else _chains.get(key)
+    path = None
+    if snapshot_dir is not None:
+        path = os.path.join(snapshot_dir, f"{contract_name}{contract_month}.json")
+        if chain is None and not refresh:
+            chain = StrikeChain.load(path, trading_day)
+    if chain is None:
+        chain = StrikeChain(get_options(contract, contract_name, contract_month))
+        if path is not None:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            chain.save(path, trading_day)
+    _chains[key] = chain
+    return chain
+
+
+# distance of each level from the previous one, in std
+RANGE_STEPS = (0.5, 0.5, 1, 1)
+
+
+def calculate_ranges(open_price, std_val, steps=RANGE_STEPS):
+
+    bounds = []
+    upper, lower = open_price, open_price
+    for step in steps:
+        upper = upper + std_val*step
+        lower = lower - std_val*step
+        bounds.append([upper, lower])
+
+    total_bounds = np.concatenate(bounds)
+    return sorted(total_bounds)
+
+def get_options(contract, contract_name='TXO', contract_month='202505'):
+    options = defaultdict(dict)
+    options['C'] = {}
+    options['P'] = {}
+
+
+    for key in contract.keys():
+        cname = key[:3]
+        dmonth = key[3:9]
+        if cname != contract_name or dmonth != contract_month:
+            continue
+
+        price = key[9:-1]
+        side = key[-1]
+        options[side][int(price)] = key
+    return options
+
+class combo_order:
+
+    def __init__(self, contract, p, side=0, option_prices=[], option_dict={}):
+        #side
+        #   0 : call
+        #   1 : put
+
+        side_dict = {
+            0 : 'C',
+            1 : 'P'
+        }
+        self.contract = contract
+        self.p=p
+        self.side=side
+        self.trigger=False
+        self.stop=False
+        
+        if side == 0:
+            self.l1p, self.l2p = get_bear_call_spread(self.p, option_prices)
+            c1_name = option_dict[side_dict[self.side]][self.l1p]
+            c2_name = option_dict[side_dict[self.side]][self.l2p]
+            
+            self.c1 = getattr(self.contract, c1_name)
+            self.c2 = getattr(self.contract, c2_name)
+        elif side == 1:
+            self.l1p, self.l2p = get_bull_put_spread(self.p, option_prices)
+            c1_name = option_dict[side_dict[self.side]][self.l1p]
+            c2_name = option_dict[side_dict[self.side]][self.l2p]
+            
+            self.c1 = getattr(self.contract, c1_name)
+            self.c2 = getattr(self.contract, c2_name)
+
+def order_prices(order_pt, open_base_pt=22, close_base_pt=38, base_pd=50):
+    """
+    Entry / cover prices of spreads order_pt strikes wide (scalar or array).
+    """
+    return open_base_pt * order_pt / base_pd, close_base_pt * order_pt / base_pd
+
+
+def calculate_order_prices(combo_orders, open_base_pt=22, close_base_pt=38, base_pd=50):
+    keys = list(combo_orders.keys())
+    for key in keys:
+        order = combo_orders[key]['enter_order']
+        
+        order_pt = abs(int(order.c1.symbol[9:-1]) - int(order.c2.symbol[9:-1]))
+        cur_open_pt, cur_close_pt = order_prices(order_pt, open_base_pt, close_base_pt, base_pd)
+        combo_orders[key]['open_price'] = cur_open_pt
+        combo_orders[key]['close_price'] = cur_close_pt
+    return combo_orders
+
+
+def make_ladder(quantities=(1, 2, 4, 8), names=None):
+    """
+    Ladder table for len(quantities) levels per side, quantities nearest first.
+    Rows are (name, side, trigger index in calculate_ranges, stop level,
+    open_q, close_q); a level covers the next nearer level on its side and
+    buys back that level's open_q.
+    """
+    n = len(quantities)
+    names = names or [str(i) for i in range(1, n+1)]
+    ladder = []
+    for i in reversed(range(n)):
+        stop = f"co_p{names[i-1]}" if i else None
+        ladder.append((f"co_p{names[i]}", '>=', n+i, stop, quantities[i], quantities[i-1] if i else 0))
+    for i in range(n):
+        stop = f"co_n{names[i-1]}" if i else None
+        ladder.append((f"co_n{names[i]}", '<=', n-1-i, stop, quantities[i], quantities[i-1] if i else 0))
+    return ladder
+
+
+LADDER = make_ladder((1, 2, 4, 8), names=['p5', '1', '2', '3'])
+
+
+class Level:
+    """
+    One level of a Ladder, read and written like the dict it replaces:
+    level['open_q'], level['triggered'] = True, 'stop_template' in level.
+    """
+    __slots__ = ('ladder', 'i')
+
+    def __init__(self, ladder: "Ladder", i: int):
+        self.ladder = ladder
+        self.i = i
+
+    def __getitem__(self, key):
+        return self.ladder.get_field(self.i, key)
+
+    def __setitem__(self, key, value):
+        self.ladder.set_field(self.i, key, value)
+
+    def __contains__(self, key):
+        return key in Ladder.FIELDS or key in self.ladder.objects[self.i]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def update(self, fields) -> None:
+        for key, value in dict(fields).items():
+            self[key] = value
+
+
+class Ladder(Mapping):
+    """
+    The wing levels as parallel arrays, level i in row i of each: trigger
+    price, direction (+1 for '>=', -1 for '<='), quantities and prices, and
+    the triggered / covered state as bitmasks, bit i for level i. Contracts,
+    templates and anything else per level live in objects[i].
+
+    It is a mapping of level name to Level, so code reading combo_orders
+    [name]['open_q'] keeps working, while the first crossing of every level
+    over a batch of ticks is one vectorized pass (first_crossings).
+    """
+    ARRAYS = ('trigger_price', 'open_q', 'close_q', 'open_price', 'close_price')
+    FIELDS = ARRAYS + ('side', 'triggered', 'covered')
+
+    def __init__(self, names: List[str], trigger_price, side, open_q, close_q,
+                 open_price=None, close_price=None, objects: Optional[List[Dict]] = None):
+        n = len(names)
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.trigger_price = np.asarray(trigger_price, dtype=np.float64)
+        self.direction = np.where(np.asarray(side) == '>=', 1, -1).astype(np.int8)
+        self.open_q = np.asarray(open_q, dtype=np.int64)
+        self.close_q = np.asarray(close_q, dtype=np.int64)
+        self.open_price = np.zeros(n) if open_price is None else np.asarray(open_price, dtype=np.float64)
+        self.close_price = np.zeros(n) if close_price is None else np.asarray(close_price, dtype=np.float64)
+        self.objects = objects if objects is not None else [{} for _ in range(n)]
+        self.triggered = 0
+        self.covered = 0
+        # levels without a previous level to cover count as covered
+        for i, obj in enumerate(self.objects):
+            if obj.get('stop_order') is None:
+                self.covered |= 1 << i
+        self._lock = threading.Lock()
+
+    # --- mapping of name -> Level ---------------------------------------
+
+    def __getitem__(self, name) -> Level:
+        return Level(self, self.index[name])
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def with_prefix(self, prefix: str) -> "Ladder":
+        """
+        Rename every level to prefix + name, in place.
+        """
+        self.names = [prefix + name for name in self.names]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        for obj in self.objects:
+            if obj.get('stop_level') is not None:
+                obj['stop_level'] = prefix + obj['stop_level']
+        return self
+
+    # --- fields -----------------------------------------------------------
+
+    def get_field(self, i: int, key: str):
+        if key in self.ARRAYS:
+            return getattr(self, key)[i].item()
+        if key == 'side':
+            return '>=' if self.direction[i] > 0 else '<='
+        if key == 'triggered':
+            return bool(self.triggered >> i & 1)
+        if key == 'covered':
+            return bool(self.covered >> i & 1)
+        return self.objects[i][key]
+
+    def set_field(self, i: int, key: str, value) -> None:
+        if key in self.ARRAYS:
+            getattr(self, key)[i] = value
+        elif key in ('triggered', 'covered'):
+            with self._lock:
+                mask = getattr(self, key)
+                setattr(self, key, mask | 1 << i if value else mask & ~(1 << i))
+        elif key == 'side':
+            self.direction[i] = 1 if value == '>=' else -1
+        else:
+            self.objects[i][key] = value
+
+    # --- crossings --------------------------------------------------------
+
+    def first_crossings(self, prices) -> np.ndarray:
+        """
+        Index into prices of the tick where each level first crosses,
+        len(prices) if none does.
+        """
+        prices = np.asarray(prices)
+        up = self.direction > 0
+        hit = np.full(len(self.names), len(prices))
+        hit[up] = np.searchsorted(np.maximum.accumulate(prices), self.trigger_price[up], side='left')
+        hit[~up] = np.searchsorted(-np.minimum.accumulate(prices), -self.trigger_price[~up], side='left')
+        return hit
+
+
+def build_combo_orders(contract, std_prices, calls, puts, option_dict, ladder=LADDER, **pricing):
+    """
+    The wing ladder: one Ladder level per row with its entry spread, the
+    spread and name (stop_level) of the previous level it covers,
+    quantities, and prices from order_prices (pricing holds its base points).
+    """
+    enters = {}
+    for name, side, idx, _, _, _ in ladder:
+        if side == '>=':
+            enters[name] = combo_order(contract, std_prices[idx], 0, calls, option_dict)
+        else:
+            enters[name] = combo_order(contract, std_prices[idx], 1, puts, option_dict)
+
+    names, sides, idxs, stops, open_qs, close_qs = zip(*ladder)
+    order_pt = np.abs(np.array([enters[name].l1p - enters[name].l2p for name in names], dtype=np.float64))
+    open_price, close_price = order_prices(order_pt, **pricing)
+    return Ladder(
+        names, np.asarray(std_prices)[list(idxs)], sides, open_qs, close_qs, open_price, close_price,
+        objects=[
+            {'enter_order': enters[name], 'stop_order': enters[stop] if stop is not None else None,
+             'stop_level': stop}
+            for name, stop in zip(names, stops)
+        ],
+    )
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from strategy import make_ladder
+from backtest import Backtest, IOCFillModel, load_ticks, split_weeks
+
+
+# every key is swept over its list of values
+DEFAULT_GRID = {
+    'std_mult': [0.8, 1.0, 1.2],
+    'steps': [[0.5, 0.5, 1, 1], [0.5, 1, 1, 1], [1, 1, 1, 1]],
+    'quantities': [[1, 2, 4, 8], [1, 1, 2, 4], [1, 2, 3, 4]],
+    'open_base_pt': [18, 22, 26],
+    'close_base_pt': [34, 38, 42],
+    'walk_every': [25, 50],
+}
+
+_ticks = None
+
+
+def combo_key(params: Dict) -> str:
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def expand_grid(grid: Dict) -> List[Dict]:
+    """
+    All combinations, minus those whose steps and quantities disagree on
+    the number of levels per side.
+    """
+    keys = sorted(grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    return [c for c in combos if len(c['steps']) == len(c['quantities'])]
+
+
+def data_signature(ticks_path) -> List:
+    """
+    (name, size, mtime_ns) of the tick file, or of every day file of a
+    TickRecorder directory, so cached results go stale with the data.
+    """
+    if os.path.isdir(ticks_path):
+        names = sorted(n for n in os.listdir(ticks_path) if n.endswith('.bin'))
+        paths = [os.path.join(ticks_path, n) for n in names]
+    else:
+        paths = [ticks_path]
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append([os.path.basename(path), st.st_size, st.st_mtime_ns])
+    return signature
+
+
+def _init_worker(ticks_path):
+    global _ticks
+    ts, close = load_ticks(ticks_path)
+    _ticks = ts, close, split_weeks(ts)
+
+
+def evaluate(params: Dict, std_val: float, fill: Dict, seed: int) -> Dict:
+    """
+    Backtest one parameter combination over the worker's ticks. Fills of
+    each (week, level) are drawn from their own stream of seed (see
+    Backtest), so combinations are compared on the same luck for the levels
+    they share; levels placed or sized differently still fill differently.
+    """
+    ts, close, weeks = _ticks
+    bt = Backtest(
+        std_val * params['std_mult'],
+        IOCFillModel(seed=seed, **fill),
+        ladder=make_ladder(params['quantities']),
+        steps=params['steps'],
+        pricing={'open_base_pt': params['open_base_pt'], 'close_base_pt': params['close_base_pt']},
+        walk_every=params['walk_every'],
+    )
+    results = bt.run(ts, close, weeks)
+    weekly = results.groupby('week')['pnl'].sum()
+    return {
+        **params,
+        'pnl': float(weekly.sum()),
+        'mean_week': float(weekly.mean()),
+        'std_week': float(weekly.std(ddof=0)),
+        'sharpe': float(weekly.mean() / weekly.std(ddof=0)) if weekly.std(ddof=0) > 0 else np.nan,
+        'worst_week': float(weekly.min()),
+        'entries': int(results['entry_qty'].sum()),
+        'entry_slippage': float(results['entry_slippage'].mean()),
+    }
+
+
+def run_sweep(ticks_path, std_val, grid=DEFAULT_GRID, cache_dir="./sweep_cache",
+              fill=None, seed=0, workers=None, rank_by='sharpe') -> pd.DataFrame:
+    """
+    Evaluate every combination of grid on a process pool. Each finished
+    combination is written to cache_dir/<key>.json at once, so an
+    interrupted sweep resumes with only the missing ones. The key covers the
+    tick data too, results of ticks since recorded over are not reused.
+    """
+    fill = fill or {}
+    os.makedirs(cache_dir, exist_ok=True)
+    tag = {
+        'ticks': os.path.abspath(ticks_path), 'data': data_signature(ticks_path),
+        'std_val': std_val, 'fill': fill, 'seed': seed,
+    }
+
+    rows, todo = [], []
+    for params in expand_grid(grid):
+        path = os.path.join(cache_dir, f"{combo_key({**params, **tag})}.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                rows.append(json.load(f))
+        else:
+            todo.append((params, path))
+    print(f"{len(rows)} cached, {len(todo)} to run")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ticks_path,)) as pool:
+        futures = {pool.submit(evaluate, params, std_val, fill, seed): path for params, path in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            tmp = futures[future] + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(row, f)
+            os.replace(tmp, futures[future])
+            rows.append(row)
+            if i % 100 == 0:
+                print(f"{i}/{len(todo)} done")
+
+    table = pd.DataFrame(rows)
+    return table.sort_values(rank_by, ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("ticks", help="recorded MXF ticks, .npz/.npy/.csv with ts and close")
+    parser.add_argument("--std", type=float, required=True, help="WING_STD the std_mult grid scales")
+    parser.add_argument("--grid", help="JSON file overriding DEFAULT_GRID keys")
+    parser.add_argument("--cache-dir", default="./sweep_cache")
+    parser.add_argument("--fill-prob", type=float, default=0.3)
+    parser.add_argument("--partial-prob", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank-by", default='sharpe')
+    parser.add_argument("--out", default="sweep_result.csv")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+
+    table = run_sweep(
+        args.ticks, args.std, grid, args.cache_dir,
+        {'fill_prob': args.fill_prob, 'partial_prob': args.partial_prob},
+        args.seed, args.workers, args.rank_by,
+    )
+    table.to_csv(args.out, index=False)
+    print(table.head(20).to_string())
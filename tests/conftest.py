@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+# run.py imports the broker simulator instead of shioaji
+os.environ.setdefault("BROKER", "sim")
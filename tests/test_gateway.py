@@ -0,0 +1,26 @@
+import threading
+
+from gateway import COVER, ENTRY, OrderGateway
+
+
+def test_each_submit_gets_its_own_result():
+    gateway = OrderGateway(rate=1000.0, burst=1.0, senders=1)
+    release = threading.Event()
+    blocker = gateway.submit(release.wait, 5)
+    futures = [gateway.submit(lambda i=i: i, priority=ENTRY) for i in range(5)]
+    cover = gateway.submit(lambda: 'cover', priority=COVER)
+    release.set()
+
+    assert blocker.result(5)
+    assert [f.result(5) for f in futures] == list(range(5))
+    assert cover.result(5) == 'cover'
+    gateway.close()
+    assert gateway.stats['submitted'] == gateway.stats['sent'] == 7
+
+
+def test_failed_placement_is_counted():
+    gateway = OrderGateway()
+    future = gateway.submit(lambda: 1 / 0)
+    assert isinstance(future.exception(5), ZeroDivisionError)
+    gateway.close()
+    assert gateway.stats['failed'] == 1 and gateway.stats['sent'] == 0
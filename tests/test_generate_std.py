@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_std import StdCache, collect_weekly_amp, load_files
+from volatility import RunningMoments
+
+COLUMNS = [
+    '交易日期', '契約', '到期月份(週別)', '開盤價', '最高價', '最低價', '收盤價',
+    '成交量', '結算價', '未沖銷契約數', '是否因訊息面暫停交易', '交易時段',
+]
+
+
+def taifex_days(start, n_days, seed):
+    """
+    TAIFEX daily rows of MTX weeklies (this week's and next week's, settling
+    on Wednesdays) and a monthly, both sessions, for n_days business days.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    price = 20000.0
+    for day in pd.bdate_range(start, periods=n_days):
+        price += rng.normal(0, 60)
+        wed = day + pd.Timedelta(days=(2 - day.weekday()) % 7)
+        weeklies = [wed, wed + pd.Timedelta(days=7)]
+        expires = [f"{w.strftime('%Y%m')}W{(w.day - 1) // 7 + 1}" for w in weeklies] + [day.strftime('%Y%m')]
+        for i, expire in enumerate(expires):
+            for session in ('一般', '盤後'):
+                o = round(price + rng.normal(0, 20))
+                c = round(o + rng.normal(0, 80))
+                settling = i == 0 and day == weeklies[0] and session == '一般'
+                rows.append((
+                    day.strftime('%Y/%m/%d'), 'MTX', expire, o, max(o, c) + 10, min(o, c) - 10, c,
+                    100, 0 if settling else c, 1000, '', session,
+                ))
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+def write_files(path, n_files, days_per_file=7, seed=0):
+    """
+    n_files dumps of days_per_file business days each, date named.
+    """
+    frame = taifex_days('2024-01-01', n_files * days_per_file, seed)
+    dates = frame['交易日期'].unique()
+    names = []
+    for k in range(n_files):
+        chunk = frame[frame['交易日期'].isin(dates[k * days_per_file:(k + 1) * days_per_file])]
+        name = f"{chunk['交易日期'].iloc[0].replace('/', '_')}.csv"
+        chunk.to_csv(os.path.join(path, name), index=False)
+        names.append(name)
+    return names
+
+
+def full_std(path, names):
+    data = load_files([os.path.join(path, name) for name in names], workers=1)
+    diffs = collect_weekly_amp(pd.concat(data, ignore_index=True))
+    return len(diffs), RunningMoments.from_values(diffs).std()
+
+
+def test_incremental_update_matches_full_run(tmp_path):
+    names = write_files(str(tmp_path), 8)
+    cache_dir = str(tmp_path / ".std_cache")
+
+    cache = StdCache(cache_dir)
+    assert cache.update(str(tmp_path), names[:5], workers=1) == names[:5]
+    cache.save()
+
+    cache = StdCache(cache_dir)
+    assert cache.update(str(tmp_path), names, workers=1) == names[5:]
+    count, std = full_std(str(tmp_path), names)
+    assert count > 0
+    assert cache.moments.count == count
+    assert cache.std() == pytest.approx(std)
+
+
+def test_changed_middle_file_replays_the_history(tmp_path):
+    names = write_files(str(tmp_path), 8)
+    cache_dir = str(tmp_path / ".std_cache")
+    cache = StdCache(cache_dir)
+    cache.update(str(tmp_path), names, workers=1)
+    cache.save()
+    before = cache.std()
+
+    # another day's prices in the middle of the history
+    middle = os.path.join(str(tmp_path), names[3])
+    edited = pd.read_csv(middle)
+    edited['收盤價'] += 300
+    edited.to_csv(middle, index=False)
+    os.utime(middle, ns=(os.stat(middle).st_atime_ns, os.stat(middle).st_mtime_ns + 10**9))
+
+    cache = StdCache(cache_dir)
+    assert cache.update(str(tmp_path), names, workers=1) == [names[3]]
+    count, std = full_std(str(tmp_path), names)
+    assert cache.merged == names
+    assert cache.moments.count == count
+    assert cache.std() == pytest.approx(std)
+    assert cache.std() != pytest.approx(before)
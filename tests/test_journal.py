@@ -0,0 +1,41 @@
+from journal import StateJournal
+
+
+def journal_of(tmp_path, events):
+    journal = StateJournal(str(tmp_path / "state" / "journal.sqlite"))
+    for level, event, data in events:
+        journal.record(level, event, **data)
+    journal.close()
+    return journal
+
+
+def test_replay_folds_level_events(tmp_path):
+    journal = journal_of(tmp_path, [
+        ('TXO/', 'armed', {'open_price': 21000}),
+        ('TXO/co_p1', 'triggered', {'price': 21100}),
+        ('TXO/co_p1', 'open_partial', {'open_q': 1}),
+        ('TXO/co_p1', 'opened', {}),
+        ('TXO/co_p2', 'triggered', {'price': 21200}),
+        ('TXO/co_p2', 'close_partial', {'close_q': 1}),
+    ])
+    assert journal.replay('TXO/') == {
+        'TXO/': {'open_price': 21000},
+        'TXO/co_p1': {'open_q': 1, 'triggered': True},
+        'TXO/co_p2': {'close_q': 1},
+    }
+
+
+def test_replay_drops_levels_of_a_ladder_armed_elsewhere(tmp_path):
+    journal = journal_of(tmp_path, [
+        ('TXO/', 'armed', {'open_price': 21000}),
+        ('TXO/co_p1', 'opened', {}),
+        ('TXO/', 'armed', {'open_price': 21000}),
+        ('TXO/co_p2', 'opened', {}),
+        ('TXO/', 'armed', {'open_price': 21500}),
+        ('TXO/co_n1', 'opened', {}),
+        ('MXF/co_p1', 'opened', {}),
+    ])
+    assert journal.replay('TXO/') == {
+        'TXO/': {'open_price': 21500},
+        'TXO/co_n1': {'triggered': True},
+    }
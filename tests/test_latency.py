@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from latency import LatencyHistogram, bucket_index, bucket_value
+
+
+def test_buckets_hold_their_values():
+    for value in [0, 1, 31, 32, 33, 1000, 12345, 10**6, 2**40 + 7, 2**62]:
+        i = bucket_index(value)
+        assert abs(bucket_value(i) - value) <= value / 16
+        assert bucket_index(bucket_value(i)) == i
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_percentiles_within_bucket_error(seed):
+    # tick-to-order latencies, tens of microseconds with a long tail
+    values = np.random.default_rng(seed).lognormal(np.log(50_000), 1.0, 100_000).astype(np.int64)
+    hist = LatencyHistogram()
+    for v in values.tolist():
+        hist.record(v)
+
+    assert hist.count == len(values)
+    assert hist.max == values.max()
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = np.percentile(values, q * 100, method='inverted_cdf')
+        assert hist.percentile(q) == pytest.approx(exact, rel=1 / 16)
+    assert hist.percentile(1.0) == values.max()
+
+
+def test_small_values_are_exact():
+    hist = LatencyHistogram()
+    for v in range(1, 11):
+        hist.record(v)
+    assert hist.percentile(0.5) == 5
+    assert hist.percentile(0.9) == 9
+    assert LatencyHistogram().percentile(0.99) == 0
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import run
+import simulator
+from journal import StateJournal
+from runtime import AsyncRuntime
+from scheduler import ExecutionScheduler
+from strategy import Ladder
+
+
+@pytest.fixture
+def levels(tmp_path, monkeypatch):
+    """
+    Two levels on one side, 'level' covers 'stop'; entries fill when their
+    event is set, every workflow step is logged in order.
+    """
+    combo_orders = Ladder(
+        ['stop', 'level'], [21100, 21200], ['>=', '>='], [1, 2], [0, 1],
+        objects=[
+            {'enter_order': 'stop', 'stop_order': None, 'stop_level': None},
+            {'enter_order': 'level', 'stop_order': 'stop', 'stop_level': 'stop'},
+        ],
+    )
+    for order in combo_orders.values():
+        order['entered'] = Future()
+    fills = {name: threading.Event() for name in combo_orders}
+    log = []
+
+    def enter_workflow(api, combo_orders, name, *args):
+        assert fills[name].wait(5)
+        run.entry_result(combo_orders[name], name, {'status': 'filled'})
+        log.append(('entered', name))
+        return True
+
+    def cover_workflow(api, combo_orders, name, *args):
+        log.append(('cover', name))
+
+    async def enter_task(api, combo_orders, name, *args):
+        while not fills[name].is_set():
+            await asyncio.sleep(0.01)
+        return enter_workflow(api, combo_orders, name)
+
+    async def cover_task(api, combo_orders, name, *args):
+        cover_workflow(api, combo_orders, name)
+
+    monkeypatch.setattr(run, 'enter_workflow', enter_workflow)
+    monkeypatch.setattr(run, 'cover_workflow', cover_workflow)
+    monkeypatch.setattr(run, 'enter_task', enter_task)
+    monkeypatch.setattr(run, 'cover_task', cover_task)
+    monkeypatch.setattr(run, 'notifier', simulator.Notifier(quiet=True), raising=False)
+    monkeypatch.setattr(run, 'journal', StateJournal(str(tmp_path / "journal.sqlite")), raising=False)
+    yield combo_orders, fills, log
+    run.journal.close()
+
+
+def test_cover_waits_for_late_stop_entry(levels, monkeypatch):
+    combo_orders, fills, log = levels
+    monkeypatch.setattr(run, 'scheduler', ExecutionScheduler(max_workers=4), raising=False)
+    stop = run.execute_level(None, combo_orders, 'stop')
+    level = run.execute_level(None, combo_orders, 'level')
+    fills['level'].set()
+    assert combo_orders['level']['entered'].result(5)
+    time.sleep(0.05)
+    assert ('cover', 'level') not in log
+    assert not level.done()
+
+    fills['stop'].set()
+    assert stop.result(5) and level.result(5)
+    assert log.index(('entered', 'stop')) < log.index(('cover', 'level'))
+    run.scheduler.shutdown()
+
+
+def test_cover_task_waits_for_late_stop_entry(levels, monkeypatch):
+    combo_orders, fills, log = levels
+    monkeypatch.setattr(run, 'runtime', AsyncRuntime())
+
+    async def session():
+        run.runtime.attach()
+        stop = run.execute_level_task(None, combo_orders, 'stop')
+        level = run.execute_level_task(None, combo_orders, 'level')
+        fills['level'].set()
+        await asyncio.sleep(0.05)
+        assert ('cover', 'level') not in log
+
+        fills['stop'].set()
+        assert await asyncio.wait_for(stop, 5) and await asyncio.wait_for(level, 5)
+
+    asyncio.run(session())
+    run.runtime.shutdown()
+    assert log.index(('entered', 'stop')) < log.index(('cover', 'level'))
+
+
+def test_cover_runs_at_once_when_stop_entered(levels, monkeypatch):
+    combo_orders, fills, log = levels
+    monkeypatch.setattr(run, 'scheduler', ExecutionScheduler(max_workers=4), raising=False)
+    combo_orders['stop']['triggered'] = True
+    combo_orders['stop']['entered'].set_result(True)
+    fills['level'].set()
+    assert run.execute_level(None, combo_orders, 'level').result(5)
+    assert ('cover', 'level') in log
+    run.scheduler.shutdown()
@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from market_calendar import TAIPEI, MarketCalendar, load_calendar_table
+
+
+def ts(*args):
+    return datetime.datetime(*args, tzinfo=TAIPEI).timestamp()
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    path = tmp_path / "calendar.csv"
+    path.write_text(
+        "# date,kind,time\n"
+        "2026-10-09,holiday,\n"
+        "2026-10-14,early_close,12:00\n"
+        "2026-10-15,no_night,\n"
+    )
+    return MarketCalendar(load_calendar_table(str(path)), days=30)
+
+
+@pytest.mark.parametrize('when, is_open', [
+    ((2026, 10, 7, 8, 44), False),   # before the day session
+    ((2026, 10, 7, 8, 45), True),
+    ((2026, 10, 7, 13, 45), False),  # between the sessions
+    ((2026, 10, 7, 23, 0), True),    # night session
+    ((2026, 10, 8, 3, 44), True),    # past midnight, the night before still open
+    ((2026, 10, 8, 3, 45), False),
+    ((2026, 10, 9, 1, 0), True),     # night session of the day before the holiday
+    ((2026, 10, 9, 10, 0), False),   # holiday
+    ((2026, 10, 9, 16, 0), False),   # no night session opens on the holiday
+    ((2026, 10, 10, 2, 0), False),
+    ((2026, 10, 17, 2, 0), True),    # Friday's night session runs into Saturday
+    ((2026, 10, 17, 10, 0), False),  # weekend
+    ((2026, 10, 14, 11, 59), True),
+    ((2026, 10, 14, 12, 0), False),  # early close
+    ((2026, 10, 14, 15, 30), True),  # the night session still opens
+    ((2026, 10, 15, 16, 0), False),  # no night session
+    ((2026, 10, 16, 2, 0), False),
+])
+def test_is_open(calendar, when, is_open):
+    assert calendar.is_open(ts(*when)) == is_open
+
+
+def test_waits_over_the_holiday_and_weekend(calendar):
+    now = ts(2026, 10, 9, 4, 0)
+    assert calendar.seconds_until_open(now) == ts(2026, 10, 12, 8, 45) - now
+    assert calendar.trading_day(now) == datetime.date(2026, 10, 12)
+    # Friday night belongs to Monday
+    assert calendar.trading_day(ts(2026, 10, 16, 22, 0)) == datetime.date(2026, 10, 19)
+    assert calendar.trading_day(ts(2026, 10, 16, 10, 0)) == datetime.date(2026, 10, 16)
+
+
+def test_seconds_until_change(calendar):
+    assert calendar.seconds_until_open(ts(2026, 10, 7, 23, 0)) == 0.0
+    assert calendar.seconds_until_change(ts(2026, 10, 7, 23, 0)) == 4 * 3600 + 45 * 60
+    assert calendar.seconds_until_change(ts(2026, 10, 14, 11, 0)) == 3600
+
+
+def test_rebuilds_past_its_range(calendar):
+    assert calendar.is_open(ts(2026, 10, 7, 10, 0))
+    end = calendar._end
+    assert calendar.is_open(ts(2027, 3, 3, 10, 0))
+    assert calendar._end > end
+    assert not calendar.is_open(ts(2027, 3, 6, 10, 0))
+
+
+def test_unknown_entry_is_rejected(tmp_path):
+    path = tmp_path / "calendar.csv"
+    path.write_text("2026-10-09,typhoon,\n")
+    with pytest.raises(ValueError):
+        load_calendar_table(str(path))
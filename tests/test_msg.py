@@ -0,0 +1,146 @@
+"""
+TelegramNotifier against a local http.server standing in for the Bot API.
+"""
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from msg import TelegramNotifier
+
+
+class FakeTelegram:
+    """
+    Records every sendMessage text; replies with the queued status codes
+    first, 200 after. While gate is cleared, requests wait for it.
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.statuses = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.arrived = threading.Event()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+                fake.arrived.set()
+                fake.gate.wait(5)
+                status = fake.statuses.pop(0) if fake.statuses else 200
+                if status == 200:
+                    fake.texts.append(urllib.parse.parse_qs(body)['text'][0])
+                reply = {'ok': status == 200}
+                if status == 429:
+                    reply['parameters'] = {'retry_after': 0.01}
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def hold(self):
+        """
+        Let the notifier's first post hang until release(), so what is
+        notified meanwhile piles up in its queue.
+        """
+        self.gate.clear()
+        self.arrived.clear()
+
+    def release(self):
+        self.gate.set()
+
+    def close(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def telegram():
+    fake = FakeTelegram()
+    yield fake
+    fake.close()
+
+
+def notifier(telegram, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return TelegramNotifier("TOKEN", "42", base_url=telegram.url, **kwargs)
+
+
+def test_delivers_message(telegram):
+    n = notifier(telegram)
+    assert n.notify("level *co_p1* filled")
+    n.close(5)
+    assert telegram.texts == ["level \\*co\\_p1\\* filled"]
+    assert n.stats['sent'] == 1 and n.stats['failed'] == 0
+
+
+def test_pending_messages_go_out_as_one_batch(telegram):
+    n = notifier(telegram)
+    telegram.hold()
+    n.notify("first")
+    assert telegram.arrived.wait(5)
+    for i in range(5):
+        n.notify(f"m{i}")
+    telegram.release()
+    n.close(5)
+    assert telegram.texts == ["first", "m0\nm1\nm2\nm3\nm4"]
+    assert n.stats['sent'] == 6
+
+
+def test_same_key_keeps_only_the_latest(telegram):
+    n = notifier(telegram)
+    telegram.hold()
+    n.notify("first")
+    assert telegram.arrived.wait(5)
+    for left in (7, 5, 2):
+        n.notify(f"co_n3 partial filled, {left} lefted!", key="co_n3-open")
+    n.notify("other")
+    telegram.release()
+    n.close(5)
+    assert telegram.texts == ["first", "co\\_n3 partial filled, 2 lefted!\nother"]
+    assert n.stats['coalesced'] == 2
+
+
+def test_retries_with_backoff_on_5xx_and_429(telegram):
+    telegram.statuses = [503, 429, 502]
+    n = notifier(telegram, max_retries=3)
+    n.notify("eventually")
+    n.close(5)
+    assert telegram.texts == ["eventually"]
+    assert n.stats['retries'] == 3 and n.stats['sent'] == 1
+
+
+def test_gives_up_after_max_retries(telegram):
+    telegram.statuses = [500, 500, 500]
+    n = notifier(telegram, max_retries=2)
+    n.notify("lost")
+    n.close(5)
+    assert telegram.texts == []
+    assert n.stats['failed'] == 1 and n.stats['retries'] == 2
+
+
+def test_full_queue_drops_instead_of_blocking(telegram):
+    n = notifier(telegram, maxsize=2)
+    telegram.hold()
+    n.notify("first")
+    assert telegram.arrived.wait(5)
+    assert n.notify("a")
+    assert n.notify("b")
+    assert not n.notify("c")
+    assert n.stats['dropped'] == 1
+    telegram.release()
+    n.close(5)
+    assert telegram.texts == ["first", "a\nb"]
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from orders import AsyncComboOrderHandler, ComboOrderHandler
+
+
+def new(order_id, quantity):
+    return {'operation': {'op_type': 'New'}, 'order': {'id': order_id, 'quantity': quantity}, 'status': {}}
+
+
+def cancel(order_id, quantity):
+    return {'operation': {'op_type': 'Cancel'}, 'order': {'id': order_id}, 'status': {'cancel_quantity': quantity}}
+
+
+def deal(order_id, quantity):
+    return {'trade_id': order_id, 'quantity': quantity}
+
+
+def feed(handler, *msgs):
+    for msg in msgs:
+        handler.handle_message(msg)
+
+
+def test_filled_combo():
+    handler = ComboOrderHandler()
+    feed(handler, new('a', 4), new('a', 4), deal('a', 4), deal('a', 4))
+    assert handler.wait('a', 0)
+    result = handler.evaluate('a')
+    assert result['status'] == 'filled' and result['left_q'] == 0
+
+
+def test_one_leg_new_is_not_done():
+    handler = ComboOrderHandler()
+    feed(handler, new('a', 4), deal('a', 2), cancel('a', 2))
+    assert not handler.wait('a', 0)
+    # the missing leg's New is counted as the one seen
+    result = handler.evaluate('a')
+    assert result['status'] == 'partial' and result['left_q'] == 3
+
+    feed(handler, new('a', 4), deal('a', 2), cancel('a', 2))
+    assert handler.wait('a', 0)
+    result = handler.evaluate('a')
+    assert result['status'] == 'partial' and result['left_q'] == 2
+
+
+def test_deal_before_new():
+    handler = ComboOrderHandler()
+    feed(handler, deal('a', 2), deal('a', 2))
+    assert not handler.wait('a', 0)
+    with pytest.raises(ValueError):
+        handler.evaluate('a')
+
+    feed(handler, new('a', 2))
+    assert not handler.wait('a', 0)
+    feed(handler, new('a', 2))
+    assert handler.wait('a', 0)
+    assert handler.evaluate('a')['status'] == 'filled'
+
+
+def test_cancel_before_new():
+    handler = ComboOrderHandler()
+    feed(handler, cancel('a', 1), new('a', 1), cancel('a', 1))
+    assert not handler.wait('a', 0)
+    feed(handler, new('a', 1))
+    assert handler.wait('a', 0)
+    result = handler.evaluate('a')
+    assert result['status'] == 'cancelled' and result['left_q'] == 1
+
+
+def test_legs_interleaved_across_orders():
+    handler = ComboOrderHandler()
+    feed(handler, new('a', 1), deal('b', 1), new('b', 1), deal('a', 1), new('a', 1))
+    assert not handler.wait('a', 0) and not handler.wait('b', 0)
+    feed(handler, deal('a', 1), new('b', 1), deal('b', 1))
+    assert handler.evaluate('a')['status'] == 'filled'
+    assert handler.evaluate('b')['status'] == 'filled'
+
+
+def test_wait_for_needs_both_legs():
+    async def session():
+        handler = AsyncComboOrderHandler()
+        feed(handler, new('a', 1), deal('a', 1))
+        assert not await handler.wait_for('a', 0.01)
+        asyncio.get_running_loop().call_later(0.01, feed, handler, new('a', 1), deal('a', 1))
+        assert await handler.wait_for('a', 1)
+        assert handler.evaluate('a')['status'] == 'filled'
+
+    asyncio.run(session())
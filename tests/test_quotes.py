@@ -0,0 +1,47 @@
+import time
+from types import SimpleNamespace
+
+import run
+from quotes import QuoteCache, spread_limit
+
+
+def leg(code, strike):
+    return SimpleNamespace(code=code, symbol=f"TXO202505{strike}C")
+
+
+def template_of(quotes, order_type='open'):
+    legs = (leg('short', 21000), leg('long', 21050))
+    return SimpleNamespace(order_type=order_type, slots=tuple(quotes.register(c) for c in legs))
+
+
+def test_spread_limit_entry_stops_at_floor():
+    assert spread_limit(20.0, 30.0, 3, 'open') == 5.0
+    assert spread_limit(20.0, 30.0, 3, 'open', floor=12.0) == 12.0
+    assert spread_limit(20.0, 30.0, 1, 'open', floor=12.0) == 20.0
+
+
+def test_limit_price_falls_back_on_stale_quotes(monkeypatch):
+    quotes = QuoteCache()
+    monkeypatch.setattr(run, 'quotes', quotes)
+    monkeypatch.setattr(run, 'quote_max_age', 2.0)
+    template = template_of(quotes)
+    now = time.time()
+    quotes.update('short', 30.0, 32.0, now)
+    quotes.update('long', 10.0, 12.0, now)
+    assert run.limit_price(template, 1, 19.0) == 20.0
+
+    quotes.update('long', 10.0, 12.0, now - 5)
+    assert run.limit_price(template, 1, 19.0) == 19.0
+
+
+def test_limit_price_keeps_entry_credit_near_formula(monkeypatch):
+    quotes = QuoteCache()
+    monkeypatch.setattr(run, 'quotes', quotes)
+    monkeypatch.setattr(run, 'min_credit', 0.8)
+    template = template_of(quotes)
+    quotes.update('short', 3.0, 9.0)
+    quotes.update('long', 0.0, 4.0)
+    # mid 4, crossing to 0.1 unclamped
+    assert run.limit_price(template, 3, 20.0) == 16.0
+    # covers are priced off the quote as they are
+    assert run.limit_price(template_of(quotes, 'close'), 3, 30.0) == 9.0
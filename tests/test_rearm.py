@@ -0,0 +1,137 @@
+import sqlite3
+import datetime
+
+import pytest
+
+import run
+import simulator
+from journal import StateJournal
+from quotes import QuoteCache
+from scheduler import ExecutionScheduler
+from strategy import LADDER, calculate_ranges
+from volatility import OnlineVol, RunningMoments
+
+NAME = 'TXO202505'
+
+
+def events(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT level, event, data FROM events ORDER BY id").fetchall()
+
+
+@pytest.fixture
+def strategy(tmp_path, monkeypatch):
+    """
+    A ladder around 21000 at std 100, armed after a restart that found
+    co_pp5 entered and co_n1 partly entered.
+    """
+    path = str(tmp_path / "journal.sqlite")
+    journal = StateJournal(path)
+    journal.record(f"{NAME}/", 'armed', open_price=21000)
+    journal.record(f"{NAME}/co_pp5", 'triggered', price=21050)
+    journal.record(f"{NAME}/co_pp5", 'opened')
+    journal.record(f"{NAME}/co_n1", 'triggered', price=20900)
+    journal.record(f"{NAME}/co_n1", 'open_partial', open_q=1)
+    journal.close()
+
+    api = simulator.Shioaji(open_price=21000, seed=0)
+    monkeypatch.setattr(run, 'journal', StateJournal(path), raising=False)
+    monkeypatch.setattr(run, 'notifier', simulator.Notifier(quiet=True), raising=False)
+    monkeypatch.setattr(run, 'scheduler', ExecutionScheduler(max_workers=4), raising=False)
+    monkeypatch.setattr(run, 'quotes', QuoteCache())
+    strategy = run.WingStrategy(NAME, 'TXO', '202505', None, 21000)
+    strategy.vol = OnlineVol(RunningMoments.from_values([100.0, -100.0]))
+    strategy.arm(api)
+    yield api, strategy, path
+    strategy.engine.stop()
+    run.scheduler.shutdown()
+    run.journal.close()
+    api.logout()
+
+
+def test_rearm_moves_only_untriggered_levels(strategy):
+    api, strategy, path = strategy
+    ladder = strategy.combo_orders
+    before = {name: (ladder[name]['trigger_price'], ladder[name]['enter_order']) for name in ladder}
+
+    # the week rolled with a wider diff
+    strategy.vol.moments.add(400.0)
+    std = strategy.vol.std()
+    moved = strategy.rearm(api)
+
+    std_prices = calculate_ranges(21000, std)
+    # co_pp5 entered, co_n1 partly entered, co_np5 is covered by co_n1
+    pinned = {f"{NAME}/{name}" for name in ('co_pp5', 'co_n1', 'co_np5')}
+    assert sorted(moved) == sorted(set(ladder) - pinned)
+    for name, side, idx, stop, _, _ in LADDER:
+        name = f"{NAME}/{name}"
+        order_info = ladder[name]
+        if name in pinned:
+            assert (order_info['trigger_price'], order_info['enter_order']) == before[name]
+            continue
+        assert order_info['trigger_price'] == pytest.approx(std_prices[idx])
+        enter = order_info['enter_order']
+        lookup = strategy.chain.bear_call if side == '>=' else strategy.chain.bull_put
+        assert (enter.l1p, enter.l2p) == lookup(std_prices[idx])
+        assert order_info['enter_template'].legs == (enter.c1, enter.c2)
+        assert order_info['enter_template'].slots == tuple(run.quotes.register(leg) for leg in (enter.c1, enter.c2))
+        if stop is not None:
+            # a level buys back whatever its stop level sells now
+            stop_order = ladder[f"{NAME}/{stop}"]['enter_order']
+            assert order_info['stop_order'] is stop_order
+            assert order_info['stop_template'].legs == (stop_order.c1, stop_order.c2)
+
+    armed = strategy.engine._levels
+    for name in set(ladder) - {f"{NAME}/co_pp5"}:
+        assert armed[name][0] == ladder[name]['trigger_price']
+    assert f"{NAME}/co_pp5" not in strategy.engine._up_names
+
+    run.journal.close()
+    assert [event for _, event, _ in events(path)].count('armed') == 2
+    assert all(event != 'armed' or data == '{"open_price": 21000}' for _, event, data in events(path))
+    assert run.journal.replay(f"{NAME}/") == {
+        f"{NAME}/": {'open_price': 21000},
+        f"{NAME}/co_pp5": {'triggered': True},
+        f"{NAME}/co_n1": {'open_q': 1},
+    }
+
+
+def test_rearm_keeps_levels_that_fire_meanwhile(strategy):
+    api, strategy, path = strategy
+    ladder = strategy.combo_orders
+    p1, p2 = f"{NAME}/co_p1", f"{NAME}/co_p2"
+    before = ladder[p1]['enter_order']
+    # co_p2 fires, its entry is still running
+    assert strategy.engine.disarm(p2)
+
+    strategy.vol.moments.add(400.0)
+    moved = strategy.rearm(api)
+    assert p1 not in moved and p2 not in moved
+    assert ladder[p1]['enter_order'] is before
+    assert ladder[p2]['stop_order'] is before
+    assert p2 not in strategy.engine._up_names
+
+
+def test_week_roll_rearms_the_strategies_of_its_vol(monkeypatch):
+    api = simulator.Shioaji(open_price=21000, seed=0)
+    monkeypatch.setattr(run, 'runtime', None)
+    monkeypatch.setattr(run, 'scheduler', ExecutionScheduler(max_workers=2), raising=False)
+    fixed = run.WingStrategy('fixed', 'TXO', '202505', 100.0, 21000)
+    live = run.WingStrategy('live', 'TXO', '202505', None, 21000)
+    runner = run.StrategyRunner(api, [fixed, live])
+    for strategy in (fixed, live):
+        strategy.engine = run.TriggerEngine(lambda name, price: True)
+    rearmed = []
+    runner.rearm = rearmed.append
+
+    def tick(*when, close=21000):
+        runner.on_tick(None, simulator.TickFOPv1(code='MXFR1', datetime=datetime.datetime(*when), close=close))
+
+    tick(2025, 1, 6, 10, 0)
+    tick(2025, 1, 8, 15, 0)              # first week seen, skipped
+    tick(2025, 1, 15, 13, 0, close=21300)
+    tick(2025, 1, 15, 15, 0)             # adds its diff
+    run.scheduler.shutdown()
+    api.logout()
+    assert rearmed == [live, live]
+    assert list(live.vol.moments.values) == [300.0]
@@ -0,0 +1,60 @@
+import os
+import datetime
+from types import SimpleNamespace
+
+import numpy as np
+
+from recorder import TickRecorder, local_ns, read_tick_dir, read_ticks
+
+
+def ticks(start, n, seconds=600):
+    return [
+        SimpleNamespace(datetime=start + datetime.timedelta(seconds=seconds * i), close=21000 + i, volume=i + 1)
+        for i in range(n)
+    ]
+
+
+def test_ring_wraps_and_splits_days(tmp_path):
+    directory = str(tmp_path / "ticks")
+    # the flusher never wakes, flush() is called by hand
+    recorder = TickRecorder(directory, capacity=8, flush_interval=3600)
+    feed = ticks(datetime.datetime(2025, 1, 8, 22, 0), 20)
+
+    for k in range(0, 20, 5):
+        for tick in feed[k:k + 5]:
+            recorder.record(tick)
+        recorder.flush()
+    recorder.close()
+
+    assert recorder.stats == {'recorded': 20, 'dropped': 0, 'flushed': 20}
+    assert sorted(os.listdir(directory)) == ['20250108.bin', '20250109.bin']
+    first = read_ticks(os.path.join(directory, '20250108.bin'))
+    assert len(first) == 12  # 22:00 to 23:50
+    days = read_tick_dir(directory)
+    assert days['ts'].tolist() == [local_ns(t.datetime) for t in feed]
+    assert days['close'].tolist() == [t.close for t in feed]
+    assert days['volume'].tolist() == [t.volume for t in feed]
+
+
+def test_full_ring_drops_new_ticks(tmp_path):
+    directory = str(tmp_path / "ticks")
+    recorder = TickRecorder(directory, capacity=4, flush_interval=3600)
+    feed = ticks(datetime.datetime(2025, 1, 8, 9, 0), 6, seconds=1)
+    for tick in feed:
+        recorder.record(tick)
+    recorder.close()
+
+    assert recorder.stats == {'recorded': 4, 'dropped': 2, 'flushed': 4}
+    assert read_tick_dir(directory)['close'].tolist() == [t.close for t in feed[:4]]
+
+
+def test_torn_record_is_left_out(tmp_path):
+    directory = str(tmp_path / "ticks")
+    recorder = TickRecorder(directory, flush_interval=3600)
+    for tick in ticks(datetime.datetime(2025, 1, 8, 9, 0), 3):
+        recorder.record(tick)
+    recorder.close()
+    path = os.path.join(directory, '20250108.bin')
+    with open(path, 'ab') as f:
+        f.write(np.int64(1).tobytes())
+    assert len(read_ticks(path)) == 3
@@ -0,0 +1,17 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import run
+
+
+def test_wait_shares_one_deadline_across_strategies():
+    strategies = [SimpleNamespace(engine=SimpleNamespace(finished=threading.Event())) for _ in range(3)]
+    runner = SimpleNamespace(strategies=strategies)
+    start = time.monotonic()
+    assert not run.StrategyRunner.wait(runner, 0.2)
+    assert time.monotonic() - start < 0.4
+
+    for strategy in strategies:
+        strategy.engine.finished.set()
+    assert run.StrategyRunner.wait(runner, 0)
@@ -0,0 +1,15 @@
+import pytest
+
+from backtest import make_chain
+from strategy import LADDER, StrikeChain, calculate_ranges
+
+
+@pytest.mark.parametrize('open_price', [21000, 21037, 19990, 23880])
+def test_recenter_matches_bisect_lookups(open_price):
+    _, _, _, options = make_chain(21500, width=2000)
+    chain = StrikeChain(options)
+    std_prices = calculate_ranges(open_price, 250.0)
+    placed = chain.recenter(std_prices, LADDER)
+    for name, op, i, *_ in LADDER:
+        lookup = chain.bear_call if op == '>=' else chain.bull_put
+        assert placed[name] == lookup(std_prices[i])
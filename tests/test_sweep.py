@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtest import Backtest, IOCFillModel, split_weeks
+from strategy import make_ladder
+from sweep import data_signature
+
+
+def week_ticks(weeks=3, seed=0):
+    """
+    A tick a minute from a Wednesday's after-market open, a walk wide
+    enough to cross the inner levels.
+    """
+    n = weeks * 7 * 24 * 60
+    start = pd.Timestamp('2025-01-08 15:00').value
+    ts = start + np.arange(n, dtype=np.int64) * 60 * 10**9
+    close = 21000 + np.cumsum(np.random.default_rng(seed).normal(0, 8, n)).round()
+    return ts, close
+
+
+def test_signature_follows_the_tick_files(tmp_path):
+    path = str(tmp_path / "ticks")
+    os.makedirs(path)
+    for day in ('20250108', '20250109'):
+        with open(os.path.join(path, f"{day}.bin"), 'wb') as f:
+            f.write(b'\0' * 16)
+    before = data_signature(path)
+    assert [name for name, _, _ in before] == ['20250108.bin', '20250109.bin']
+
+    with open(os.path.join(path, '20250109.bin'), 'ab') as f:
+        f.write(b'\0' * 16)
+    assert data_signature(path) != before
+
+
+def test_combinations_share_fills_on_common_levels():
+    ts, close = week_ticks()
+    weeks = split_weeks(ts)
+
+    def run(quantities, seed=7):
+        bt = Backtest(150, IOCFillModel(0.05, 0.05, seed=seed), ladder=make_ladder(quantities), walk_every=2)
+        return bt.run(ts, close, weeks).set_index(['week', 'level'])
+
+    a = run([1, 2, 4, 8])
+    b = run([1, 2, 3, 4])
+    # the first level per side has the same size in both ladders
+    first = a.index.get_level_values('level').str.endswith('1')
+    assert a['triggered'].any()
+    pd.testing.assert_frame_equal(
+        a.loc[first, ['entry_qty', 'entry_price']], b.loc[first, ['entry_qty', 'entry_price']])
@@ -0,0 +1,57 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_std import collect_weekly_amp
+from recorder import local_ns
+from volatility import OnlineVol, RunningMoments
+
+
+def make_ticks(start, days, minutes=7, seed=0):
+    """
+    A tick every minutes for days from start, a random walk around 21000.
+    """
+    n = days * 24 * 60 // minutes
+    times = [start + datetime.timedelta(minutes=minutes * i) for i in range(n)]
+    closes = 21000 + np.cumsum(np.random.default_rng(seed).normal(0, 5, n)).round()
+    return times, closes.tolist()
+
+
+def taifex_rows(times, closes):
+    """
+    The preprocessed MTX weekly rows generate_std reads for those ticks:
+    every Wednesday the after-market row of the expiry listed at 15:00 and
+    the settlement row of the one expiring at the 13:30 close.
+    """
+    rows = []
+    wednesdays = sorted({t.date() for t in times if t.weekday() == 2})
+    for k, day in enumerate(wednesdays):
+        listed = datetime.datetime.combine(day, datetime.time(15, 0))
+        settled = datetime.datetime.combine(day, datetime.time(13, 30))
+        opens = [c for t, c in zip(times, closes) if t >= listed]
+        settles = [c for t, c in zip(times, closes) if t <= settled]
+        if settles and k > 0:
+            rows.append((day, f"W{k-1}", settles[-1], settles[-1], 0.0, '一般'))
+        if opens and times[0] <= listed:
+            rows.append((day, f"W{k}", opens[0], opens[0], opens[0], '盤後'))
+    df = pd.DataFrame(rows, columns=['date', 'expire', 'open', 'close', 'final_close', 'trade_time'])
+    df['weekday'] = pd.to_datetime(df['date']).dt.weekday
+    return df
+
+
+@pytest.mark.parametrize('start, skipped', [
+    (datetime.datetime(2025, 1, 3, 9, 1), 0),     # Friday, the first week seen is incomplete
+    (datetime.datetime(2025, 1, 8, 15, 0), 1),    # at the after-market open, skipped all the same
+])
+def test_online_vol_matches_collect_weekly_amp(start, skipped):
+    times, closes = make_ticks(start, days=43)
+    vol = OnlineVol()
+    for t, c in zip(times, closes):
+        vol.on_tick(local_ns(t), c)
+
+    diffs = collect_weekly_amp(taifex_rows(times, closes))[skipped:]
+    assert len(diffs) == 5
+    assert list(vol.moments.values) == pytest.approx(diffs)
+    assert vol.weekly_std() == pytest.approx(RunningMoments.from_values(diffs).std())
@@ -0,0 +1,175 @@
+import bisect
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from latency import metrics, now_ns
+
+
+class TriggerEngine:
+    """
+    Tick-driven trigger check for the armed wing levels.
+
+    Armed levels live in two sorted indexes of trigger prices, one for the
+    '>=' side and one for the '<=' side, so a tick costs one bisect per side
+    instead of a scan over every order. Crossed levels are disarmed and queued
+    for the executor thread; the quote callback never runs order work itself.
+
+    handler(name, price) runs on the executor thread and returns True when the
+    level is done. A level whose handler returns False is armed again, the same
+    way the old polling loop retried a level whose order was not filled.
+    The handler may also return a Future of that bool (see
+    ExecutionScheduler.run_level), then the executor thread moves on to the
+    next crossed level right away and the level is settled when it resolves.
+
+    With inline=True there is no executor thread: crossed levels are handed
+    to the handler right in on_price. That is for an event loop, where
+    on_price already runs on the loop and the handler only starts a task
+    (AsyncRuntime.run_level); on_finished is then called, on the thread
+    settling the last level, when finished is set.
+    """
+
+    def __init__(self, handler: Callable[[str, int], Union[bool, Future]], inline: bool = False):
+        self.handler = handler
+        self.inline = inline
+        self.finished = threading.Event()
+        self.on_finished: Optional[Callable[[], None]] = None
+
+        self._lock = threading.Lock()
+        self._levels: Dict[str, Tuple[float, str]] = {}
+        self._up_prices: List[float] = []
+        self._up_names: List[str] = []
+        self._down_prices: List[float] = []
+        self._down_names: List[str] = []
+        self._queue: "queue.Queue" = queue.Queue()
+        # perf_counter_ns of the tick that last fired each level
+        self.fired_ns: Dict[str, int] = {}
+        # fired levels that are queued or still executing
+        self._running = 0
+        self._thread = None
+
+    def arm(self, name: str, trigger_price: float, side: str) -> None:
+        if side not in ('>=', '<='):
+            raise ValueError(f"Unsupported trigger side: {side}")
+
+        with self._lock:
+            self._levels[name] = (trigger_price, side)
+            if side == '>=':
+                prices, names = self._up_prices, self._up_names
+            else:
+                prices, names = self._down_prices, self._down_names
+            i = bisect.bisect_right(prices, trigger_price)
+            prices.insert(i, trigger_price)
+            names.insert(i, name)
+            self.finished.clear()
+
+    def disarm(self, name: str) -> bool:
+        """
+        True when name was armed, False when it has fired (or never was).
+        """
+        with self._lock:
+            return self._remove(name)
+
+    def on_price(self, price: int) -> None:
+        """
+        Called from the quote callback with the latest close.
+        """
+        start = now_ns()
+        fired = []
+        with self._lock:
+            up_prices = self._up_prices
+            if up_prices and price >= up_prices[0]:
+                i = bisect.bisect_right(up_prices, price)
+                fired.extend(self._up_names[:i])
+                del up_prices[:i]
+                del self._up_names[:i]
+
+            down_prices = self._down_prices
+            if down_prices and price <= down_prices[-1]:
+                i = bisect.bisect_left(down_prices, price)
+                # nearest level first
+                fired.extend(reversed(self._down_names[i:]))
+                del down_prices[i:]
+                del self._down_names[i:]
+
+            # counted until settled, so finished never sees a level in between
+            self._running += len(fired)
+            for name in fired:
+                self.fired_ns[name] = start
+                if not self.inline:
+                    self._queue.put((name, price, start))
+        metrics.since('trigger_check', start)
+        if self.inline:
+            for name in fired:
+                self._dispatch(name, price, start)
+
+    def start(self) -> None:
+        if self._thread is not None or self.inline:
+            self._check_finished()
+            return
+        self._thread = threading.Thread(target=self._run, name="trigger-executor", daemon=True)
+        self._thread.start()
+        self._check_finished()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._dispatch(*item)
+
+    def _dispatch(self, name: str, price: int, fired: int) -> None:
+        metrics.since('trigger_queue', fired)
+        try:
+            result = self.handler(name, price)
+        except Exception:
+            traceback.print_exc()
+            result = False
+
+        # concurrent.futures.Future or asyncio.Future / Task
+        if hasattr(result, 'add_done_callback'):
+            result.add_done_callback(lambda f, name=name: self._settle(name, f))
+        else:
+            self._settle_result(name, result)
+
+    def _settle(self, name: str, future) -> None:
+        done = False
+        try:
+            done = not future.cancelled() and future.result()
+        except Exception:
+            traceback.print_exc()
+        self._settle_result(name, done)
+
+    def _settle_result(self, name: str, done: bool) -> None:
+        if not done:
+            trigger_price, side = self._levels[name]
+            self.arm(name, trigger_price, side)
+        with self._lock:
+            self._running -= 1
+        self._check_finished()
+
+    def _check_finished(self) -> None:
+        with self._lock:
+            finished = not self._up_names and not self._down_names and not self._running
+            if finished:
+                self.finished.set()
+        if finished and self.on_finished is not None:
+            self.on_finished()
+
+    def _remove(self, name: str) -> bool:
+        for prices, names in ((self._up_prices, self._up_names), (self._down_prices, self._down_names)):
+            if name in names:
+                i = names.index(name)
+                del prices[i]
+                del names[i]
+                return True
+        return False
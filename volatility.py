@@ -0,0 +1,154 @@
+import math
+from collections import deque
+from typing import Iterable, Optional
+
+from strategy import RANGE_STEPS, calculate_ranges
+
+
+DAY_NS = 86400 * 10**9
+WEEK_NS = 7 * DAY_NS
+# weekly contracts roll at the Wednesday 15:00 after-market open,
+# 1969-12-31 was a Wednesday
+WEEK_ANCHOR_NS = -9 * 3600 * 10**9
+# and settle at the Wednesday 13:30 close, 1.5 h before the next one opens
+SETTLE_NS = WEEK_NS - 90 * 60 * 10**9
+
+
+class RunningMoments:
+    """
+    Welford mean / variance of the weekly diffs, the one implementation both
+    StdCache (offline) and OnlineVol (live) use, so the two agree exactly on
+    the same diffs. std() is the population std, like np.std.
+
+    With window, only the last window diffs count: the oldest is taken out
+    again in O(1) when a new one comes in.
+    """
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window
+        self.values: deque = deque()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], window: Optional[int] = None) -> "RunningMoments":
+        moments = cls(window)
+        for value in values:
+            moments.add(value)
+        return moments
+
+    def add(self, value: float) -> None:
+        if self.window is not None and len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        self.values.append(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value: float) -> None:
+        if self.count == 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        delta = value - self.mean
+        self.count -= 1
+        self.mean -= delta / self.count
+        self.m2 = max(self.m2 - delta * (value - self.mean), 0.0)
+
+    def std(self) -> float:
+        if self.count == 0:
+            return float('nan')
+        return math.sqrt(self.m2 / self.count)
+
+
+class OnlineVol:
+    """
+    Weekly std kept current from the underlying's ticks.
+
+    Ticks are split into weekly contracts like backtest.split_weeks. As in
+    generate_std.weekly_amp, a week's diff is the settlement close, the
+    last tick by Wednesday 13:30, minus the after-market open, the week's
+    first tick; it is added to the moments when the week rolls over. The
+    first week seen is skipped, its first tick is not the open, and so is
+    a week without a tick by its settlement.
+
+    Within the week the high / low give a realized (Parkinson) std,
+    range**2 / (4 ln 2) scaled from the elapsed part of the week to the
+    whole week. std() blends its variance in with range_weight, 0 keeps the
+    weekly diffs only. on_tick is O(1).
+    """
+
+    def __init__(self, moments: Optional[RunningMoments] = None, range_weight: float = 0.0):
+        self.moments = moments or RunningMoments()
+        self.range_weight = range_weight
+        self.week = None
+        self.week_start = 0
+        self.ts = 0
+        self.open = None
+        self.high = None
+        self.low = None
+        # the open of the week in progress is its after-market open
+        self.complete = False
+        self.settle = None
+
+    def on_tick(self, ts: int, close: float) -> None:
+        """
+        ts in int nanoseconds of exchange local time (recorder.local_ns).
+        """
+        week = (ts - WEEK_ANCHOR_NS) // WEEK_NS
+        if week != self.week:
+            if self.complete and self.settle is not None:
+                self.moments.add(self.settle - self.open)
+            self.complete = self.week is not None
+            self.week = week
+            self.week_start = week * WEEK_NS + WEEK_ANCHOR_NS
+            self.open = self.high = self.low = close
+            self.settle = None
+        elif close > self.high:
+            self.high = close
+        elif close < self.low:
+            self.low = close
+        if ts - self.week_start <= SETTLE_NS:
+            self.settle = close
+        self.ts = ts
+
+    def weekly_std(self) -> float:
+        return self.moments.std()
+
+    def range_std(self) -> float:
+        elapsed = self.ts - self.week_start
+        if self.week is None or elapsed <= 0 or self.high == self.low:
+            return float('nan')
+        variance = (self.high - self.low) ** 2 / (4 * math.log(2))
+        return math.sqrt(variance * WEEK_NS / elapsed)
+
+    def std(self) -> float:
+        weekly = self.weekly_std()
+        if not self.range_weight:
+            return weekly
+        realized = self.range_std()
+        if math.isnan(realized):
+            return weekly
+        if math.isnan(weekly):
+            return realized
+        w = self.range_weight
+        return math.sqrt((1 - w) * weekly * weekly + w * realized * realized)
+
+    def ranges(self, open_price=None, steps=RANGE_STEPS):
+        """
+        calculate_ranges with the current std, around open_price or this
+        week's open.
+        """
+        return calculate_ranges(self.open if open_price is None else open_price, self.std(), steps)
+
+
+def load_weekly_moments(cache_dir: str, window: Optional[int] = None) -> RunningMoments:
+    """
+    The weekly diffs `generate_std.py --cache` keeps under cache_dir,
+    optionally only the last window of them.
+    """
+    from generate_std import StdCache
+
+    cache = StdCache(cache_dir)
+    return RunningMoments.from_values(cache.moments.values, window)